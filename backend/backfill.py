@@ -0,0 +1,141 @@
+"""
+Report Backfill CLI
+===================
+
+Bulk-load ESG reports into Firestore through
+ESGDatabaseService.bulk_save_reports (batched, concurrent commits).
+
+Usage:
+    # JSON Lines input: {"company_id": "...", "report": {<ESGReport>}} per line
+    python -m backend.backfill --input reports.jsonl
+    
+    # Demo data for several companies and years
+    python -m backend.backfill --demo --companies acme,globex --years 2020-2024
+
+Reports are read and written in slices of --slice-size so memory stays
+bounded for large inputs. Throughput is printed per slice and as a final
+JSON summary.
+"""
+
+from typing import Iterator, List, Tuple
+import argparse
+import asyncio
+import json
+import sys
+
+from .database import BULK_WRITE_CONCURRENCY, get_db_service
+from .models import ESGReport
+
+
+def iter_input_reports(path: str) -> Iterator[Tuple[str, ESGReport]]:
+    """Read (company_id, report) pairs from a JSON Lines file ("-" for stdin)."""
+    handle = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line_number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                yield item["company_id"], ESGReport.model_validate(item["report"])
+            except (ValueError, KeyError) as e:
+                raise ValueError(f"{path}:{line_number}: invalid report line ({e})") from e
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def iter_demo_reports(companies: List[str], years: List[int]) -> Iterator[Tuple[str, ESGReport]]:
+    """Generate demo reports for every company and year."""
+    db_service = get_db_service()
+    for company_id in companies:
+        for year in years:
+            yield company_id, db_service._generate_mock_report(year, company_id)
+
+
+def parse_years(value: str) -> List[int]:
+    """Parse "2024", "2020-2024" or "2021,2023"."""
+    years = []
+    for part in value.split(","):
+        if "-" in part:
+            first, last = (int(year) for year in part.split("-", 1))
+            years.extend(range(first, last + 1))
+        else:
+            years.append(int(part))
+    return years
+
+
+async def run_backfill(reports: Iterator[Tuple[str, ESGReport]], slice_size: int, concurrency: int) -> dict:
+    """Write reports slice by slice and aggregate the throughput stats."""
+    db_service = get_db_service()
+    totals = {
+        "reports": 0,
+        "persisted": True,
+        "batches": 0,
+        "operations": 0,
+        "failed_reports": [],
+        "errors": [],
+        "seconds": 0.0,
+    }
+    
+    pending: List[Tuple[str, ESGReport]] = []
+    
+    async def write_slice():
+        stats = await db_service.bulk_save_reports(pending, max_concurrency=concurrency)
+        for key in ("reports", "batches", "operations", "seconds"):
+            totals[key] += stats[key]
+        totals["failed_reports"].extend(stats["failed_reports"])
+        totals["errors"].extend(stats["errors"])
+        totals["persisted"] = totals["persisted"] and stats["persisted"]
+        print(
+            f"  {totals['reports']} reports processed "
+            f"({stats['reports_per_second']} reports/s, {stats['operations_per_second']} ops/s)",
+            file=sys.stderr,
+        )
+        pending.clear()
+    
+    for item in reports:
+        pending.append(item)
+        if len(pending) >= slice_size:
+            await write_slice()
+    if pending:
+        await write_slice()
+    
+    seconds = totals["seconds"]
+    totals["seconds"] = round(seconds, 3)
+    totals["reports_per_second"] = round(totals["reports"] / seconds, 1) if seconds else 0.0
+    totals["operations_per_second"] = round(totals["operations"] / seconds, 1) if seconds else 0.0
+    return totals
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk-load ESG reports into Firestore.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="JSON Lines file of {company_id, report} objects, or - for stdin")
+    source.add_argument("--demo", action="store_true", help="Generate demo reports")
+    parser.add_argument("--companies", default="default", help="Comma-separated company ids (with --demo)")
+    parser.add_argument("--years", default="2022-2024", help="Years such as 2020-2024 or 2021,2023 (with --demo)")
+    parser.add_argument("--concurrency", type=int, default=BULK_WRITE_CONCURRENCY, help="Concurrent batch commits")
+    parser.add_argument("--slice-size", type=int, default=2000, help="Reports held in memory per bulk write")
+    args = parser.parse_args(argv)
+    
+    if args.concurrency < 1 or args.slice_size < 1:
+        parser.error("--concurrency and --slice-size must be positive")
+    
+    if args.demo:
+        companies = [company.strip() for company in args.companies.split(",") if company.strip()]
+        reports = iter_demo_reports(companies, parse_years(args.years))
+    else:
+        reports = iter_input_reports(args.input)
+    
+    try:
+        stats = asyncio.run(run_backfill(reports, args.slice_size, args.concurrency))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    
+    print(json.dumps(stats, indent=2))
+    return 0 if stats["persisted"] and not stats["failed_reports"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,12 @@
+"""
+Benchmarks
+==========
+
+Reproducible measurements behind the performance work in the backend.
+Each module runs standalone, prints its results and exits:
+
+    python -m backend.bench.factor_lookup
+
+None of them need Firebase or network access; storage-bound benchmarks
+use the in-memory Firestore stand-in in fake_firestore.
+"""
@@ -0,0 +1,190 @@
+"""
+Invoice Extraction Throughput
+=============================
+
+Generates a corpus of synthetic utility and fuel invoices as real PDFs
+(FlateDecode content streams, with Tj and TJ text operators), then
+measures extraction throughput:
+
+- inline: extract_document called one document after another
+- pooled: every document submitted at once to an ExtractionPool, while a
+  ticker task records the worst event loop lag
+
+Every invoice's expected quantity is known, so the run also reports how
+many documents were extracted with the right figure.
+
+Usage:
+    python -m backend.bench.extraction_throughput --documents 1000 --workers 2
+"""
+
+from datetime import date, timedelta
+from typing import List, Tuple
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+from ..extraction import ExtractionPool, extract_document
+
+INVOICE_KINDS = ("electricity", "gas", "water", "fuel")
+
+
+# ==================== Synthetic Corpus ====================
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(lines: List[str], tj_array: bool = False) -> bytes:
+    """A one-page PDF whose compressed content stream shows the lines."""
+    operators = ["BT /F1 10 Tf 50 780 Td 14 TL"]
+    for line in lines:
+        if tj_array:
+            words = " -250 ".join(f"({_escape(word)})" for word in line.split(" "))
+            operators.append(f"[{words}] TJ T*")
+        else:
+            operators.append(f"({_escape(line)}) Tj T*")
+    operators.append("ET")
+    stream = zlib.compress("\n".join(operators).encode("cp1252"))
+    
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(stream)} /Filter /FlateDecode >>".encode() + b"\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer << /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def make_invoice(rng: random.Random, kind: str) -> Tuple[List[str], float]:
+    """Text lines of a synthetic invoice and the quantity it bills."""
+    start = date(2024, 1, 1) + timedelta(days=rng.randrange(300))
+    end = start + timedelta(days=29)
+    fmt = rng.choice([
+        lambda d: d.isoformat(),
+        lambda d: d.strftime("%d/%m/%Y"),
+        lambda d: d.strftime("%d %b %Y"),
+    ])
+    lines = [
+        f"Invoice INV-{rng.randrange(10 ** 6)}",
+        f"Invoice date: {fmt(end + timedelta(days=3))}",
+        f"Billing period: {fmt(start)} - {fmt(end)}",
+    ]
+    if kind == "electricity":
+        day, night = round(rng.uniform(500, 5000)), round(rng.uniform(100, 2000))
+        tariff = " - 100% renewable tariff" if rng.random() < 0.3 else ""
+        lines += [
+            f"Electricity supply{tariff}",
+            f"Day rate {day:,} kWh",
+            f"Night rate {night:,} kWh",
+            f"Total consumption {day + night:,.2f} kWh",
+        ]
+        quantity = float(day + night)
+    elif kind == "gas":
+        quantity = round(rng.uniform(1000, 20000), 1)
+        lines += ["Gas supply", f"Units used {quantity:,.1f} kWh"]
+    elif kind == "water":
+        quantity = round(rng.uniform(10, 900), 1)
+        lines += ["Water services", f"Consumption {quantity:.1f} m3"]
+    else:
+        quantity = round(rng.uniform(50, 2000), 2)
+        lines += ["Fuel card statement", f"Diesel {quantity:.2f} litres"]
+    
+    amount = rng.uniform(100, 9000)
+    lines += [f"Subtotal EUR {amount:,.2f}", f"Total due: € {amount * 1.2:,.2f}"]
+    return lines, quantity
+
+
+def write_corpus(directory: str, documents: int, repeat: int, seed: int = 5) -> List[Tuple[str, float]]:
+    """Write the corpus to directory as (path, expected quantity) pairs."""
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(documents):
+        lines, quantity = make_invoice(rng, INVOICE_KINDS[index % len(INVOICE_KINDS)])
+        path = os.path.join(directory, f"{index}.pdf")
+        with open(path, "wb") as f:
+            # Repeated lines stand in for multi-page bills
+            f.write(make_pdf(lines * repeat, tj_array=index % 2 == 0))
+        corpus.append((path, quantity))
+    return corpus
+
+
+def _matches(result: dict, expected: float) -> bool:
+    quantity = result.get("quantity")
+    return quantity is not None and abs(quantity - expected) <= 0.01 * expected
+
+
+# ==================== Measurement ====================
+
+async def run_pooled(corpus: List[Tuple[str, float]], workers: int) -> Tuple[List[dict], float, float]:
+    """Extract the corpus through an ExtractionPool; returns (results, seconds, max loop lag)."""
+    pool = ExtractionPool(max_workers=workers, max_queued=len(corpus), queue_timeout=60)
+    await pool.extract(corpus[0][0], ".pdf")  # Start the workers
+    
+    max_lag = 0.0
+    done = False
+    
+    async def ticker() -> None:
+        nonlocal max_lag
+        while not done:
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            max_lag = max(max_lag, time.perf_counter() - started - 0.005)
+    
+    ticking = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    try:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(pool.extract(path, ".pdf") for path, _ in corpus))
+        seconds = time.perf_counter() - started
+    finally:
+        done = True
+        await ticking
+        pool.shutdown()
+    return results, seconds, max_lag
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure invoice extraction throughput on a synthetic corpus.")
+    parser.add_argument("--documents", type=int, default=1000, help="Invoices in the corpus")
+    parser.add_argument("--repeat", type=int, default=20, help="Times each invoice's text repeats")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes of the pool")
+    args = parser.parse_args(argv)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = write_corpus(directory, args.documents, args.repeat)
+        size = sum(os.path.getsize(path) for path, _ in corpus)
+        print(f"{len(corpus)} documents, {size / len(corpus) / 1024:.1f} KiB each")
+        
+        started = time.perf_counter()
+        results = [extract_document(path, ".pdf") for path, _ in corpus]
+        seconds = time.perf_counter() - started
+        correct = sum(_matches(result, expected) for result, (_, expected) in zip(results, corpus))
+        print(f"inline       {seconds:6.2f}s {len(corpus) / seconds:7.0f} docs/s  {correct}/{len(corpus)} correct")
+        
+        results, seconds, lag = asyncio.run(run_pooled(corpus, args.workers))
+        correct = sum(_matches(result, expected) for result, (_, expected) in zip(results, corpus))
+        print(
+            f"pooled ({args.workers}w)  {seconds:6.2f}s {len(corpus) / seconds:7.0f} docs/s  "
+            f"{correct}/{len(corpus)} correct, max loop lag {lag * 1000:.1f} ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
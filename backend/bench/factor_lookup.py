@@ -0,0 +1,85 @@
+"""
+Emission Factor Lookup Benchmark
+================================
+
+Times get_emission_factor against the compiled factor index versus a
+reference lookup that walks the nested factor table on every call, the
+way factors were resolved before the index existed. Both must return the
+same factor for every case.
+
+Usage:
+    python -m backend.bench.factor_lookup --calls 100000
+"""
+
+from typing import Dict, List, Optional, Tuple
+import argparse
+import sys
+import timeit
+
+from ..emission_factors import get_emission_factor, get_factor_dataset
+
+# (activity_type, country, variant, sub_category)
+CASES: List[Tuple[str, str, Optional[str], Optional[str]]] = [
+    ("electricity", "UK", None, None),
+    ("electricity", "ZZ", None, None),
+    ("diesel", "default", None, None),
+    ("car_petrol", "default", "small", None),
+    ("flight_long", "default", "business", None),
+    ("spend_services", "default", None, "consulting"),
+    ("spend_services", "default", None, "default"),
+    ("spend_transport", "default", None, None),
+]
+
+
+def nested_lookup(
+    factors: Dict[str, Dict],
+    activity_type: str,
+    country: str = "default",
+    variant: Optional[str] = None,
+    sub_category: Optional[str] = None
+) -> float:
+    """Resolve a factor by walking the raw dataset table."""
+    if activity_type not in factors:
+        raise ValueError(f"Unknown activity type: {activity_type}")
+    factor_data = factors[activity_type]
+    
+    if "factors" in factor_data:
+        table = factor_data["factors"]
+        key = sub_category if factor_data.get("factors_by") == "sub_category" else country
+        if key in table:
+            return float(table[key])
+        return float(table.get("default", factor_data.get("factor")))
+    
+    if "variants" in factor_data:
+        table = factor_data["variants"]
+        if variant in table:
+            return float(table[variant])
+        return float(table.get("default", factor_data.get("factor")))
+    
+    return float(factor_data["factor"])
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark emission factor lookups.")
+    parser.add_argument("--calls", type=int, default=100000, help="Iterations over the case list")
+    args = parser.parse_args(argv)
+    
+    factors = get_factor_dataset().factors
+    for case in CASES:
+        expected = nested_lookup(factors, *case)
+        actual = get_emission_factor(*case)
+        if expected != actual:
+            print(f"Mismatch for {case}: nested {expected}, indexed {actual}", file=sys.stderr)
+            return 1
+    
+    for name, lookup in (
+        ("nested", lambda case: nested_lookup(factors, *case)),
+        ("indexed", lambda case: get_emission_factor(*case)),
+    ):
+        seconds = timeit.timeit(lambda: [lookup(case) for case in CASES], number=args.calls)
+        print(f"{name:8} {seconds / (args.calls * len(CASES)) * 1e9:6.0f} ns/call")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
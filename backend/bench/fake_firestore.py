@@ -0,0 +1,189 @@
+"""
+In-Memory Firestore
+===================
+
+A stand-in for the subset of the synchronous Firestore client used by
+ESGDatabaseService: documents and subcollections, get/set/merge/delete,
+equality queries with select(), get_all() and write batches.
+
+Every remote call (document read, query, get_all, batch commit) blocks for
+`latency` seconds, like a network round trip, so benchmarks see the same
+blocking behaviour as the real client.
+
+Usage:
+    from backend.bench import fake_firestore
+    client = fake_firestore.install(latency=0.05)
+    db_service = get_db_service()  # Now backed by the in-memory store
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import copy
+import threading
+import time
+
+from firebase_admin import firestore
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id: str, data: Optional[Dict], field_paths: Optional[List[str]] = None):
+        self.id = doc_id
+        self.exists = data is not None
+        if data is not None and field_paths:
+            data = {key: value for key, value in data.items() if key in field_paths}
+        self._data = copy.deepcopy(data)
+    
+    def to_dict(self) -> Optional[Dict]:
+        return self._data
+
+
+class FakeDocument:
+    def __init__(self, client: "FakeFirestore", path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+    
+    def collection(self, name: str) -> "FakeCollection":
+        return FakeCollection(self._client, f"{self.path}/{name}")
+    
+    def get(self, field_paths: Optional[List[str]] = None) -> FakeSnapshot:
+        self._client.round_trip()
+        return self._client.snapshot(self.path, field_paths)
+    
+    def set(self, data: Dict, merge: bool = False) -> None:
+        self._client.round_trip()
+        self._client.apply([(self.path, "set", data, merge)])
+    
+    def delete(self) -> None:
+        self._client.round_trip()
+        self._client.apply([(self.path, "delete", None, False)])
+    
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, FakeDocument) and other.path == self.path
+    
+    def __hash__(self) -> int:
+        return hash(self.path)
+
+
+class FakeCollection:
+    def __init__(self, client: "FakeFirestore", path: str, filters=(), fields=None):
+        self._client = client
+        self.path = path
+        self._filters: Tuple = tuple(filters)
+        self._fields: Optional[List[str]] = fields
+    
+    def document(self, doc_id: str) -> FakeDocument:
+        return FakeDocument(self._client, f"{self.path}/{doc_id}")
+    
+    def where(self, field: str, op: str, value: Any) -> "FakeCollection":
+        if op != "==":
+            raise NotImplementedError(f"Unsupported query operator: {op}")
+        return FakeCollection(self._client, self.path, self._filters + ((field, value),), self._fields)
+    
+    def select(self, fields: List[str]) -> "FakeCollection":
+        return FakeCollection(self._client, self.path, self._filters, list(fields))
+    
+    def stream(self) -> Iterator[FakeSnapshot]:
+        self._client.round_trip()
+        for path in self._client.children(self.path):
+            data = self._client.documents.get(path)
+            if data is not None and all(data.get(field) == value for field, value in self._filters):
+                self._client.reads += 1
+                yield FakeSnapshot(path.rsplit("/", 1)[-1], data, self._fields)
+
+
+class FakeBatch:
+    def __init__(self, client: "FakeFirestore"):
+        self._client = client
+        self._operations: List[Tuple[str, str, Optional[Dict], bool]] = []
+    
+    def set(self, ref: FakeDocument, data: Dict, merge: bool = False) -> None:
+        self._operations.append((ref.path, "set", data, merge))
+    
+    def delete(self, ref: FakeDocument) -> None:
+        self._operations.append((ref.path, "delete", None, False))
+    
+    def commit(self) -> None:
+        if len(self._operations) > 500:
+            raise ValueError("A write batch holds at most 500 operations")
+        self._client.round_trip()
+        self._client.apply(self._operations)
+
+
+class FakeFirestore:
+    """In-memory document store with simulated round-trip latency."""
+    
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.documents: Dict[str, Dict] = {}
+        self.round_trips = 0
+        self.reads = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+    
+    def round_trip(self) -> None:
+        with self._lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+    
+    def snapshot(self, path: str, field_paths: Optional[List[str]] = None) -> FakeSnapshot:
+        with self._lock:
+            self.reads += 1
+            return FakeSnapshot(path.rsplit("/", 1)[-1], self.documents.get(path), field_paths)
+    
+    def children(self, collection_path: str) -> List[str]:
+        with self._lock:
+            return [path for path in self.documents if path.rsplit("/", 1)[0] == collection_path]
+    
+    def apply(self, operations: List[Tuple[str, str, Optional[Dict], bool]]) -> None:
+        with self._lock:
+            for path, kind, data, merge in operations:
+                self.writes += 1
+                if kind == "delete":
+                    self.documents.pop(path, None)
+                elif merge and path in self.documents:
+                    _merge(self.documents[path], data)
+                else:
+                    document: Dict = {}
+                    _merge(document, data)
+                    self.documents[path] = document
+    
+    # Client API
+    
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+    
+    def document(self, path: str) -> FakeDocument:
+        return FakeDocument(self, path)
+    
+    def get_all(self, refs: List[FakeDocument], field_paths: Optional[List[str]] = None) -> Iterator[FakeSnapshot]:
+        self.round_trip()
+        for ref in refs:
+            yield self.snapshot(ref.path, field_paths)
+    
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+
+def _merge(target: Dict, data: Dict) -> None:
+    for key, value in data.items():
+        if value is firestore.DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+
+
+def install(latency: float = 0.0) -> FakeFirestore:
+    """
+    Make the backend use a fresh in-memory store as its Firestore client.
+    
+    Call before the database service singleton is created.
+    """
+    from .. import database, firebase_config
+    
+    client = FakeFirestore(latency)
+    firebase_config._db = client
+    database._db_service = None
+    return client
@@ -0,0 +1,69 @@
+"""
+Report Serialization Benchmark
+==============================
+
+Compares two ways of answering GET /report/{year} for a large demo
+report:
+
+- response_model: the endpoint returns the ESGReport and FastAPI validates
+  and serializes the pydantic tree on every request
+- pre-serialized: the real /report/{year} endpoint, which returns the
+  cached JSON bytes with an ETag
+
+Both responses must decode to the same JSON. --scale multiplies the demo
+report's records (DEMO_DATA_SCALE); the default of 2000 gives 10k rows.
+
+Usage:
+    python -m backend.bench.report_json --scale 2000 --requests 20
+"""
+
+from typing import List
+import argparse
+import os
+import sys
+import time
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark /report/{year} serialization.")
+    parser.add_argument("--scale", type=int, default=2000, help="Demo data scale (DEMO_DATA_SCALE)")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per variant")
+    parser.add_argument("--year", type=int, default=2024, help="Reporting year")
+    args = parser.parse_args(argv)
+    
+    # Read by the database module at import time
+    os.environ["DEMO_DATA_SCALE"] = str(args.scale)
+    from fastapi.testclient import TestClient
+    from ..database import get_db_service
+    from ..main import app
+    from ..models import ESGReport
+    
+    @app.get("/bench/report/{year}", response_model=ESGReport, include_in_schema=False)
+    async def report_via_response_model(year: int):
+        return await get_db_service().get_report(year)
+    
+    client = TestClient(app)
+    report = get_db_service()._generate_mock_report(args.year)
+    rows = len(report.energy_data) + len(report.emissions_data) + len(report.water_data)
+    
+    baseline = client.get(f"/bench/report/{args.year}")
+    fast = client.get(f"/report/{args.year}")
+    if baseline.json() != fast.json():
+        print("Responses differ", file=sys.stderr)
+        return 1
+    print(f"{rows} rows, {len(fast.content)} bytes")
+    
+    for name, url in (
+        ("response_model", f"/bench/report/{args.year}"),
+        ("pre-serialized", f"/report/{args.year}"),
+    ):
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            client.get(url)
+        seconds = (time.perf_counter() - started) / args.requests
+        print(f"{name:15} {seconds * 1000:7.1f} ms/request {1 / seconds:7.1f} req/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
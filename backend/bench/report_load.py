@@ -0,0 +1,87 @@
+"""
+Report Load Test
+================
+
+Fires concurrent GET /report/{year} requests at the API (in process, over
+httpx's ASGI transport) backed by the in-memory Firestore stand-in, where
+every remote call blocks for --latency-ms like a network round trip.
+
+The report cache is disabled so every request reaches Firestore. With
+--blocking the Firestore calls run inline on the event loop instead of in
+the bounded thread pool, which reproduces the service before the calls
+were offloaded.
+
+Usage:
+    python -m backend.bench.report_load --requests 200 --latency-ms 50
+    python -m backend.bench.report_load --requests 200 --latency-ms 50 --blocking
+"""
+
+from typing import List
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+
+from . import fake_firestore
+from ..cache import TTLCache
+
+
+async def run_load(app, year: int, requests: int) -> List[float]:
+    """
+    Send the requests at once and return each one's latency in seconds.
+    
+    Latency is counted from the moment all requests were issued, so time
+    spent waiting behind a blocked event loop is included.
+    """
+    latencies: List[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        
+        async def one() -> None:
+            response = await client.get(f"/report/{year}")
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+        
+        await asyncio.gather(*(one() for _ in range(requests)))
+    return sorted(latencies)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test GET /report/{year} against a slow Firestore stand-in.")
+    parser.add_argument("--requests", type=int, default=200, help="Concurrent requests")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Simulated Firestore round trip")
+    parser.add_argument("--year", type=int, default=2024, help="Reporting year")
+    parser.add_argument("--blocking", action="store_true", help="Run Firestore calls on the event loop")
+    args = parser.parse_args(argv)
+    
+    client = fake_firestore.install()
+    from ..database import get_db_service
+    from ..main import app
+    
+    db_service = get_db_service()
+    asyncio.run(db_service.save_report(db_service._generate_mock_report(args.year)))
+    db_service.report_cache = TTLCache(ttl_seconds=0)
+    if args.blocking:
+        async def run_inline(func, *call_args, **kwargs):
+            return func(*call_args, **kwargs)
+        db_service._run = run_inline
+    
+    client.latency = args.latency_ms / 1000
+    started = time.perf_counter()
+    latencies = asyncio.run(run_load(app, args.year, args.requests))
+    wall = time.perf_counter() - started
+    
+    count = len(latencies)
+    print(
+        f"{'blocking' if args.blocking else 'offloaded'}: {count} requests in {wall:.2f}s, "
+        f"p50 {latencies[count // 2] * 1000:.0f} ms, "
+        f"p99 {latencies[max(0, int(count * 0.99) - 1)] * 1000:.0f} ms"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+XBRL Generation Benchmark
+=========================
+
+Times VSME XBRL instance generation for large multi-entity instances:
+
+- cached template: the compiled template from get_xbrl_template()
+- recompiled: the taxonomy loaded and compiled for every instance
+- ElementTree: the same instance built as a whole DOM, then serialized
+
+The template pays off most for the many small instances of a submission
+window, so single-entity instances are timed as well.
+
+The entities carry random values for every concept. The run also
+records peak memory of the streamed and DOM builds, and times
+stream_xbrl_instance end to end over demo-mode reports.
+
+Usage:
+    python -m backend.bench.xbrl_generation --entities 500 --instances 200
+"""
+
+from datetime import date
+from typing import Dict, Iterator, List
+import argparse
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+from ..database import get_db_service
+from ..xbrl import EntityMeasures, XBRLTemplate, get_xbrl_template, load_taxonomy, stream_xbrl_instance
+
+_XBRLI = "http://www.xbrl.org/2003/instance"
+
+
+def random_entities(taxonomy: Dict, count: int, year: int, seed: int = 1) -> List[EntityMeasures]:
+    rng = random.Random(seed)
+    measures = [concept["measure"] for concept in taxonomy["concepts"]]
+    entities = []
+    for index in range(count):
+        entity = EntityMeasures(f"company-{index}", year)
+        entity.values = {measure: rng.uniform(0, 1e6) for measure in measures}
+        entity.instant = date(year, 12, 31)
+        entities.append(entity)
+    return entities
+
+
+def render(template: XBRLTemplate, entities: List[EntityMeasures]) -> Iterator[bytes]:
+    """The byte chunks stream_xbrl_instance sends for already aggregated entities."""
+    yield template.prologue
+    for index, entity in enumerate(entities):
+        yield template.entity_block(index, entity)
+    yield template.epilogue
+
+
+def render_dom(taxonomy: Dict, entities: List[EntityMeasures]) -> bytes:
+    """The same instance built as an ElementTree and serialized at the end."""
+    namespace = taxonomy["namespace"]
+    root = ET.Element(f"{{{_XBRLI}}}xbrl")
+    for unit_id, measure in taxonomy["units"].items():
+        unit = ET.SubElement(root, f"{{{_XBRLI}}}unit", id=unit_id)
+        ET.SubElement(unit, f"{{{_XBRLI}}}measure").text = measure
+    for index, entity in enumerate(entities):
+        year = entity.year
+        for context_id, instant in ((f"D{index}", False), (f"I{index}", True)):
+            context = ET.SubElement(root, f"{{{_XBRLI}}}context", id=context_id)
+            identity = ET.SubElement(context, f"{{{_XBRLI}}}entity")
+            identifier = ET.SubElement(identity, f"{{{_XBRLI}}}identifier", scheme="urn:bench")
+            identifier.text = entity.entity_id
+            period = ET.SubElement(context, f"{{{_XBRLI}}}period")
+            if instant:
+                ET.SubElement(period, f"{{{_XBRLI}}}instant").text = entity.instant.isoformat()
+            else:
+                ET.SubElement(period, f"{{{_XBRLI}}}startDate").text = f"{year}-01-01"
+                ET.SubElement(period, f"{{{_XBRLI}}}endDate").text = f"{year}-12-31"
+        for concept in taxonomy["concepts"]:
+            decimals = int(concept.get("decimals", 0))
+            fact = ET.SubElement(
+                root,
+                f"{{{namespace}}}{concept['name']}",
+                contextRef=f"{'I' if concept['period'] == 'instant' else 'D'}{index}",
+                unitRef=concept["unit"],
+                decimals=str(decimals),
+            )
+            value = entity.values[concept["measure"]] * concept.get("scale", 1.0)
+            fact.text = f"{value:.{decimals}f}"
+    return ET.tostring(root, xml_declaration=True, encoding="UTF-8")
+
+
+def _timed(label: str, instances: int, build) -> None:
+    started = time.perf_counter()
+    for _ in range(instances):
+        build()
+    seconds = time.perf_counter() - started
+    print(f"{label:24} {seconds:6.2f}s {seconds / instances * 1000:8.3f} ms/instance")
+
+
+def _peak_mb(build) -> float:
+    tracemalloc.start()
+    try:
+        build()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+async def _end_to_end(year: int, companies: int) -> None:
+    db_service = get_db_service()
+    company_ids = [f"company-{index}" for index in range(companies)]
+    for company_id in company_ids:
+        db_service._generate_mock_report(year, company_id)  # Warm the demo report cache
+    
+    started = time.perf_counter()
+    size = 0
+    async for chunk in stream_xbrl_instance(db_service, year, company_ids):
+        size += len(chunk)
+    seconds = time.perf_counter() - started
+    print(f"end to end: {companies} demo reports in {seconds * 1000:.0f} ms, {size / 1e3:.0f} KB")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark VSME XBRL instance generation.")
+    parser.add_argument("--entities", type=int, default=500, help="Entities per instance")
+    parser.add_argument("--instances", type=int, default=200, help="Instances generated per variant")
+    parser.add_argument("--companies", type=int, default=100, help="Demo reports in the end-to-end run")
+    parser.add_argument("--year", type=int, default=2024, help="Reporting year")
+    args = parser.parse_args(argv)
+    
+    taxonomy = load_taxonomy()
+    entities = random_entities(taxonomy, args.entities, args.year)
+    size = sum(len(chunk) for chunk in render(get_xbrl_template(), entities))
+    print(f"{args.instances} instances of {args.entities} entities ({size / 1e6:.2f} MB each)")
+    
+    _timed("cached template", args.instances, lambda: b"".join(render(get_xbrl_template(), entities)))
+    _timed("recompiled", args.instances, lambda: b"".join(render(XBRLTemplate(load_taxonomy()), entities)))
+    _timed("ElementTree", max(1, args.instances // 4), lambda: render_dom(taxonomy, entities))
+    
+    # Per-instance taxonomy work dominates small instances
+    single = entities[:1]
+    _timed("cached, 1 entity", args.instances * 25, lambda: b"".join(render(get_xbrl_template(), single)))
+    _timed("recompiled, 1 entity", args.instances * 25, lambda: b"".join(render(XBRLTemplate(load_taxonomy()), single)))
+    
+    def drain_stream() -> None:
+        for _ in render(get_xbrl_template(), entities):
+            pass
+    
+    print(f"peak memory: streamed {_peak_mb(drain_stream):.2f} MB, "
+          f"ElementTree {_peak_mb(lambda: render_dom(taxonomy, entities)):.2f} MB")
+    
+    asyncio.run(_end_to_end(args.year, args.companies))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
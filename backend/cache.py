@@ -0,0 +1,112 @@
+"""
+In-Process Caching
+==================
+
+Small LRU cache with per-entry time-to-live, used to avoid repeated
+Firestore reads for data that changes rarely (e.g. ESG reports).
+
+Counters for hits, misses and evictions are kept so the read savings can
+be monitored through the API.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+import threading
+import time
+
+
+class TTLCache:
+    """LRU cache with a time-to-live per entry and hit/miss counters."""
+    
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """
+        Return the cached value for key like get(), without counting a hit
+        or miss or refreshing its LRU position. For opportunistic lookups
+        that fall back to another key.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            return entry[0]
+    
+    def token(self) -> int:
+        """
+        Return a token to pass to set() for read-through loads.
+        
+        If any invalidation happens between taking the token and calling
+        set(), the load may have read stale data and is not cached.
+        """
+        return self._epoch
+    
+    def set(self, key: Hashable, value: Any, token: Optional[int] = None) -> bool:
+        """Store a value, evicting the least recently used entry if full."""
+        with self._lock:
+            if token is not None and token != self._epoch:
+                return False
+            
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+    
+    def invalidate(self, key: Hashable) -> bool:
+        """Remove a key from the cache. Returns True if it was present."""
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += 1
+            return self._entries.pop(key, None) is not None
+    
+    def clear(self) -> None:
+        """Remove all entries (counters are kept)."""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        """Get cache counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
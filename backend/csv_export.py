@@ -0,0 +1,206 @@
+"""
+CSV Export
+==========
+
+Streams a report year as one flat CSV file for analysis in spreadsheets
+and BI tools.
+
+Every record becomes one row with a shared set of columns (blank where a
+column does not apply to the module):
+
+- energy: one row per consumption record (quantity in kWh)
+- emissions: one row per emissions record (co2e_tonnes per scope), followed
+  by one emission_activity row per activity input behind it (quantity in
+  the emission factor's unit), linked by parent_id
+- water: one row per withdrawal record (quantity in m3)
+- workforce: one row per headcount metric
+- scope3: one row per category (quantity is the spend amount)
+
+Modules are read one stored chunk at a time (see
+ESGDatabaseService.iter_report_module) and rows are encoded into a small
+buffer that is flushed every CSV_EXPORT_FLUSH_BYTES, so memory stays
+constant however large the tenant. With compress=True the same stream is
+gzip-compressed incrementally.
+"""
+
+from datetime import date
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
+import csv
+import io
+import os
+import zlib
+
+from .emission_factors import get_factor_dataset
+from .models import EmployeeMetrics
+
+# Encoded bytes buffered before a chunk is sent to the client
+CSV_EXPORT_FLUSH_BYTES = int(os.getenv("CSV_EXPORT_FLUSH_BYTES", str(64 * 1024)))
+
+CSV_EXPORT_COLUMNS = (
+    "module",
+    "record_id",
+    "parent_id",
+    "period_start",
+    "period_end",
+    "category",
+    "quantity",
+    "unit",
+    "co2e_tonnes",
+    "methodology",
+    "factor_version",
+    "country",
+    "variant",
+    "sub_category",
+    "source_document",
+)
+
+# Export order of the report modules
+CSV_EXPORT_MODULES = ("energy", "emissions", "water", "workforce", "scope3")
+
+_WORKFORCE_METRICS = ("total_headcount", "female_count", "male_count", "other_gender_count")
+
+
+def _iso(value: Optional[date]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+# ==================== Row Builders ====================
+
+def _energy_rows(records) -> Iterator[tuple]:
+    for e in records:
+        yield (
+            "energy", e.id, None, _iso(e.period_start), _iso(e.period_end),
+            e.fuel_type.value, e.consumption_kwh, "kWh", None, None, None,
+            None, None, None, e.source_document,
+        )
+
+
+def _emissions_rows(records, units: Dict[Optional[str], Dict]) -> Iterator[tuple]:
+    for e in records:
+        start, end = _iso(e.period_start), _iso(e.period_end)
+        yield (
+            "emissions", e.id, None, start, end,
+            e.scope.value, None, None, e.co2e_tonnes, e.methodology, e.factor_version,
+            None, None, None, None,
+        )
+        if not e.activities:
+            continue
+        metadata = _factor_metadata(units, e.factor_version)
+        for activity in e.activities:
+            unit = metadata.get(activity.activity_type)
+            yield (
+                "emission_activity", None, e.id, start, end,
+                activity.activity_type, activity.quantity, unit[0] if unit else None,
+                None, None, e.factor_version,
+                activity.country, activity.variant, activity.sub_category, None,
+            )
+
+
+def _water_rows(records) -> Iterator[tuple]:
+    for w in records:
+        yield (
+            "water", w.id, None, _iso(w.period_start), _iso(w.period_end),
+            "withdrawal", w.volume_m3, "m3", None, None, None,
+            None, None, None, w.source_document,
+        )
+
+
+def _workforce_rows(records: List[EmployeeMetrics]) -> Iterator[tuple]:
+    for e in records:
+        for metric in _WORKFORCE_METRICS:
+            yield (
+                "workforce", None, None, None, _iso(e.period_end),
+                metric, getattr(e, metric), "employees", None, None, None,
+                None, None, None, None,
+            )
+
+
+def _scope3_rows(records) -> Iterator[tuple]:
+    for s in records:
+        yield (
+            "scope3", None, None, None, None,
+            s.category_name, s.spend_amount, "spend", s.estimated_co2e, "Spend-based", None,
+            None, None, None, None,
+        )
+
+
+def _factor_metadata(units: Dict[Optional[str], Dict], version: Optional[str]) -> Dict:
+    """(unit, scope) per activity type of a factor dataset, resolved once per export."""
+    if version not in units:
+        try:
+            units[version] = get_factor_dataset(version).metadata
+        except ValueError:
+            units[version] = {}  # Dataset since retired: export without units
+    return units[version]
+
+
+# ==================== Streaming ====================
+
+class _CSVEncoder:
+    """csv.writer over a reusable text buffer, drained as encoded bytes."""
+    
+    def __init__(self, compress: bool):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\r\n")
+        # wbits=31: gzip container, so the output is a valid .csv.gz file
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    
+    def write_rows(self, rows: Iterable[tuple]) -> None:
+        self._writer.writerows(rows)
+    
+    def pending(self) -> int:
+        return self._buffer.tell()
+    
+    def drain(self) -> bytes:
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        return data
+    
+    def finish(self) -> bytes:
+        data = self.drain()
+        if self._compressor is not None:
+            data += self._compressor.flush()
+        return data
+
+
+async def iter_report_csv(
+    db_service,
+    year: int,
+    company_id: str = "default",
+    compress: bool = False,
+    flush_bytes: int = CSV_EXPORT_FLUSH_BYTES
+) -> AsyncIterator[bytes]:
+    """
+    Yield a report year as CSV bytes (gzip-compressed if compress).
+    
+    The header row is sent before any module is read, so an uncompressed
+    download starts immediately.
+    """
+    encoder = _CSVEncoder(compress)
+    encoder.write_rows([CSV_EXPORT_COLUMNS])
+    data = encoder.drain()
+    if data:
+        yield data
+    
+    units: Dict[Optional[str], Dict] = {}
+    row_builders = {
+        "energy": _energy_rows,
+        "emissions": lambda records: _emissions_rows(records, units),
+        "water": _water_rows,
+        "workforce": _workforce_rows,
+        "scope3": _scope3_rows,
+    }
+    for module in CSV_EXPORT_MODULES:
+        async for records in db_service.iter_report_module(year, module, company_id):
+            encoder.write_rows(row_builders[module](records))
+            if encoder.pending() >= flush_bytes:
+                data = encoder.drain()
+                if data:
+                    yield data
+    
+    data = encoder.finish()
+    if data:
+        yield data
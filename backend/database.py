@@ -4,26 +4,156 @@ Database Service Layer for ESG Data
 
 Provides CRUD operations for ESG reports using Firestore.
 Falls back to mock data when Firebase is not configured.
+
+The Firestore client is synchronous, so every call is offloaded to a
+bounded thread pool to keep the event loop responsive. The pool size is
+configurable via the FIRESTORE_MAX_WORKERS environment variable.
+
+Report reads go through an in-process read-through cache keyed by
+(company_id, year), bounded by REPORT_CACHE_MAX_ENTRIES and expiring after
+REPORT_CACHE_TTL_SECONDS. Every write path invalidates the cached report.
+The report's serialized JSON bytes and ETag are cached the same way, so
+GET /report/{year} can be answered without touching pydantic at all.
+
+Storage layout: each report is a parent document `{company_id}_{year}`
+holding only metadata (year, company and the module layout). The modules
+(energy, emissions, water, workforce, scope 3) live in the `modules`
+subcollection, split into chunk documents of at most
+REPORT_MODULE_CHUNK_SIZE records, so no tenant hits Firestore's 1 MiB
+document limit and a module can be read or rewritten on its own. Legacy
+documents holding the whole report are still read, and are migrated module
+by module as they are written.
+
+A per-company index document in `esg_report_index` (year, last_updated,
+record counts per module) is updated in the same batch as every report
+write, so listing a company's reports is a single small read.
+
+bulk_save_reports() packs many reports into WriteBatches and commits them
+concurrently (BULK_WRITE_CONCURRENCY) for backfills; see backfill.py.
+
+Every write path also writes the monthly rollups (see rollups.py) in the
+same batches: one document per source under `esg_rollups/{company_id}_{year}`
+in the `sources` subcollection. Report totals are served from the
+in-process rollup index, which loads a year from those documents when it
+is missing or older than ROLLUP_CACHE_TTL_SECONDS, so writes made by other
+workers are picked up. Years written before rollups were persisted are
+seeded from the report on first read.
+
+ERP sync state is stored per company and provider in
+`integration_sync_state/{company_id}_{provider}`: the incremental cursors,
+the aggregates and a ledger of what every synced invoice contributed,
+sharded by invoice month into `ledger` chunk documents. Syncs run in
+worker threads, so these methods call Firestore directly (blocking). In
+demo mode the state is kept in memory.
 """
 
-from datetime import date
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import copy
+import functools
+import os
 import random
+import time
 import uuid
 
+from firebase_admin import firestore
+
+from .cache import TTLCache
+from .emission_factors import get_emission_factor, version_for_year
+from .http_cache import etag_for
 from .firebase_config import get_firestore_client, is_firebase_configured
+from .rollups import (
+    REPORT_MODULES,
+    Cells,
+    decode_cells,
+    encode_cells,
+    get_rollup_index,
+    report_module_cells,
+    report_source,
+    sync_source,
+)
 from .models import (
-    ESGReport, EnergyConsumption, GHGEmissions, WaterUsage,
+    ESGReport, EnergyConsumption, GHGEmissions, EmissionActivity, WaterUsage,
     EmployeeMetrics, Scope3Category, FuelType, ScopeType
 )
 
+# Maximum number of concurrent blocking Firestore calls per process
+FIRESTORE_MAX_WORKERS = int(os.getenv("FIRESTORE_MAX_WORKERS", "16"))
+
+# Read-through report cache settings
+REPORT_CACHE_TTL_SECONDS = float(os.getenv("REPORT_CACHE_TTL_SECONDS", "300"))
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "512"))
+
+# Records per module chunk document (Firestore caps documents at 1 MiB)
+REPORT_MODULE_CHUNK_SIZE = int(os.getenv("REPORT_MODULE_CHUNK_SIZE", "1000"))
+
+# Firestore accepts at most 500 writes per batch
+FIRESTORE_BATCH_LIMIT = 500
+
+# Demo mode: sites per generated report (raise for synthetic load-test
+# tenants) and number of generated reports kept in memory
+DEMO_DATA_SCALE = max(1, int(os.getenv("DEMO_DATA_SCALE", "1")))
+DEMO_REPORT_CACHE_SIZE = int(os.getenv("DEMO_REPORT_CACHE_SIZE", "64"))
+
+# Bulk ingestion: concurrent batch commits, and documents per batched read
+BULK_WRITE_CONCURRENCY = int(os.getenv("BULK_WRITE_CONCURRENCY", "8"))
+BULK_READ_CHUNK_SIZE = 300
+
+MODULE_SUBCOLLECTION = "modules"
+
+# Rollups loaded from Firestore are re-read after this many seconds
+ROLLUP_CACHE_TTL_SECONDS = float(os.getenv("ROLLUP_CACHE_TTL_SECONDS", "60"))
+ROLLUP_SUBCOLLECTION = "sources"
+
+# ERP sync state: ledger entries per chunk document (about 150 bytes each)
+SYNC_LEDGER_CHUNK_SIZE = int(os.getenv("SYNC_LEDGER_CHUNK_SIZE", "2000"))
+SYNC_LEDGER_SUBCOLLECTION = "ledger"
+
+# Report modules by API name -> ESGReport field
+REPORT_MODULE_FIELDS = {
+    "energy": "energy_data",
+    "emissions": "emissions_data",
+    "water": "water_data",
+    "workforce": "employee_data",
+    "scope3": "scope_3_data",
+}
+
+# Modules the VSME basic module requires (scope 3 is optional)
+VSME_REQUIRED_MODULES = ("energy", "emissions", "water", "workforce")
+
 
 class ESGDatabaseService:
     """Service class for ESG data operations."""
     
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None):
         self.db = get_firestore_client()
         self.collection_name = "esg_reports"
+        self.index_collection_name = "esg_report_index"
+        self.sync_state_collection_name = "integration_sync_state"
+        self.rollups_collection_name = "esg_rollups"
+        # Demo mode: (company_id, provider) -> {"state": ..., "ledger": {month: entries}}
+        self._demo_sync_states: Dict[Tuple[str, str], Dict] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or FIRESTORE_MAX_WORKERS,
+            thread_name_prefix="firestore",
+        )
+        self.report_cache = TTLCache(
+            max_entries=REPORT_CACHE_MAX_ENTRIES,
+            ttl_seconds=REPORT_CACHE_TTL_SECONDS,
+        )
+        self.rollups = get_rollup_index()
+        # (company_id, year) -> True while the rollup index holds a fresh copy of the year
+        self.rollup_cache = TTLCache(
+            max_entries=REPORT_CACHE_MAX_ENTRIES,
+            ttl_seconds=ROLLUP_CACHE_TTL_SECONDS,
+        )
+    
+    async def _run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking Firestore call in the bounded thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
     
     async def get_report(self, year: int, company_id: str = "default") -> ESGReport:
         """
@@ -31,28 +161,154 @@ class ESGDatabaseService:
         Falls back to mock data if Firebase is not configured.
         """
         if not is_firebase_configured():
-            return self._generate_mock_report(year)
+            return self._generate_mock_report(year, company_id)
+        
+        cache_key = (company_id, year)
+        cached = self.report_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
         # Try to fetch from Firestore
-        doc_ref = self.db.collection(self.collection_name).document(f"{company_id}_{year}")
-        doc = doc_ref.get()
+        token = self.report_cache.token()
+        modules = await self._read_modules(year, company_id, list(REPORT_MODULE_FIELDS.values()))
         
-        if doc.exists:
-            return self._dict_to_report(doc.to_dict())
+        if modules is not None:
+            report = ESGReport(reporting_year=year, **modules)
+            self.report_cache.set(cache_key, report, token=token)
+            return report
         else:
             # Generate and save mock data for demo purposes
-            report = self._generate_mock_report(year)
+            report = self._generate_mock_report(year, company_id)
             await self.save_report(report, company_id)
             return report
     
+    async def get_report_json(self, year: int, company_id: str = "default") -> Tuple[bytes, str]:
+        """
+        Get the report serialized to JSON bytes, with its ETag.
+        
+        The bytes are cached next to the report, so repeated requests skip
+        both model construction and serialization. Writes invalidate them
+        together with the report.
+        """
+        if not is_firebase_configured():
+            return _demo_report_json(company_id, year, DEMO_DATA_SCALE)
+        
+        cache_key = (company_id, year, "json")
+        cached = self.report_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        token = self.report_cache.token()
+        serialized = serialize_report(await self.get_report(year, company_id))
+        self.report_cache.set(cache_key, serialized, token=token)
+        return serialized
+    
+    async def get_report_module(self, year: int, module: str, company_id: str = "default") -> Any:
+        """
+        Fetch a single report module (energy, emissions, water, workforce or scope3).
+        
+        Only the module's own documents are read, using a field mask on the
+        parent document, so a page showing one module never loads the rest.
+        """
+        if module not in REPORT_MODULE_FIELDS:
+            raise ValueError(
+                f"Unknown report module: {module}. Available: {', '.join(REPORT_MODULE_FIELDS)}"
+            )
+        field = REPORT_MODULE_FIELDS[module]
+        
+        if not is_firebase_configured():
+            return getattr(self._generate_mock_report(year, company_id), field)
+        
+        # A cached full report already holds the module (peek: the module
+        # key below is the lookup that counts towards the hit rate)
+        cached = self.report_cache.peek((company_id, year))
+        if cached is not None:
+            return getattr(cached, field)
+        
+        cache_key = (company_id, year, field)
+        cached = self.report_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        token = self.report_cache.token()
+        modules = await self._read_modules(year, company_id, [field])
+        if modules is None:
+            return getattr(await self.get_report(year, company_id), field)
+        
+        value = modules[field]
+        if value is not None:
+            self.report_cache.set(cache_key, value, token=token)
+        return value
+    
+    async def iter_report_module(
+        self,
+        year: int,
+        module: str,
+        company_id: str = "default"
+    ) -> AsyncIterator[List[Any]]:
+        """
+        Yield a report module's records one stored chunk at a time.
+        
+        Unlike get_report_module, chunk documents are read and decoded one
+        by one and nothing is cached, so streaming a very large module holds
+        at most REPORT_MODULE_CHUNK_SIZE records in memory. The workforce
+        module is yielded as a one-element list.
+        """
+        if module not in REPORT_MODULE_FIELDS:
+            raise ValueError(
+                f"Unknown report module: {module}. Available: {', '.join(REPORT_MODULE_FIELDS)}"
+            )
+        field = REPORT_MODULE_FIELDS[module]
+        
+        cached = self.report_cache.get((company_id, year)) if is_firebase_configured() else None
+        if not is_firebase_configured() or cached is not None:
+            value = getattr(cached or self._generate_mock_report(year, company_id), field)
+            if field == "employee_data":
+                value = [value] if value else []
+            for start in range(0, len(value), REPORT_MODULE_CHUNK_SIZE):
+                yield value[start:start + REPORT_MODULE_CHUNK_SIZE]
+            return
+        
+        report_ref = self._report_ref(year, company_id)
+        snapshot = await self._run(report_ref.get, field_paths=["modules", field])
+        if not snapshot.exists:
+            # Generates and saves the demo report, like get_report_module
+            value = getattr(await self.get_report(year, company_id), field)
+            yield ([value] if value else []) if field == "employee_data" else value
+            return
+        
+        data = snapshot.to_dict() or {}
+        layout = (data.get("modules") or {}).get(field)
+        if layout is None:
+            # Legacy layout: the module is a field of the parent document
+            legacy = data.get(field)
+            records = legacy if isinstance(legacy, list) else [legacy] if legacy else []
+            chunks = [records]
+        else:
+            chunks = self._chunk_refs(report_ref, field, layout["chunks"])
+        
+        from_dict = self._module_codecs[field][1]
+        for chunk in chunks:
+            if not isinstance(chunk, list):
+                doc = await self._run(chunk.get)
+                chunk = (doc.to_dict() or {}).get("records", []) if doc.exists else []
+            if chunk:
+                yield [from_dict(record) for record in chunk]
+    
     async def save_report(self, report: ESGReport, company_id: str = "default") -> bool:
         """Save an ESG report to Firestore."""
         if not is_firebase_configured():
             print("Firebase not configured - data not persisted")
             return False
         
-        doc_ref = self.db.collection(self.collection_name).document(f"{company_id}_{report.reporting_year}")
-        doc_ref.set(self._report_to_dict(report))
+        year = report.reporting_year
+        rollups = self._report_rollups(year, {module: getattr(report, module) for module in REPORT_MODULES})
+        await self._write_modules(year, company_id, {
+            field: self._encode_module(field, getattr(report, field))
+            for field in REPORT_MODULE_FIELDS.values()
+        }, rollups)
+        self._invalidate_report(company_id, year, REPORT_MODULE_FIELDS.values())
+        self._apply_rollups(company_id, year, rollups)
         return True
     
     async def save_energy_data(self, year: int, energy_data: List[EnergyConsumption], company_id: str = "default") -> bool:
@@ -60,10 +316,12 @@ class ESGDatabaseService:
         if not is_firebase_configured():
             return False
         
-        doc_ref = self.db.collection(self.collection_name).document(f"{company_id}_{year}")
-        doc_ref.update({
-            "energy_data": [self._energy_to_dict(e) for e in energy_data]
-        })
+        rollups = self._report_rollups(year, {"energy_data": energy_data})
+        await self._write_modules(year, company_id, {
+            "energy_data": self._encode_module("energy_data", energy_data)
+        }, rollups)
+        self._invalidate_report(company_id, year, ["energy_data"])
+        self._apply_rollups(company_id, year, rollups)
         return True
     
     async def save_emissions_data(self, year: int, emissions_data: List[GHGEmissions], company_id: str = "default") -> bool:
@@ -71,48 +329,614 @@ class ESGDatabaseService:
         if not is_firebase_configured():
             return False
         
-        doc_ref = self.db.collection(self.collection_name).document(f"{company_id}_{year}")
-        doc_ref.update({
-            "emissions_data": [self._emissions_to_dict(e) for e in emissions_data]
-        })
+        rollups = self._report_rollups(year, {"emissions_data": emissions_data})
+        await self._write_modules(year, company_id, {
+            "emissions_data": self._encode_module("emissions_data", emissions_data)
+        }, rollups)
+        self._invalidate_report(company_id, year, ["emissions_data"])
+        self._apply_rollups(company_id, year, rollups)
         return True
     
+    async def bulk_save_reports(
+        self,
+        reports: Iterable[Tuple[str, ESGReport]],
+        max_concurrency: Optional[int] = None
+    ) -> Dict:
+        """
+        Save many (company_id, report) pairs with batched, pipelined commits.
+        
+        Current module layouts are fetched with batched reads, then the
+        writes of whole reports are packed into WriteBatches of at most
+        FIRESTORE_BATCH_LIMIT operations (a report never straddles two
+        batches, and each company's index is merged once per batch). Up to
+        max_concurrency batches are committed at once.
+        
+        A failed batch does not stop the others; its reports are listed in
+        failed_reports.
+        
+        Returns:
+            Dict with report, batch and operation counts, failures, elapsed
+            seconds and throughput
+        """
+        started = time.perf_counter()
+        # Last write wins for duplicate (company, year) pairs
+        pending = {(company_id, report.reporting_year): report for company_id, report in reports}
+        
+        stats = {
+            "reports": len(pending),
+            "persisted": False,
+            "batches": 0,
+            "operations": 0,
+            "failed_reports": [],
+            "errors": [],
+        }
+        if not is_firebase_configured():
+            print("Firebase not configured - data not persisted")
+            return self._throughput(stats, started)
+        
+        layouts: Dict[str, Dict] = {}
+        refs = [self._report_ref(year, company_id) for company_id, year in pending]
+        for start in range(0, len(refs), BULK_READ_CHUNK_SIZE):
+            docs = await self._run(list, self.db.get_all(refs[start:start + BULK_READ_CHUNK_SIZE], field_paths=["modules"]))
+            for doc in docs:
+                if doc.exists:
+                    layouts[doc.id] = (doc.to_dict() or {}).get("modules") or {}
+        
+        batches: List[Tuple[List[tuple], List[Tuple[str, int]]]] = []
+        oversized: List[Tuple[str, ESGReport]] = []
+        operations: List[tuple] = []
+        batch_reports: List[Tuple[str, int]] = []
+        index_entries: Dict[str, List[Dict]] = {}
+        
+        def flush():
+            if batch_reports:
+                batch_operations = operations + [
+                    self._index_operation(company_id, entries)
+                    for company_id, entries in index_entries.items()
+                ]
+                batches.append((batch_operations, list(batch_reports)))
+            operations.clear()
+            batch_reports.clear()
+            index_entries.clear()
+        
+        rollups: Dict[Tuple[str, int], Dict[str, Cells]] = {}
+        for (company_id, year), report in pending.items():
+            modules = {
+                field: self._encode_module(field, getattr(report, field))
+                for field in REPORT_MODULE_FIELDS.values()
+            }
+            report_operations, index_entry = self._module_operations(
+                year, company_id, modules, layouts.get(f"{company_id}_{year}", {})
+            )
+            rollups[(company_id, year)] = self._report_rollups(
+                year, {module: getattr(report, module) for module in REPORT_MODULES}
+            )
+            report_operations += self._rollup_operations(company_id, year, rollups[(company_id, year)])
+            if len(report_operations) + 1 > FIRESTORE_BATCH_LIMIT:
+                oversized.append((company_id, report))
+                continue
+            
+            needed = len(report_operations) + (0 if company_id in index_entries else 1)
+            if len(operations) + len(index_entries) + needed > FIRESTORE_BATCH_LIMIT:
+                flush()
+            operations.extend(report_operations)
+            index_entries.setdefault(company_id, []).append(index_entry)
+            batch_reports.append((company_id, year))
+        flush()
+        
+        semaphore = asyncio.Semaphore(max_concurrency or BULK_WRITE_CONCURRENCY)
+        succeeded: List[Tuple[str, int]] = []
+        
+        async def commit(batch_operations: List[tuple], keys: List[Tuple[str, int]]):
+            async with semaphore:
+                try:
+                    await self._commit(batch_operations)
+                except Exception as e:
+                    stats["failed_reports"].extend({"company_id": c, "year": y} for c, y in keys)
+                    stats["errors"].append(str(e))
+                    return
+                stats["batches"] += 1
+                stats["operations"] += len(batch_operations)
+                succeeded.extend(keys)
+        
+        async def write_oversized(company_id: str, report: ESGReport):
+            async with semaphore:
+                try:
+                    await self.save_report(report, company_id)
+                except Exception as e:
+                    stats["failed_reports"].append({"company_id": company_id, "year": report.reporting_year})
+                    stats["errors"].append(str(e))
+        
+        await asyncio.gather(
+            *(commit(batch_operations, keys) for batch_operations, keys in batches),
+            *(write_oversized(company_id, report) for company_id, report in oversized),
+        )
+        
+        for company_id, year in succeeded:
+            self._invalidate_report(company_id, year, REPORT_MODULE_FIELDS.values())
+            self._apply_rollups(company_id, year, rollups[(company_id, year)])
+        
+        stats["persisted"] = True
+        return self._throughput(stats, started)
+    
+    def _throughput(self, stats: Dict, started: float) -> Dict:
+        seconds = time.perf_counter() - started
+        stats["seconds"] = round(seconds, 3)
+        stats["reports_per_second"] = round(stats["reports"] / seconds, 1) if seconds else 0.0
+        stats["operations_per_second"] = round(stats["operations"] / seconds, 1) if seconds else 0.0
+        return stats
+    
+    async def get_report_totals(
+        self,
+        year: int,
+        company_id: str = "default",
+        month_from: int = 1,
+        month_to: int = 12,
+        esg_types: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Get report totals and the monthly time series from the rollup index.
+        
+        The year's persisted rollups are loaded into the index first if this
+        process holds no fresh copy of them (see _load_rollups).
+        """
+        await self._load_rollups(company_id, year)
+        return self.rollups.totals(company_id, year, month_from, month_to, esg_types)
+    
+    async def list_report_companies(self, year: int) -> List[str]:
+        """List the companies that have a report for a year."""
+        if not is_firebase_configured():
+            return ["default"]
+        
+        query = (
+            self.db.collection(self.collection_name)
+            .where("reporting_year", "==", year)
+            .select(["company_id"])
+        )
+        docs = await self._run(list, query.stream())
+        return sorted({(doc.to_dict() or {}).get("company_id") for doc in docs} - {None})
+    
     async def list_reports(self, company_id: str = "default") -> List[int]:
         """List all available report years for a company."""
         if not is_firebase_configured():
             return [2024, 2023, 2022]  # Mock years
         
-        docs = self.db.collection(self.collection_name).where("company_id", "==", company_id).stream()
-        years = []
+        index = await self.get_report_index(company_id)
+        return [entry["year"] for entry in index]
+    
+    async def get_report_index(self, company_id: str = "default") -> List[Dict]:
+        """
+        List a company's reports with year, last_updated, size and module
+        completeness, newest first.
+        
+        Served from the per-company index document maintained by every
+        report write, so this is a single small read. If a company has no
+        index yet it is rebuilt once from the report documents (reading only
+        their metadata fields).
+        """
+        if not is_firebase_configured():
+            return [
+                self._index_entry(year, {
+                    field: len(self._encode_module(field, getattr(report, field)))
+                    for field in REPORT_MODULE_FIELDS.values()
+                }, None)
+                for year, report in ((year, self._generate_mock_report(year, company_id)) for year in (2024, 2023, 2022))
+            ]
+        
+        snapshot = await self._run(self._index_ref(company_id).get)
+        if snapshot.exists:
+            reports = (snapshot.to_dict() or {}).get("reports") or {}
+        else:
+            reports = await self._rebuild_report_index(company_id)
+        
+        entries = [
+            self._index_entry(
+                entry["year"],
+                {field: module["count"] for field, module in (entry.get("modules") or {}).items()},
+                entry.get("last_updated"),
+            )
+            for entry in reports.values()
+        ]
+        return sorted(entries, key=lambda entry: entry["year"], reverse=True)
+    
+    async def _rebuild_report_index(self, company_id: str) -> Dict[str, Dict]:
+        """Rebuild a company's report index from its report documents' metadata."""
+        query = (
+            self.db.collection(self.collection_name)
+            .where("company_id", "==", company_id)
+            .select(["reporting_year", "modules"])
+        )
+        # stream() is lazy; drain it inside the pool so the RPCs run off-loop
+        docs = await self._run(list, query.stream())
+        
+        reports = {}
         for doc in docs:
-            data = doc.to_dict()
-            if "reporting_year" in data:
-                years.append(data["reporting_year"])
-        return sorted(years, reverse=True)
+            data = doc.to_dict() or {}
+            if "reporting_year" not in data:
+                continue
+            year = data["reporting_year"]
+            reports[str(year)] = {
+                "year": year,
+                "last_updated": None,
+                "modules": {
+                    field: {"count": module.get("count", 0), "complete": module.get("count", 0) > 0}
+                    for field, module in (data.get("modules") or {}).items()
+                },
+            }
+        
+        await self._run(self._index_ref(company_id).set, {"company_id": company_id, "reports": reports})
+        return reports
     
-    # ==================== Conversion Helpers ====================
+    def _index_entry(self, year: int, counts: Dict[str, int], last_updated: Optional[str]) -> Dict:
+        """Report index entry as returned by the API."""
+        modules = {
+            module: counts.get(field, 0) > 0
+            for module, field in REPORT_MODULE_FIELDS.items()
+        }
+        return {
+            "year": year,
+            "last_updated": last_updated,
+            "size": sum(counts.values()),
+            "modules": modules,
+            "vsme_required_complete": all(modules[module] for module in VSME_REQUIRED_MODULES),
+        }
+    
+    # ==================== Integration Sync State ====================
+    
+    def read_sync_state(self, company_id: str, provider: str) -> Optional[Dict]:
+        """
+        Read a provider's sync state document, or None if it never synced.
+        
+        The state holds cursors, aggregates, revision and the ledger layout
+        ("YYYY-MM" -> chunk count). Blocking: call from a worker thread.
+        """
+        if not is_firebase_configured():
+            stored = self._demo_sync_states.get((company_id, provider))
+            return copy.deepcopy(stored["state"]) if stored else None
+        
+        snapshot = self._sync_state_ref(company_id, provider).get()
+        return (snapshot.to_dict() or {}) if snapshot.exists else None
+    
+    def read_sync_ledger(self, company_id: str, provider: str, layout: Dict[str, int]) -> Dict[str, list]:
+        """
+        Read every ledger entry (invoice id -> contribution) of a layout.
+        Blocking: call from a worker thread.
+        """
+        if not is_firebase_configured():
+            stored = self._demo_sync_states.get((company_id, provider))
+            entries: Dict[str, list] = {}
+            for month_entries in (stored["ledger"] if stored else {}).values():
+                entries.update(copy.deepcopy(month_entries))
+            return entries
+        
+        state_ref = self._sync_state_ref(company_id, provider)
+        refs = [
+            ref for month, chunks in sorted(layout.items())
+            for ref in self._ledger_refs(state_ref, month, chunks)
+        ]
+        entries = {}
+        for start in range(0, len(refs), BULK_READ_CHUNK_SIZE):
+            for doc in self.db.get_all(refs[start:start + BULK_READ_CHUNK_SIZE]):
+                if doc.exists:
+                    entries.update((doc.to_dict() or {}).get("entries") or {})
+        return entries
+    
+    def write_sync_state(
+        self,
+        company_id: str,
+        provider: str,
+        state: Dict,
+        months: Dict[str, Dict[str, list]],
+        rollups: Optional[Dict[int, Cells]] = None
+    ) -> Dict:
+        """
+        Write a provider's sync state, the ledger months it changed and the
+        provider's rollups of the years it changed.
+        
+        months maps "YYYY-MM" to that month's complete ledger entries (empty
+        to drop the month); other months are left untouched. Each month is
+        split into chunk documents of at most SYNC_LEDGER_CHUNK_SIZE entries
+        and the state document, carrying the new layout, is written in the
+        last batch. rollups maps a year to the provider's complete cells of
+        that year. Blocking: call from a worker thread.
+        
+        Returns:
+            The state as written (with its updated ledger layout)
+        """
+        state = dict(state, company_id=company_id, provider=provider)
+        layout = dict(state.get("ledger") or {})
+        
+        if not is_firebase_configured():
+            stored = self._demo_sync_states.setdefault((company_id, provider), {"state": None, "ledger": {}})
+            for month, month_entries in months.items():
+                if month_entries:
+                    stored["ledger"][month] = copy.deepcopy(month_entries)
+                    layout[month] = 1
+                else:
+                    stored["ledger"].pop(month, None)
+                    layout.pop(month, None)
+            state["ledger"] = layout
+            stored["state"] = copy.deepcopy(state)
+            return state
+        
+        state_ref = self._sync_state_ref(company_id, provider)
+        operations = []
+        for month, month_entries in sorted(months.items()):
+            items = sorted(month_entries.items())
+            chunks = [
+                dict(items[start:start + SYNC_LEDGER_CHUNK_SIZE])
+                for start in range(0, len(items), SYNC_LEDGER_CHUNK_SIZE)
+            ]
+            for index, ref in enumerate(self._ledger_refs(state_ref, month, max(len(chunks), layout.get(month, 0)))):
+                if index < len(chunks):
+                    operations.append(("set", ref, {"entries": chunks[index]}))
+                else:
+                    operations.append(("delete", ref, None))
+            if chunks:
+                layout[month] = len(chunks)
+            else:
+                layout.pop(month, None)
+        
+        for year, cells in sorted((rollups or {}).items()):
+            operations += self._rollup_operations(company_id, year, {sync_source(provider): cells})
+        state["ledger"] = layout
+        operations.append(("set", state_ref, state))
+        for start in range(0, len(operations), FIRESTORE_BATCH_LIMIT):
+            self._write_batch(operations[start:start + FIRESTORE_BATCH_LIMIT])
+        return state
     
-    def _report_to_dict(self, report: ESGReport) -> dict:
-        """Convert ESGReport to Firestore-compatible dict."""
+    def _sync_state_ref(self, company_id: str, provider: str):
+        return self.db.collection(self.sync_state_collection_name).document(f"{company_id}_{provider}")
+    
+    def _ledger_refs(self, state_ref, month: str, chunks: int) -> list:
+        return [
+            state_ref.collection(SYNC_LEDGER_SUBCOLLECTION).document(f"{month}-{index}")
+            for index in range(chunks)
+        ]
+    
+    # ==================== Rollup Storage ====================
+    
+    def _rollup_ref(self, company_id: str, year: int, source: str):
+        return (
+            self.db.collection(self.rollups_collection_name)
+            .document(f"{company_id}_{year}")
+            .collection(ROLLUP_SUBCOLLECTION)
+            .document(source)
+        )
+    
+    def _report_rollups(self, year: int, modules: Dict[str, Iterable]) -> Dict[str, Cells]:
+        """Rollup cells per source for report modules (module -> records)."""
         return {
-            "reporting_year": report.reporting_year,
-            "energy_data": [self._energy_to_dict(e) for e in report.energy_data],
-            "emissions_data": [self._emissions_to_dict(e) for e in report.emissions_data],
-            "water_data": [self._water_to_dict(w) for w in report.water_data],
-            "employee_data": self._employee_to_dict(report.employee_data) if report.employee_data else None,
-            "scope_3_data": [self._scope3_to_dict(s) for s in report.scope_3_data],
+            report_source(module): report_module_cells(year, module, records)
+            for module, records in modules.items()
         }
     
-    def _dict_to_report(self, data: dict) -> ESGReport:
-        """Convert Firestore dict to ESGReport."""
-        return ESGReport(
-            reporting_year=data["reporting_year"],
-            energy_data=[self._dict_to_energy(e) for e in data.get("energy_data", [])],
-            emissions_data=[self._dict_to_emissions(e) for e in data.get("emissions_data", [])],
-            water_data=[self._dict_to_water(w) for w in data.get("water_data", [])],
-            employee_data=self._dict_to_employee(data["employee_data"]) if data.get("employee_data") else None,
-            scope_3_data=[self._dict_to_scope3(s) for s in data.get("scope_3_data", [])],
+    def _rollup_operations(self, company_id: str, year: int, sources: Dict[str, Cells]) -> List[tuple]:
+        """Write operations replacing sources' persisted cells of a year (deleting empty ones)."""
+        operations = []
+        for source, cells in sources.items():
+            year_cells = {key: values for key, values in cells.items() if key[0] == year}
+            ref = self._rollup_ref(company_id, year, source)
+            if year_cells:
+                operations.append(("set", ref, {
+                    "company_id": company_id,
+                    "year": year,
+                    "source": source,
+                    "cells": encode_cells(year_cells),
+                }))
+            else:
+                operations.append(("delete", ref, None))
+        return operations
+    
+    def _apply_rollups(self, company_id: str, year: int, sources: Dict[str, Cells]) -> None:
+        """Mirror persisted rollup writes into the in-process index."""
+        for source, cells in sources.items():
+            self.rollups.replace(company_id, year, source, cells)
+    
+    async def _load_rollups(self, company_id: str, year: int) -> None:
+        """
+        Load a year's persisted rollups into the index unless a fresh copy
+        is held. Years without report rollups (written before rollups were
+        persisted, or never read) are seeded from the report. In demo mode
+        the index itself is the store and is seeded from the mock report.
+        """
+        if not is_firebase_configured():
+            if not self.rollups.has_source(company_id, year, report_source("energy_data")):
+                self.rollups.replace_report(company_id, await self.get_report(year, company_id))
+            return
+        
+        cache_key = (company_id, year)
+        if self.rollup_cache.get(cache_key):
+            return
+        
+        token = self.rollup_cache.token()
+        collection = (
+            self.db.collection(self.rollups_collection_name)
+            .document(f"{company_id}_{year}")
+            .collection(ROLLUP_SUBCOLLECTION)
         )
+        docs = await self._run(list, collection.stream())
+        sources = {doc.id: decode_cells((doc.to_dict() or {}).get("cells") or []) for doc in docs}
+        
+        if not any(source.startswith(report_source("")) for source in sources):
+            report = await self.get_report(year, company_id)
+            seeded = self._report_rollups(year, {module: getattr(report, module) for module in REPORT_MODULES})
+            await self._commit(self._rollup_operations(company_id, year, seeded))
+            sources.update(seeded)
+        
+        self.rollups.load_year(company_id, year, sources)
+        self.rollup_cache.set(cache_key, True, token=token)
+    
+    # ==================== Module Storage ====================
+    
+    def _report_ref(self, year: int, company_id: str):
+        return self.db.collection(self.collection_name).document(f"{company_id}_{year}")
+    
+    def _index_ref(self, company_id: str):
+        return self.db.collection(self.index_collection_name).document(company_id)
+    
+    def _chunk_refs(self, report_ref, field: str, chunks: int) -> list:
+        return [
+            report_ref.collection(MODULE_SUBCOLLECTION).document(f"{field}-{index}")
+            for index in range(chunks)
+        ]
+    
+    async def _read_modules(self, year: int, company_id: str, fields: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Read report modules, or return None if the report does not exist.
+        
+        The parent document is read with a field mask (the module layout,
+        plus the module fields themselves for legacy whole-report documents),
+        then all chunk documents of the requested modules in one batched read.
+        """
+        report_ref = self._report_ref(year, company_id)
+        snapshot = await self._run(report_ref.get, field_paths=["reporting_year", "modules", *fields])
+        if not snapshot.exists:
+            return None
+        
+        data = snapshot.to_dict() or {}
+        layout = data.get("modules") or {}
+        
+        chunk_refs = {
+            field: self._chunk_refs(report_ref, field, layout[field]["chunks"])
+            for field in fields if field in layout
+        }
+        refs = [ref for field_refs in chunk_refs.values() for ref in field_refs]
+        chunks = {}
+        if refs:
+            docs = await self._run(list, self.db.get_all(refs))
+            chunks = {doc.id: doc.to_dict() or {} for doc in docs if doc.exists}
+        
+        modules = {}
+        for field in fields:
+            if field in chunk_refs:
+                records = []
+                for ref in chunk_refs[field]:
+                    records.extend(chunks.get(ref.id, {}).get("records", []))
+            else:
+                # Legacy layout: the module is a field of the parent document
+                legacy = data.get(field)
+                records = legacy if isinstance(legacy, list) else [legacy] if legacy else []
+            modules[field] = self._decode_module(field, records)
+        return modules
+    
+    async def _write_modules(
+        self,
+        year: int,
+        company_id: str,
+        modules: Dict[str, List[dict]],
+        rollups: Optional[Dict[str, Cells]] = None
+    ) -> None:
+        """
+        Write encoded module records as chunk documents.
+        
+        Chunks left over from a previously larger module are deleted and the
+        parent document's layout, the modules' rollups and the company's
+        report index are updated in the last batch, so readers never see a
+        layout pointing at missing chunks. Module fields of a legacy
+        whole-report document are removed as they are migrated.
+        """
+        report_ref = self._report_ref(year, company_id)
+        snapshot = await self._run(report_ref.get, field_paths=["modules"])
+        old_layout = ((snapshot.to_dict() or {}).get("modules") or {}) if snapshot.exists else {}
+        
+        operations, index_entry = self._module_operations(year, company_id, modules, old_layout)
+        operations += self._rollup_operations(company_id, year, rollups or {})
+        operations.append(self._index_operation(company_id, [index_entry]))
+        for start in range(0, len(operations), FIRESTORE_BATCH_LIMIT):
+            await self._commit(operations[start:start + FIRESTORE_BATCH_LIMIT])
+    
+    def _module_operations(
+        self,
+        year: int,
+        company_id: str,
+        modules: Dict[str, List[dict]],
+        old_layout: Dict
+    ) -> Tuple[List[tuple], Dict]:
+        """
+        Build the write operations for a report's modules, ending with the
+        parent document update, plus the report's index entry.
+        """
+        report_ref = self._report_ref(year, company_id)
+        operations = []
+        index_modules = {}
+        parent = {"reporting_year": year, "company_id": company_id, "modules": {}}
+        for field, records in modules.items():
+            chunks = [
+                records[start:start + REPORT_MODULE_CHUNK_SIZE]
+                for start in range(0, len(records), REPORT_MODULE_CHUNK_SIZE)
+            ]
+            old_chunks = old_layout.get(field, {}).get("chunks", 0)
+            for index, ref in enumerate(self._chunk_refs(report_ref, field, max(len(chunks), old_chunks))):
+                if index < len(chunks):
+                    operations.append(("set", ref, {"records": chunks[index]}))
+                else:
+                    operations.append(("delete", ref, None))
+            parent["modules"][field] = {"chunks": len(chunks), "count": len(records)}
+            parent[field] = firestore.DELETE_FIELD
+            index_modules[field] = {"count": len(records), "complete": bool(records)}
+        operations.append(("merge", report_ref, parent))
+        
+        index_entry = {
+            "year": year,
+            "last_updated": datetime.utcnow().isoformat(),
+            "modules": index_modules,
+        }
+        return operations, index_entry
+    
+    def _index_operation(self, company_id: str, entries: List[Dict]) -> tuple:
+        """Merge report index entries into a company's index document."""
+        return ("merge", self._index_ref(company_id), {
+            "company_id": company_id,
+            "reports": {str(entry["year"]): entry for entry in entries},
+        })
+    
+    async def _commit(self, operations: List[tuple]) -> None:
+        """Commit up to FIRESTORE_BATCH_LIMIT operations as one atomic batch."""
+        await self._run(self._write_batch, operations)
+    
+    def _write_batch(self, operations: List[tuple]) -> None:
+        """Commit a batch of ("set" | "merge" | "delete", ref, data) operations (blocking)."""
+        batch = self.db.batch()
+        for action, ref, data in operations:
+            if action == "delete":
+                batch.delete(ref)
+            else:
+                batch.set(ref, data, merge=action == "merge")
+        batch.commit()
+    
+    def _invalidate_report(self, company_id: str, year: int, fields) -> None:
+        """Drop the cached report and cached modules after a write."""
+        self.report_cache.invalidate((company_id, year))
+        self.report_cache.invalidate((company_id, year, "json"))
+        for field in fields:
+            self.report_cache.invalidate((company_id, year, field))
+    
+    # ==================== Conversion Helpers ====================
+    
+    def _encode_module(self, field: str, value: Any) -> List[dict]:
+        """Convert a report module to a list of Firestore-compatible dicts."""
+        to_dict = self._module_codecs[field][0]
+        if field == "employee_data":
+            return [to_dict(value)] if value else []
+        return [to_dict(record) for record in value]
+    
+    def _decode_module(self, field: str, records: List[dict]) -> Any:
+        """Convert stored module records back to model objects."""
+        from_dict = self._module_codecs[field][1]
+        if field == "employee_data":
+            return from_dict(records[0]) if records else None
+        return [from_dict(record) for record in records]
+    
+    @property
+    def _module_codecs(self) -> Dict[str, tuple]:
+        return {
+            "energy_data": (self._energy_to_dict, self._dict_to_energy),
+            "emissions_data": (self._emissions_to_dict, self._dict_to_emissions),
+            "water_data": (self._water_to_dict, self._dict_to_water),
+            "employee_data": (self._employee_to_dict, self._dict_to_employee),
+            "scope_3_data": (self._scope3_to_dict, self._dict_to_scope3),
+        }
     
     def _energy_to_dict(self, e: EnergyConsumption) -> dict:
         return {
@@ -142,6 +966,8 @@ class ESGDatabaseService:
             "scope": e.scope.value,
             "co2e_tonnes": e.co2e_tonnes,
             "methodology": e.methodology,
+            "activities": [a.model_dump() for a in e.activities],
+            "factor_version": e.factor_version,
         }
     
     def _dict_to_emissions(self, d: dict) -> GHGEmissions:
@@ -152,6 +978,8 @@ class ESGDatabaseService:
             scope=ScopeType(d["scope"]),
             co2e_tonnes=d["co2e_tonnes"],
             methodology=d["methodology"],
+            activities=[EmissionActivity(**a) for a in d.get("activities") or []],
+            factor_version=d.get("factor_version"),
         )
     
     def _water_to_dict(self, w: WaterUsage) -> dict:
@@ -206,93 +1034,136 @@ class ESGDatabaseService:
     
     # ==================== Mock Data Generation ====================
     
-    def _generate_mock_report(self, year: int) -> ESGReport:
-        """Generate mock ESG report for demo purposes."""
+    def _generate_mock_report(self, year: int, company_id: str = "default", scale: Optional[int] = None) -> ESGReport:
+        """
+        Get the demo ESG report for a company and year.
         
-        energy_data = [
+        Demo data is seeded by (company_id, year), so the same report comes
+        back on every call. Its serialized JSON is memoized and every call
+        validates a fresh ESGReport from it, so callers may mutate the
+        result. scale (default DEMO_DATA_SCALE) multiplies the number of
+        sites, for large synthetic tenants.
+        """
+        body, _ = _demo_report_json(company_id, year, scale or DEMO_DATA_SCALE)
+        return ESGReport.model_validate_json(body)
+
+
+def serialize_report(report: ESGReport) -> Tuple[bytes, str]:
+    """Serialize a report to JSON bytes and compute its strong ETag."""
+    body = report.__pydantic_serializer__.to_json(report)
+    return body, etag_for(body)
+
+
+@functools.lru_cache(maxsize=DEMO_REPORT_CACHE_SIZE)
+def _demo_report_json(company_id: str, year: int, scale: int) -> Tuple[bytes, str]:
+    return serialize_report(_build_demo_report(company_id, year, scale))
+
+
+def _build_demo_report(company_id: str, year: int, scale: int) -> ESGReport:
+    """Generate a deterministic demo report; each site adds a full set of records."""
+    rng = random.Random(f"{company_id}:{year}")
+    
+    def new_id() -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    
+    factor_version = version_for_year(year)
+    diesel_factor = get_emission_factor("diesel", version=factor_version)
+    
+    energy_data = []
+    emissions_data = []
+    water_data = []
+    for site in range(scale):
+        prefix = f"site{site + 1}_" if scale > 1 else ""
+        
+        energy_data += [
             EnergyConsumption(
-                id=str(uuid.uuid4()),
+                id=new_id(),
                 period_start=date(year, 1, 1),
                 period_end=date(year, 12, 31),
                 fuel_type=FuelType.RENEWABLE,
-                consumption_kwh=random.uniform(8000, 15000),
-                source_document="utility_invoice_renewable.pdf"
+                consumption_kwh=rng.uniform(8000, 15000),
+                source_document=f"{prefix}utility_invoice_renewable.pdf"
             ),
             EnergyConsumption(
-                id=str(uuid.uuid4()),
+                id=new_id(),
                 period_start=date(year, 1, 1),
                 period_end=date(year, 12, 31),
                 fuel_type=FuelType.NON_RENEWABLE,
-                consumption_kwh=random.uniform(12000, 22000),
-                source_document="utility_invoice_grid.pdf"
+                consumption_kwh=rng.uniform(12000, 22000),
+                source_document=f"{prefix}utility_invoice_grid.pdf"
             )
         ]
         
-        emissions_data = [
+        diesel_litres = round(rng.uniform(45, 95) * 1000 / diesel_factor, 1)
+        emissions_data += [
             GHGEmissions(
-                id=str(uuid.uuid4()),
+                id=new_id(),
                 period_start=date(year, 1, 1),
                 period_end=date(year, 12, 31),
                 scope=ScopeType.SCOPE_1,
-                co2e_tonnes=random.uniform(45, 95),
-                methodology="Activity-based (GHG Protocol)"
+                co2e_tonnes=diesel_litres * diesel_factor / 1000,
+                methodology="Activity-based (GHG Protocol)",
+                activities=[EmissionActivity(activity_type="diesel", quantity=diesel_litres)],
+                factor_version=factor_version
             ),
             GHGEmissions(
-                id=str(uuid.uuid4()),
+                id=new_id(),
                 period_start=date(year, 1, 1),
                 period_end=date(year, 12, 31),
                 scope=ScopeType.SCOPE_2_MARKET,
-                co2e_tonnes=random.uniform(20, 55),
+                co2e_tonnes=rng.uniform(20, 55),
                 methodology="Market-based (EF from supplier)"
             )
         ]
         
-        water_data = [
+        water_data.append(
             WaterUsage(
-                id=str(uuid.uuid4()),
+                id=new_id(),
                 period_start=date(year, 1, 1),
                 period_end=date(year, 12, 31),
-                volume_m3=random.uniform(1500, 4500),
-                source_document="water_utility_bill.pdf"
+                volume_m3=rng.uniform(1500, 4500),
+                source_document=f"{prefix}water_utility_bill.pdf"
             )
-        ]
-        
-        employee_data = EmployeeMetrics(
-            period_end=date(year, 12, 31),
-            total_headcount=random.randint(80, 150),
-            female_count=random.randint(35, 70),
-            male_count=random.randint(40, 80),
-            other_gender_count=random.randint(0, 5)
         )
+    
+    total_headcount = rng.randint(80, 150) * scale
+    female_count = rng.randint(35, 70) * scale
+    other_gender_count = rng.randint(0, 5) * scale
+    employee_data = EmployeeMetrics(
+        period_end=date(year, 12, 31),
+        total_headcount=total_headcount,
+        female_count=female_count,
         # Ensure totals match
-        employee_data.male_count = employee_data.total_headcount - employee_data.female_count - employee_data.other_gender_count
-        
-        scope_3_data = [
-            Scope3Category(
-                category_name="Purchased Goods and Services",
-                spend_amount=random.uniform(400000, 900000),
-                estimated_co2e=random.uniform(150, 350)
-            ),
-            Scope3Category(
-                category_name="Business Travel",
-                spend_amount=random.uniform(40000, 120000),
-                estimated_co2e=random.uniform(15, 60)
-            ),
-            Scope3Category(
-                category_name="Employee Commuting",
-                spend_amount=random.uniform(20000, 50000),
-                estimated_co2e=random.uniform(25, 80)
-            )
-        ]
-        
-        return ESGReport(
-            reporting_year=year,
-            energy_data=energy_data,
-            emissions_data=emissions_data,
-            water_data=water_data,
-            employee_data=employee_data,
-            scope_3_data=scope_3_data
+        male_count=total_headcount - female_count - other_gender_count,
+        other_gender_count=other_gender_count
+    )
+    
+    scope_3_data = [
+        Scope3Category(
+            category_name="Purchased Goods and Services",
+            spend_amount=rng.uniform(400000, 900000) * scale,
+            estimated_co2e=rng.uniform(150, 350) * scale
+        ),
+        Scope3Category(
+            category_name="Business Travel",
+            spend_amount=rng.uniform(40000, 120000) * scale,
+            estimated_co2e=rng.uniform(15, 60) * scale
+        ),
+        Scope3Category(
+            category_name="Employee Commuting",
+            spend_amount=rng.uniform(20000, 50000) * scale,
+            estimated_co2e=rng.uniform(25, 80) * scale
         )
+    ]
+    
+    return ESGReport(
+        reporting_year=year,
+        energy_data=energy_data,
+        emissions_data=emissions_data,
+        water_data=water_data,
+        employee_data=employee_data,
+        scope_3_data=scope_3_data
+    )
 
 
 # Singleton instance
@@ -9,10 +9,30 @@ Sources:
 - UK DEFRA Conversion Factors 2024
 - EPA Emission Factors Hub
 - EXIOBASE EEIO Database for spend-based calculations
+
+Factor sets are versioned datasets stored as JSON files in factor_data/
+(listed in factor_data/manifest.json). Datasets are loaded lazily on first
+use and compiled into lookup tables once per version, so adding vintages
+does not slow API startup. Every calculation takes an optional dataset
+version; without one the manifest's default is used, and
+version_for_year() picks the set valid for a reporting year.
+
+Spend-based factors are per USD; spend in other currencies is converted
+with the dated exchange rates in fx.py.
 """
 
-from typing import Dict, Optional
+from datetime import date
+from typing import Dict, List, Mapping, Optional, Tuple
 from enum import Enum
+from types import MappingProxyType
+import hashlib
+import json
+import operator
+import os
+import sys
+import threading
+
+from .fx import usd_rate
 
 class EmissionScope(str, Enum):
     SCOPE_1 = "scope_1"  # Direct emissions
@@ -52,281 +72,244 @@ class ActivityType(str, Enum):
 
 
 # ============================================
-# EMISSION FACTORS DATABASE
-# Units: kgCO2e per unit specified
+# COMPILED FACTOR INDEX
+# Built once per dataset: activity_type -> flat qualifier table
 # ============================================
 
-EMISSION_FACTORS: Dict[str, Dict] = {
-    # ============================================
-    # ELECTRICITY (kgCO2e per kWh)
-    # ============================================
-    "electricity": {
-        "unit": "kWh",
-        "scope": EmissionScope.SCOPE_2_LOCATION,
-        "factors": {
-            # Location-based (grid average)
-            "UK": 0.20707,  # DEFRA 2024
-            "DE": 0.364,    # Germany 2024
-            "FR": 0.052,    # France (nuclear heavy)
-            "IT": 0.316,    # Italy
-            "ES": 0.190,    # Spain
-            "NL": 0.328,    # Netherlands
-            "BE": 0.163,    # Belgium
-            "AT": 0.088,    # Austria
-            "PL": 0.658,    # Poland (coal heavy)
-            "AE": 0.405,    # UAE
-            "US": 0.390,    # US average
-            "default": 0.300
-        },
-        # Market-based (renewable certificates)
-        "renewable_factor": 0.0,  # Zero for certified renewable
-    },
-    
-    # ============================================
-    # NATURAL GAS (kgCO2e per kWh)
-    # ============================================
-    "natural_gas": {
-        "unit": "kWh",
-        "scope": EmissionScope.SCOPE_1,
-        "factor": 0.18293,  # DEFRA 2024 gross CV
-    },
-    
-    # ============================================
-    # FUELS (kgCO2e per litre)
-    # ============================================
-    "diesel": {
-        "unit": "litre",
-        "scope": EmissionScope.SCOPE_1,
-        "factor": 2.70564,  # DEFRA 2024
-    },
-    
-    "petrol": {
-        "unit": "litre",
-        "scope": EmissionScope.SCOPE_1,
-        "factor": 2.31486,  # DEFRA 2024
-    },
-    
-    "lpg": {
-        "unit": "litre",
-        "scope": EmissionScope.SCOPE_1,
-        "factor": 1.55364,  # DEFRA 2024
-    },
-    
-    # ============================================
-    # ROAD TRANSPORT (kgCO2e per km)
-    # ============================================
-    "car_petrol": {
-        "unit": "km",
-        "scope": EmissionScope.SCOPE_1,  # If company-owned
-        "factor": 0.17048,  # Average car
-        "variants": {
-            "small": 0.14289,
-            "medium": 0.16982,
-            "large": 0.22223,
-        }
-    },
-    
-    "car_diesel": {
-        "unit": "km",
-        "scope": EmissionScope.SCOPE_1,
-        "factor": 0.16844,
-        "variants": {
-            "small": 0.13826,
-            "medium": 0.16437,
-            "large": 0.20914,
-        }
-    },
-    
-    "car_electric": {
-        "unit": "km",
-        "scope": EmissionScope.SCOPE_2_LOCATION,  # Depends on grid
-        "factor": 0.04645,  # Average EV UK
-    },
-    
-    # ============================================
-    # AIR TRAVEL (kgCO2e per passenger-km)
-    # Including radiative forcing uplift
-    # ============================================
-    "flight_short": {
-        "unit": "passenger-km",
-        "scope": EmissionScope.SCOPE_3,
-        "factor": 0.25493,  # <500km domestic/short haul
-    },
-    
-    "flight_medium": {
-        "unit": "passenger-km", 
-        "scope": EmissionScope.SCOPE_3,
-        "factor": 0.15573,  # 500-3700km
-    },
-    
-    "flight_long": {
-        "unit": "passenger-km",
-        "scope": EmissionScope.SCOPE_3,
-        "factor": 0.19309,  # >3700km long haul
-        "variants": {
-            "economy": 0.14615,
-            "premium_economy": 0.23384,
-            "business": 0.42385,
-            "first": 0.58462,
-        }
-    },
-    
-    "rail": {
-        "unit": "passenger-km",
-        "scope": EmissionScope.SCOPE_3,
-        "factor": 0.03549,  # National rail average
-    },
-    
-    "bus": {
-        "unit": "passenger-km",
-        "scope": EmissionScope.SCOPE_3,
-        "factor": 0.10231,
-    },
-    
-    # ============================================
-    # WATER (kgCO2e per cubic metre)
-    # ============================================
-    "water_supply": {
-        "unit": "m3",
-        "scope": EmissionScope.SCOPE_3,
-        "factor": 0.149,  # DEFRA 2024
-    },
-    
-    "water_treatment": {
-        "unit": "m3",
-        "scope": EmissionScope.SCOPE_3,
-        "factor": 0.272,  # DEFRA 2024
-    },
-    
-    # ============================================
-    # WASTE (kgCO2e per tonne)
-    # ============================================
-    "waste_landfill": {
-        "unit": "tonne",
-        "scope": EmissionScope.SCOPE_3,
-        "factor": 446.242,  # Mixed waste to landfill
-    },
-    
-    "waste_recycled": {
-        "unit": "tonne",
-        "scope": EmissionScope.SCOPE_3,
-        "factor": 21.317,  # Mixed recycling
-    },
-    
-    # ============================================
-    # SPEND-BASED FACTORS (kgCO2e per USD/EUR)
-    # Based on EEIO models - Scope 3 Categories
-    # ============================================
-    "spend_purchased_goods": {
-        "unit": "USD",
-        "scope": EmissionScope.SCOPE_3,
-        "category": "Category 1: Purchased Goods & Services",
-        "factors": {
-            # Industry-specific factors (kgCO2e per USD spent)
-            "manufacturing": 0.42,
-            "electronics": 0.35,
-            "chemicals": 0.68,
-            "textiles": 0.45,
-            "food_products": 0.55,
-            "paper_products": 0.38,
-            "metals": 0.72,
-            "plastics": 0.58,
-            "office_supplies": 0.28,
-            "software_services": 0.08,
-            "professional_services": 0.12,
-            "default": 0.35,
-        }
-    },
-    
-    "spend_capital_goods": {
-        "unit": "USD",
-        "scope": EmissionScope.SCOPE_3,
-        "category": "Category 2: Capital Goods",
-        "factors": {
-            "machinery": 0.55,
-            "vehicles": 0.48,
-            "buildings": 0.65,
-            "it_equipment": 0.32,
-            "furniture": 0.38,
-            "default": 0.45,
-        }
-    },
-    
-    "spend_services": {
-        "unit": "USD",
-        "scope": EmissionScope.SCOPE_3,
-        "category": "Category 1: Purchased Services",
-        "factors": {
-            "legal_accounting": 0.10,
-            "consulting": 0.12,
-            "marketing": 0.15,
-            "it_services": 0.08,
-            "cleaning": 0.18,
-            "security": 0.14,
-            "default": 0.12,
-        }
-    },
-    
-    "spend_transport": {
-        "unit": "USD",
-        "scope": EmissionScope.SCOPE_3,
-        "category": "Category 4/9: Transport & Distribution",
-        "factors": {
-            "air_freight": 0.85,
-            "road_freight": 0.45,
-            "sea_freight": 0.12,
-            "rail_freight": 0.08,
-            "courier": 0.35,
-            "default": 0.35,
-        }
-    },
-}
+# Position of the qualifying argument in (country, variant, sub_category)
+_QUALIFIER_POSITIONS = {"country": 0, "variant": 1, "sub_category": 2}
+
+
+def _compile_factor_index(
+    factors: Dict[str, Dict]
+) -> Tuple[Mapping[str, Tuple[int, Mapping[str, float], float]], Mapping[str, Tuple[str, str]]]:
+    """
+    Compile the nested factor table into immutable lookup tables.
+    
+    Each activity is keyed by at most one qualifier: the country or
+    sub-category for "factors" tables (see "factors_by"), or the variant
+    for "variants" tables. Every activity resolves to a tuple of
+    (qualifier position, qualifier -> factor table, default factor).
+    
+    Returns:
+        Tuple of (factor index, (unit, scope) metadata per activity)
+    """
+    index: Dict[str, Tuple[int, Mapping[str, float], float]] = {}
+    metadata: Dict[str, Tuple[str, str]] = {}
+    
+    for activity_type, factor_data in factors.items():
+        activity_type = sys.intern(activity_type)
+        
+        if "factors" in factor_data and "variants" in factor_data:
+            raise ValueError(f"Activity {activity_type} defines both factors and variants")
+        
+        if "factors" in factor_data:
+            qualifier = factor_data.get("factors_by", "country")
+            table = factor_data["factors"]
+        elif "variants" in factor_data:
+            qualifier = "variant"
+            table = factor_data["variants"]
+        else:
+            qualifier = "country"
+            table = {}
+        
+        base = table.get("default", factor_data.get("factor"))
+        if base is None:
+            raise ValueError(f"Could not find emission factor for {activity_type}")
+        
+        index[activity_type] = (
+            _QUALIFIER_POSITIONS[qualifier],
+            MappingProxyType({
+                sys.intern(key): float(value)
+                for key, value in table.items()
+                if key != "default"
+            }),
+            float(base),
+        )
+        metadata[activity_type] = (
+            sys.intern(factor_data.get("unit", "unknown")),
+            sys.intern(EmissionScope(factor_data.get("scope", EmissionScope.SCOPE_3)).value),
+        )
+    
+    return MappingProxyType(index), MappingProxyType(metadata)
+
+
+# ============================================
+# FACTOR REGISTRY
+# Versioned datasets, loaded lazily and compiled once per version
+# ============================================
+
+FACTOR_DATA_DIR = os.getenv(
+    "EMISSION_FACTOR_DATA_DIR", os.path.join(os.path.dirname(__file__), "factor_data")
+)
+
+# Dataset used when no version is given (default: the manifest's default)
+EMISSION_FACTOR_VERSION = os.getenv("EMISSION_FACTOR_VERSION")
+
+
+class FactorDataset:
+    """One compiled emission factor dataset (e.g. "defra-2024")."""
+    
+    def __init__(self, version: str, source: str, reporting_year: Optional[int], factors: Dict[str, Dict]):
+        self.version = version
+        self.source = source
+        self.reporting_year = reporting_year
+        self.factors = MappingProxyType(factors)
+        self.index, self.metadata = _compile_factor_index(factors)
+        self._catalog: Optional[Tuple[List[Dict], str]] = None
+    
+    @property
+    def catalog(self) -> List[Dict]:
+        """Public factor listing for this dataset."""
+        return self._build_catalog()[0]
+    
+    @property
+    def catalog_version(self) -> str:
+        """
+        Content-derived catalog version ("<dataset>.<hash>"), which changes
+        whenever any factor, unit or scope changes.
+        """
+        return self._build_catalog()[1]
+    
+    def _build_catalog(self) -> Tuple[List[Dict], str]:
+        if self._catalog is None:
+            entries = _build_factor_catalog(self.factors)
+            digest = hashlib.sha256(json.dumps(entries, sort_keys=True).encode()).hexdigest()
+            self._catalog = (entries, f"{self.version}.{digest[:16]}")
+        return self._catalog
+
+
+class FactorRegistry:
+    """Lazily loads and caches versioned factor datasets from a data directory."""
+    
+    def __init__(self, data_dir: str = FACTOR_DATA_DIR):
+        self.data_dir = data_dir
+        self._manifest: Optional[Dict] = None
+        self._datasets: Dict[str, FactorDataset] = {}
+        self._default: Optional[FactorDataset] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def manifest(self) -> Dict:
+        if self._manifest is None:
+            with open(os.path.join(self.data_dir, "manifest.json"), encoding="utf-8") as f:
+                self._manifest = json.load(f)
+        return self._manifest
+    
+    @property
+    def default_version(self) -> str:
+        return EMISSION_FACTOR_VERSION or self.manifest["default"]
+    
+    def versions(self) -> List[Dict]:
+        """Available datasets (from the manifest, without loading them)."""
+        default = self.default_version
+        return [
+            {
+                "version": version,
+                "source": info.get("source"),
+                "reporting_year": info.get("reporting_year"),
+                "default": version == default,
+                "loaded": version in self._datasets,
+            }
+            for version, info in self.manifest["datasets"].items()
+        ]
+    
+    def get(self, version: Optional[str] = None) -> FactorDataset:
+        """Get a compiled dataset, loading it on first use."""
+        if not version:
+            # Hot path of every factor lookup: resolve the default once
+            if self._default is None:
+                self._default = self.get(self.default_version)
+            return self._default
+        
+        dataset = self._datasets.get(version)
+        if dataset is not None:
+            return dataset
+        
+        info = self.manifest["datasets"].get(version)
+        if info is None:
+            raise ValueError(
+                f"Unknown emission factor version: {version}. "
+                f"Available: {', '.join(self.manifest['datasets'])}"
+            )
+        
+        with self._lock:
+            dataset = self._datasets.get(version)
+            if dataset is None:
+                with open(os.path.join(self.data_dir, info["file"]), encoding="utf-8") as f:
+                    data = json.load(f)
+                dataset = FactorDataset(version, info.get("source", data.get("source", "")), info.get("reporting_year"), data["factors"])
+                self._datasets[version] = dataset
+        return dataset
+    
+    def version_for_year(self, year: int) -> str:
+        """
+        Dataset version to use for a reporting year: the latest vintage not
+        newer than the year, or the oldest vintage for earlier years.
+        """
+        dated = sorted(
+            (info["reporting_year"], version)
+            for version, info in self.manifest["datasets"].items()
+            if info.get("reporting_year") is not None
+        )
+        if not dated:
+            return self.default_version
+        
+        eligible = [version for vintage, version in dated if vintage <= year]
+        return eligible[-1] if eligible else dated[0][1]
+
+
+# Singleton instance
+_factor_registry: Optional[FactorRegistry] = None
+
+def get_factor_registry() -> FactorRegistry:
+    """Get the emission factor registry singleton."""
+    global _factor_registry
+    if _factor_registry is None:
+        _factor_registry = FactorRegistry()
+    return _factor_registry
+
+
+def get_factor_dataset(version: Optional[str] = None) -> FactorDataset:
+    """Get a compiled factor dataset (the default one if version is None)."""
+    return get_factor_registry().get(version)
+
+
+def version_for_year(year: int) -> str:
+    """Factor dataset version valid for a reporting year."""
+    return get_factor_registry().version_for_year(year)
 
 
 def get_emission_factor(
     activity_type: str,
     country: str = "default",
     variant: str = None,
-    sub_category: str = None
+    sub_category: str = None,
+    version: Optional[str] = None
 ) -> float:
     """
     Get the emission factor for a given activity type.
     
+    Resolves against the compiled factor index: the qualifier relevant to
+    the activity (country, variant or sub-category) is looked up first,
+    falling back to the activity's default factor.
+    
     Args:
         activity_type: Type of activity (e.g., 'electricity', 'diesel', 'flight_short')
         country: ISO country code for location-based factors
         variant: Sub-variant (e.g., 'small', 'business' class)
         sub_category: For spend-based, the industry sub-category
-        
+        version: Factor dataset version (default dataset if None)
+    
     Returns:
         Emission factor in kgCO2e per unit
     """
-    if activity_type not in EMISSION_FACTORS:
-        raise ValueError(f"Unknown activity type: {activity_type}")
+    try:
+        position, table, default = get_factor_dataset(version).index[activity_type]
+    except KeyError:
+        raise ValueError(f"Unknown activity type: {activity_type}") from None
     
-    factor_data = EMISSION_FACTORS[activity_type]
-    
-    # Check for country-specific factors (electricity)
-    if "factors" in factor_data and isinstance(factor_data["factors"], dict):
-        if country in factor_data["factors"]:
-            return factor_data["factors"][country]
-        elif "default" in factor_data["factors"]:
-            return factor_data["factors"]["default"]
-        elif sub_category and sub_category in factor_data["factors"]:
-            return factor_data["factors"][sub_category]
-        elif "default" in factor_data.get("factors", {}):
-            return factor_data["factors"]["default"]
-    
-    # Check for variants (car size, flight class)
-    if variant and "variants" in factor_data:
-        if variant in factor_data["variants"]:
-            return factor_data["variants"][variant]
-    
-    # Return base factor
-    if "factor" in factor_data:
-        return factor_data["factor"]
-    
-    raise ValueError(f"Could not find emission factor for {activity_type}")
+    return table.get((country, variant, sub_category)[position], default)
 
 
 def calculate_emissions(
@@ -334,7 +317,8 @@ def calculate_emissions(
     quantity: float,
     country: str = "default",
     variant: str = None,
-    sub_category: str = None
+    sub_category: str = None,
+    version: Optional[str] = None
 ) -> Dict:
     """
     Calculate CO2e emissions for a given activity.
@@ -345,12 +329,14 @@ def calculate_emissions(
         country: ISO country code
         variant: Sub-variant if applicable
         sub_category: Industry category for spend-based
-        
+        version: Factor dataset version (default dataset if None)
+    
     Returns:
         Dict with emissions in kgCO2e and tonnes, plus metadata
     """
-    factor = get_emission_factor(activity_type, country, variant, sub_category)
-    factor_data = EMISSION_FACTORS[activity_type]
+    dataset = get_factor_dataset(version)
+    factor = get_emission_factor(activity_type, country, variant, sub_category, dataset.version)
+    unit, scope = dataset.metadata[activity_type]
     
     emissions_kg = quantity * factor
     emissions_tonnes = emissions_kg / 1000
@@ -358,15 +344,16 @@ def calculate_emissions(
     return {
         "activity_type": activity_type,
         "quantity": quantity,
-        "unit": factor_data.get("unit", "unknown"),
+        "unit": unit,
         "emission_factor": factor,
-        "emission_factor_unit": f"kgCO2e/{factor_data.get('unit', 'unit')}",
-        "scope": factor_data.get("scope", EmissionScope.SCOPE_3).value,
+        "emission_factor_unit": f"kgCO2e/{unit}",
+        "scope": scope,
         "emissions_kg_co2e": round(emissions_kg, 2),
         "emissions_tonnes_co2e": round(emissions_tonnes, 4),
         "country": country,
         "variant": variant,
         "sub_category": sub_category,
+        "factor_version": dataset.version,
     }
 
 
@@ -377,13 +364,14 @@ def calculate_emissions(
 def calculate_electricity_emissions(
     kwh: float,
     country: str = "default",
-    renewable_percentage: float = 0
+    renewable_percentage: float = 0,
+    version: Optional[str] = None
 ) -> Dict:
     """Calculate emissions from electricity consumption."""
     # Non-renewable portion uses grid factor
     non_renewable_kwh = kwh * (1 - renewable_percentage / 100)
     
-    result = calculate_emissions("electricity", non_renewable_kwh, country)
+    result = calculate_emissions("electricity", non_renewable_kwh, country, version=version)
     result["total_kwh"] = kwh
     result["renewable_percentage"] = renewable_percentage
     result["renewable_kwh"] = kwh - non_renewable_kwh
@@ -394,7 +382,8 @@ def calculate_electricity_emissions(
 def calculate_travel_emissions(
     distance_km: float,
     travel_type: str,
-    travel_class: str = None
+    travel_class: str = None,
+    version: Optional[str] = None
 ) -> Dict:
     """Calculate emissions from business travel."""
     type_mapping = {
@@ -409,25 +398,26 @@ def calculate_travel_emissions(
     }
     
     activity = type_mapping.get(travel_type, travel_type)
-    return calculate_emissions(activity, distance_km, variant=travel_class)
+    return calculate_emissions(activity, distance_km, variant=travel_class, version=version)
 
 
 def calculate_spend_based_emissions(
     spend_amount: float,
     category: str,
     sub_category: str = "default",
-    currency: str = "USD"
+    currency: str = "USD",
+    version: Optional[str] = None,
+    spend_date: Optional[date] = None
 ) -> Dict:
-    """Calculate Scope 3 emissions using spend-based method."""
-    # Simple currency conversion (in production, use real rates)
-    currency_to_usd = {
-        "USD": 1.0,
-        "EUR": 1.08,
-        "GBP": 1.27,
-        "AED": 0.27,
-    }
+    """
+    Calculate Scope 3 emissions using spend-based method.
     
-    usd_amount = spend_amount * currency_to_usd.get(currency, 1.0)
+    The spend is converted to USD at the exchange rate effective on
+    spend_date (the latest rate if None). Raises UnknownCurrencyError (a
+    ValueError) for currencies without rates.
+    """
+    fx_rate, fx_rate_date = usd_rate(currency, spend_date)
+    usd_amount = spend_amount * fx_rate
     
     category_mapping = {
         "purchased_goods": "spend_purchased_goods",
@@ -437,10 +427,156 @@ def calculate_spend_based_emissions(
     }
     
     activity = category_mapping.get(category, "spend_purchased_goods")
-    result = calculate_emissions(activity, usd_amount, sub_category=sub_category)
+    result = calculate_emissions(activity, usd_amount, sub_category=sub_category, version=version)
     result["original_amount"] = spend_amount
     result["original_currency"] = currency
     result["usd_amount"] = round(usd_amount, 2)
+    result["fx_rate"] = fx_rate
+    result["fx_rate_date"] = fx_rate_date.isoformat() if fx_rate_date else None
     
     return result
 
+
+
+# ============================================
+# BATCH CALCULATIONS
+# ============================================
+
+def calculate_emissions_batch(
+    activity_types: List[str],
+    quantities: List[float],
+    countries: Optional[List[str]] = None,
+    variants: Optional[List[Optional[str]]] = None,
+    sub_categories: Optional[List[Optional[str]]] = None,
+    version: Optional[str] = None
+) -> Dict:
+    """
+    Calculate CO2e emissions for many activities in one columnar pass.
+    
+    Emission factors are resolved once per distinct
+    (activity_type, country, variant, sub_category) key and then applied
+    to the whole quantity column. Rows whose factor cannot be resolved
+    are reported in ``errors`` and excluded from the aggregates instead
+    of failing the whole batch.
+    
+    Args:
+        activity_types: Activity type per row
+        quantities: Amount of activity per row (in native units)
+        countries: ISO country code per row (defaults to "default")
+        variants: Sub-variant per row
+        sub_categories: Industry category per row for spend-based
+        version: Factor dataset version (default dataset if None)
+    
+    Returns:
+        Dict with per-row result columns, per-scope aggregates and totals
+    """
+    dataset = get_factor_dataset(version)
+    count = len(activity_types)
+    countries = countries if countries is not None else ["default"] * count
+    variants = variants if variants is not None else [None] * count
+    sub_categories = sub_categories if sub_categories is not None else [None] * count
+    
+    for name, column in (
+        ("quantities", quantities),
+        ("countries", countries),
+        ("variants", variants),
+        ("sub_categories", sub_categories),
+    ):
+        if len(column) != count:
+            raise ValueError(f"Column '{name}' has {len(column)} rows, expected {count}")
+    
+    # Resolve each distinct factor key exactly once
+    keys = list(zip(activity_types, countries, variants, sub_categories))
+    resolved: Dict[tuple, Optional[float]] = {}
+    key_errors: Dict[tuple, str] = {}
+    for key in set(keys):
+        try:
+            resolved[key] = get_emission_factor(*key, version=dataset.version)
+        except ValueError as e:
+            resolved[key] = None
+            key_errors[key] = str(e)
+    
+    metadata = dataset.metadata
+    factors = [resolved[key] for key in keys]
+    valid = [factor is not None for factor in factors]
+    
+    # Vectorized multiply over the whole column; unresolved rows contribute 0
+    emissions_kg = list(map(
+        operator.mul,
+        quantities,
+        [factor if factor is not None else 0.0 for factor in factors],
+    ))
+    
+    units = [metadata[a][0] if a in metadata else None for a in activity_types]
+    scopes = [metadata[a][1] if a in metadata else None for a in activity_types]
+    
+    by_scope: Dict[str, Dict] = {}
+    for scope, kg, ok in zip(scopes, emissions_kg, valid):
+        if not ok:
+            continue
+        totals = by_scope.setdefault(scope, {"count": 0, "emissions_kg_co2e": 0.0})
+        totals["count"] += 1
+        totals["emissions_kg_co2e"] += kg
+    
+    total_kg = 0.0
+    for totals in by_scope.values():
+        total_kg += totals["emissions_kg_co2e"]
+        totals["emissions_tonnes_co2e"] = round(totals["emissions_kg_co2e"] / 1000, 4)
+        totals["emissions_kg_co2e"] = round(totals["emissions_kg_co2e"], 2)
+    
+    errors = [
+        {"index": i, "activity_type": keys[i][0], "detail": key_errors[keys[i]]}
+        for i in range(count)
+        if not valid[i]
+    ]
+    
+    return {
+        "count": count,
+        "results": {
+            "activity_type": list(activity_types),
+            "quantity": list(quantities),
+            "unit": units,
+            "emission_factor": factors,
+            "scope": scopes,
+            "emissions_kg_co2e": [
+                round(kg, 2) if ok else None for kg, ok in zip(emissions_kg, valid)
+            ],
+            "emissions_tonnes_co2e": [
+                round(kg / 1000, 4) if ok else None for kg, ok in zip(emissions_kg, valid)
+            ],
+            "country": list(countries),
+            "variant": list(variants),
+            "sub_category": list(sub_categories),
+        },
+        "errors": errors,
+        "by_scope": by_scope,
+        "total_emissions_kg_co2e": round(total_kg, 2),
+        "total_emissions_tonnes_co2e": round(total_kg / 1000, 4),
+        "factor_version": dataset.version,
+    }
+
+
+# ============================================
+# FACTOR CATALOG
+# ============================================
+
+def _build_factor_catalog(factors: Mapping[str, Dict]) -> List[Dict]:
+    """Build the public factor listing of a dataset."""
+    entries = []
+    for activity_type, data in factors.items():
+        factor_info = {
+            "activity_type": activity_type,
+            "unit": data.get("unit", "unknown"),
+            "scope": str(data.get("scope", "")),
+        }
+        
+        if "factor" in data:
+            factor_info["factor_kgCO2e"] = data["factor"]
+        elif "factors" in data and isinstance(data["factors"], dict):
+            factor_info["factors_by_region"] = data["factors"]
+        
+        if "variants" in data:
+            factor_info["variants"] = data["variants"]
+        
+        entries.append(factor_info)
+    return entries
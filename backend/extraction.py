@@ -0,0 +1,486 @@
+"""
+Invoice Data Extraction
+=======================
+
+Offline extraction of ESG activity data from uploaded utility bills and
+fuel invoices, without external OCR services.
+
+Pipeline per document:
+1. Text layer: PDF content streams are decoded (FlateDecode via zlib) and
+   their text-showing operators (Tj, TJ, ', ") are read back into lines.
+   Scanned images have no text layer and are reported as such.
+2. Heuristics: regular expressions pick out consumption in kWh/MWh, water
+   in m3, fuel in litres, the billing period and the invoice total.
+3. Mapping: the quantities become an activity_type for the emission
+   calculator, plus an EnergyConsumption or WaterUsage record.
+
+Parsing is CPU-bound, so documents are processed in a process pool
+(EXTRACTION_WORKERS). At most EXTRACTION_QUEUE_SIZE documents are queued
+or running at once; further requests wait up to EXTRACTION_QUEUE_TIMEOUT
+seconds for a slot and then fail with ExtractionBusyError instead of
+piling up behind the event loop.
+
+EXTRACTOR_VERSION identifies the extraction logic; bump it whenever the
+parser or heuristics change so stored results can be recomputed.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+import re
+import zlib
+
+from .emission_factors import calculate_electricity_emissions, calculate_emissions
+from .models import EnergyConsumption, FuelType, WaterUsage
+
+EXTRACTOR_VERSION = "text-regex-1"
+
+# Worker processes for document parsing
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+# Documents queued or being parsed at once, across all requests
+EXTRACTION_QUEUE_SIZE = int(os.getenv("EXTRACTION_QUEUE_SIZE", "64"))
+
+# Seconds a request waits for a queue slot before giving up
+EXTRACTION_QUEUE_TIMEOUT = float(os.getenv("EXTRACTION_QUEUE_TIMEOUT", "10"))
+
+PDF_EXTENSIONS = (".pdf",)
+
+
+class ExtractionBusyError(RuntimeError):
+    """Raised when the extraction queue stays full (HTTP 503)."""
+
+
+# ============================================
+# PDF TEXT LAYER
+# ============================================
+
+_STREAM = re.compile(rb"<<(.*?)>>\s*stream\r?\n(.*?)\r?\nendstream", re.DOTALL)
+
+# Content stream tokens: literal strings (one level of nested parentheses),
+# hex strings, array brackets, names, numbers and operators
+_TOKEN = re.compile(
+    rb"\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\)"
+    rb"|<[0-9A-Fa-f\s]*>"
+    rb"|[\[\]]"
+    rb"|/[^\s/\[\]()<>{}%]+"
+    rb"|[-+]?(?:\d+\.?\d*|\.\d+)"
+    rb"|[A-Za-z'\"*]+",
+    re.DOTALL,
+)
+
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+_ESCAPE = re.compile(rb"\\([0-7]{1,3}|.)", re.DOTALL)
+
+# Operators that move to a new line of text
+_LINE_OPERATORS = {b"Td", b"TD", b"T*", b"Tm", b"ET", b"'", b'"'}
+
+# TJ kerning beyond this (thousandths of an em) is read as a word gap
+_WORD_GAP = -200
+
+
+def _literal(token: bytes) -> str:
+    def unescape(match):
+        value = match.group(1)
+        if value[:1].isdigit():
+            return bytes([int(value, 8) & 0xFF])
+        if value in b"\r\n":
+            return b""  # Line continuation
+        return _ESCAPES.get(value, value)
+    return _decode(_ESCAPE.sub(unescape, token[1:-1]))
+
+
+def _hex(token: bytes) -> str:
+    digits = re.sub(rb"\s", b"", token[1:-1])
+    if len(digits) % 2:
+        digits += b"0"
+    return _decode(bytes.fromhex(digits.decode()))
+
+
+def _decode(raw: bytes) -> str:
+    if raw.startswith(b"\xfe\xff"):
+        return raw[2:].decode("utf-16-be", "replace")
+    # WinAnsiEncoding, the usual encoding of simple fonts (0x80 is the euro sign)
+    return raw.decode("cp1252", "replace")
+
+
+def content_stream_text(content: bytes) -> str:
+    """Read the text shown by a page content stream, one text line per line."""
+    lines: List[str] = []
+    line: List[str] = []
+    operands: List[str] = []
+    array: Optional[List[str]] = None
+    
+    def new_line():
+        if line:
+            lines.append("".join(line).strip())
+            line.clear()
+    
+    for match in _TOKEN.finditer(content):
+        token = match.group()
+        first = token[:1]
+        if first == b"(":
+            (array if array is not None else operands).append(_literal(token))
+        elif first == b"<":
+            (array if array is not None else operands).append(_hex(token))
+        elif token == b"[":
+            array = []
+        elif token == b"]":
+            operands.append("".join(array or []))
+            array = None
+        elif first.isdigit() or first in b"+-.":
+            if array is not None and float(token) < _WORD_GAP:
+                array.append(" ")
+        elif first == b"/":
+            continue
+        else:
+            if token in _LINE_OPERATORS:
+                new_line()
+            if token in (b"Tj", b"TJ", b"'", b'"') and operands:
+                line.append(operands[-1])
+            operands.clear()
+    new_line()
+    return "\n".join(text for text in lines if text)
+
+
+def pdf_text(data: bytes) -> str:
+    """
+    Extract the text layer of a PDF.
+    
+    Handles uncompressed and FlateDecode content streams with simple
+    (single-byte or UTF-16) string encodings. Image and font streams are
+    skipped; objects inside compressed object streams are not followed.
+    """
+    texts = []
+    for match in _STREAM.finditer(data):
+        header, body = match.group(1), match.group(2)
+        if b"/Image" in header or b"/FontFile" in header or b"/Length1" in header:
+            continue
+        if b"/FlateDecode" in header:
+            try:
+                body = zlib.decompress(body)
+            except zlib.error:
+                continue
+        elif b"/Filter" in header:
+            continue  # Other filters (DCT, LZW, ...) carry no text we can read
+        if b"BT" not in body:
+            continue
+        text = content_stream_text(body)
+        if text:
+            texts.append(text)
+    return "\n".join(texts)
+
+
+# ============================================
+# HEURISTIC FIELD EXTRACTION
+# ============================================
+
+_NUMBER = r"(\d{1,3}(?:[,. \u00a0]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?)"
+
+_ENERGY = re.compile(_NUMBER + r"\s*(kWh|MWh)\b", re.IGNORECASE)
+_WATER = re.compile(_NUMBER + r"\s*(?:m3|m³|cubic\s+met(?:er|re)s?)(?![A-Za-z0-9])", re.IGNORECASE)
+_FUEL = re.compile(_NUMBER + r"\s*(?:litres?|liters?|ltrs?|L)\b")
+_TOTAL = re.compile(
+    r"(?:total\s+(?:due|amount|payable)|amount\s+(?:due|payable)|balance\s+due|invoice\s+total|total)"
+    r"[^\d\n]{0,20}?(€|£|\$|EUR|GBP|USD|CHF|AED|AUD|NZD)?\s*" + _NUMBER
+    # Not a quantity ("Total consumption 1,234 kWh")
+    + r"(?!\d|[,.]\d|\s*(?:kWh|MWh|m3|m³|lit|ltr|L\b))",
+    re.IGNORECASE,
+)
+_TOTAL_LINE = re.compile(r"\b(total|consumption|usage|used)\b", re.IGNORECASE)
+_PERIOD_LINE = re.compile(r"\b(period|from|billing|service|supply)\b", re.IGNORECASE)
+
+_MONTHS = {
+    month: index
+    for index, names in enumerate((
+        ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"),
+        ("may",), ("jun", "june"), ("jul", "july"), ("aug", "august"),
+        ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"), ("dec", "december"),
+    ), start=1)
+    for month in names
+}
+_DATE = re.compile(
+    r"\b(\d{4})-(\d{2})-(\d{2})\b"
+    r"|\b(\d{1,2})[./](\d{1,2})[./](\d{4})\b"
+    r"|\b(\d{1,2})\s+([A-Za-z]{3,9})\.?\s+(\d{4})\b"
+)
+
+_CURRENCY_SYMBOLS = {"€": "EUR", "£": "GBP", "$": "USD"}
+
+_RENEWABLE = re.compile(r"renewable|green\s+(?:energy|electricity|tariff)|guarantees?\s+of\s+origin|\bREGO\b", re.IGNORECASE)
+_GAS = re.compile(r"\bgas\b", re.IGNORECASE)
+_ELECTRIC = re.compile(r"electric", re.IGNORECASE)
+_DIESEL = re.compile(r"diesel|gas\s*oil|\bDERV\b", re.IGNORECASE)
+_PETROL = re.compile(r"petrol|gasoline|unleaded|\bE10\b|super\s*95", re.IGNORECASE)
+_LPG = re.compile(r"\bLPG\b|autogas", re.IGNORECASE)
+
+
+def parse_number(value: str) -> float:
+    """Parse 1,234.56 / 1.234,56 / 1 234 / 12,5 style numbers."""
+    value = value.replace(" ", "").replace("\u00a0", "")
+    if "," in value and "." in value:
+        if value.rfind(",") > value.rfind("."):
+            value = value.replace(".", "").replace(",", ".")
+        else:
+            value = value.replace(",", "")
+    elif "," in value:
+        whole, _, fraction = value.rpartition(",")
+        value = value.replace(",", "") if len(fraction) == 3 and whole else whole.replace(",", "") + "." + fraction
+    elif value.count(".") > 1:
+        value = value.replace(".", "")
+    return float(value)
+
+
+def _dates(text: str) -> List[date]:
+    found = []
+    for match in _DATE.finditer(text):
+        groups = match.groups()
+        try:
+            if groups[0]:
+                found.append(date(int(groups[0]), int(groups[1]), int(groups[2])))
+            elif groups[3]:
+                # Day first, as on European bills; swap when the day cannot be a month
+                first, second = int(groups[3]), int(groups[4])
+                day, month = (second, first) if second > 12 >= first else (first, second)
+                found.append(date(int(groups[5]), month, day))
+            else:
+                month = _MONTHS.get(groups[7].lower())
+                if month:
+                    found.append(date(int(groups[8]), month, int(groups[6])))
+        except ValueError:
+            continue
+    return found
+
+
+def _period(text: str) -> Tuple[Optional[date], Optional[date]]:
+    """Billing period: two dates on a period line, else the span of all dates."""
+    for line in text.splitlines():
+        if _PERIOD_LINE.search(line):
+            dates = _dates(line)
+            if len(dates) >= 2:
+                return min(dates[:2]), max(dates[:2])
+    dates = _dates(text)
+    if len(dates) >= 2:
+        return min(dates), max(dates)
+    return None, None
+
+
+def _quantity(text: str, pattern: re.Pattern, scale: Dict[str, float] = None) -> Optional[float]:
+    """
+    Quantity matching pattern: the one on a total/consumption line if any,
+    otherwise the largest (itemised rates add up to the total).
+    """
+    best = None
+    for line in text.splitlines():
+        for match in pattern.finditer(line):
+            try:
+                value = parse_number(match.group(1))
+            except ValueError:
+                continue
+            if scale and match.lastindex and match.lastindex >= 2:
+                value *= scale.get(match.group(2).lower(), 1.0)
+            labelled = bool(_TOTAL_LINE.search(line))
+            if best is None or (labelled, value) > best:
+                best = (labelled, value)
+    return best[1] if best else None
+
+
+def extract_fields(text: str) -> Dict:
+    """Pick consumption, period and total fields out of invoice text."""
+    fields: Dict = {
+        "kwh": _quantity(text, _ENERGY, {"mwh": 1000.0}),
+        "m3": _quantity(text, _WATER),
+        "litres": _quantity(text, _FUEL),
+        "total_amount": None,
+        "currency": None,
+        "renewable": bool(_RENEWABLE.search(text)),
+    }
+    period_start, period_end = _period(text)
+    fields["period_start"] = period_start.isoformat() if period_start else None
+    fields["period_end"] = period_end.isoformat() if period_end else None
+    
+    totals = []
+    for match in _TOTAL.finditer(text):
+        try:
+            totals.append((parse_number(match.group(2)), match.group(1)))
+        except ValueError:
+            continue
+    if totals:
+        amount, symbol = max(totals, key=lambda total: total[0])
+        fields["total_amount"] = amount
+        if symbol:
+            fields["currency"] = _CURRENCY_SYMBOLS.get(symbol, symbol.upper())
+    return fields
+
+
+def map_fields(fields: Dict, text: str, source_document: Optional[str]) -> Dict:
+    """Map extracted fields to an activity and VSME data records."""
+    mapped: Dict = {
+        "esg_type": None,
+        "activity_type": None,
+        "quantity": None,
+        "energy_consumption": None,
+        "water_usage": None,
+        "calculated_emissions": None,
+    }
+    start, end = fields["period_start"], fields["period_end"]
+    has_period = start is not None and end is not None
+    
+    if fields["kwh"] is not None:
+        mapped.update(esg_type="energy", quantity=fields["kwh"])
+        mapped["activity_type"] = "natural_gas" if _GAS.search(text) and not _ELECTRIC.search(text) else "electricity"
+        if has_period:
+            mapped["energy_consumption"] = EnergyConsumption(
+                period_start=date.fromisoformat(start),
+                period_end=date.fromisoformat(end),
+                fuel_type=FuelType.RENEWABLE if fields["renewable"] else FuelType.NON_RENEWABLE,
+                consumption_kwh=fields["kwh"],
+                source_document=source_document,
+            ).model_dump(mode="json")
+    elif fields["m3"] is not None:
+        mapped.update(esg_type="water", activity_type="water_supply", quantity=fields["m3"])
+        if has_period:
+            mapped["water_usage"] = WaterUsage(
+                period_start=date.fromisoformat(start),
+                period_end=date.fromisoformat(end),
+                volume_m3=fields["m3"],
+                source_document=source_document,
+            ).model_dump(mode="json")
+    elif fields["litres"] is not None:
+        mapped.update(esg_type="fuel", quantity=fields["litres"])
+        if _PETROL.search(text):
+            mapped["activity_type"] = "petrol"
+        elif _LPG.search(text):
+            mapped["activity_type"] = "lpg"
+        elif _DIESEL.search(text):
+            mapped["activity_type"] = "diesel"
+    
+    if mapped["activity_type"] == "electricity" and fields["renewable"]:
+        mapped["calculated_emissions"] = calculate_electricity_emissions(mapped["quantity"], "default", 100)
+    elif mapped["activity_type"] and mapped["quantity"] is not None:
+        mapped["calculated_emissions"] = calculate_emissions(mapped["activity_type"], mapped["quantity"])
+    return mapped
+
+
+# ============================================
+# DOCUMENT EXTRACTION (runs in worker processes)
+# ============================================
+
+def extract_document(path: Optional[str], extension: str, source_document: Optional[str] = None) -> Dict:
+    """
+    Extract ESG data from a spooled document.
+    
+    Never raises for bad input: unreadable or unsupported documents are
+    reported through status ("extracted", "no_data", "no_text_layer",
+    "unsupported" or "failed").
+    """
+    result: Dict = {"extractor_version": EXTRACTOR_VERSION, "status": None, "text_chars": 0, "fields": None}
+    if extension not in PDF_EXTENSIONS:
+        # Images need OCR, which is not part of the offline pipeline
+        result["status"] = "no_text_layer"
+        return result
+    
+    try:
+        data = b""
+        if path:
+            with open(path, "rb") as f:
+                data = f.read()
+        if not data.startswith(b"%PDF"):
+            result["status"] = "unsupported"
+            return result
+        text = pdf_text(data)
+        result["text_chars"] = len(text)
+        if not text:
+            result["status"] = "no_text_layer"
+            return result
+        
+        fields = extract_fields(text)
+        result["fields"] = fields
+        result.update(map_fields(fields, text, source_document))
+        result["status"] = "extracted" if result["activity_type"] else "no_data"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    return result
+
+
+def attach_source(result: Dict, source_document: Optional[str]) -> Dict:
+    """Copy of a (possibly cached) result with its records pointing at source_document."""
+    result = dict(result)
+    for field in ("energy_consumption", "water_usage"):
+        if result.get(field):
+            result[field] = {**result[field], "source_document": source_document}
+    return result
+
+
+# ============================================
+# WORKER POOL
+# ============================================
+
+class ExtractionPool:
+    """Process pool with a bounded queue for document extraction."""
+    
+    def __init__(
+        self,
+        max_workers: int = EXTRACTION_WORKERS,
+        max_queued: int = EXTRACTION_QUEUE_SIZE,
+        queue_timeout: float = EXTRACTION_QUEUE_TIMEOUT
+    ):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+    
+    async def extract(self, path: Optional[str], extension: str, source_document: Optional[str] = None) -> Dict:
+        """
+        Extract a document in a worker process.
+        
+        Raises:
+            ExtractionBusyError: If no queue slot frees up within queue_timeout
+            BrokenProcessPool: If a worker died; the pool is shut down and a
+                fresh one is started on the next call
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_queued)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ExtractionBusyError("Extraction queue is full, retry shortly")
+        
+        executor = None
+        try:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            executor = self._executor
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, extract_document, path, extension, source_document)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory): release the broken pool's
+            # remaining processes and start a fresh pool next time. Concurrent
+            # callers may see the same failure; only the first one resets.
+            if executor is not None and self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            self._slots.release()
+    
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Singleton instance
+_extraction_pool: Optional[ExtractionPool] = None
+
+def get_extraction_pool() -> ExtractionPool:
+    """Get the extraction pool singleton."""
+    global _extraction_pool
+    if _extraction_pool is None:
+        _extraction_pool = ExtractionPool()
+    return _extraction_pool
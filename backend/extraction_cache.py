@@ -0,0 +1,248 @@
+"""
+Extraction Result Cache
+=======================
+
+Content-addressed, on-disk cache of invoice extraction results.
+
+Customers upload the same bills again and again (overlapping monthly
+bundles, several users uploading the same PDF). Results are keyed by the
+document's SHA-256 (computed while the upload streams in) and its file
+type, so a repeated document is answered from disk without parsing.
+
+- Entries are JSON files under
+  EXTRACTION_CACHE_DIR/extractor-<version>.factors-<catalog version>/.
+  Results embed calculated emissions, so they depend on the emission
+  factors as much as on the parser: bumping EXTRACTOR_VERSION or changing
+  the default factor dataset (its content-derived catalog_version)
+  invalidates every older result. Stale extractor-* directories are
+  deleted on first use.
+- The cache is bounded by EXTRACTION_CACHE_MAX_BYTES. The least recently
+  used entries (by file mtime, touched on every hit) are evicted first,
+  so recency survives restarts.
+- Writes go to a temp file and are renamed into place, so concurrent
+  processes sharing the directory never read a partial entry.
+- Concurrent requests for the same document wait for the first
+  extraction instead of parsing it twice.
+- Failed extractions are not cached.
+"""
+
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from .emission_factors import get_factor_dataset
+from .extraction import EXTRACTOR_VERSION
+
+EXTRACTION_CACHE_DIR = os.getenv(
+    "EXTRACTION_CACHE_DIR", os.path.join(tempfile.gettempdir(), "greenalgebra-extraction-cache")
+)
+
+# Total size of cached results on disk
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Extraction statuses worth caching (failures may be transient)
+_CACHEABLE_STATUSES = ("extracted", "no_data", "no_text_layer", "unsupported")
+
+_VERSION_PREFIX = "extractor-"
+
+
+class ExtractionCache:
+    """Size-bounded LRU cache of extraction results on disk."""
+    
+    def __init__(
+        self,
+        directory: str = EXTRACTION_CACHE_DIR,
+        max_bytes: int = EXTRACTION_CACHE_MAX_BYTES,
+        version: str = EXTRACTOR_VERSION,
+        factor_version: Optional[str] = None
+    ):
+        self.root = directory
+        self.version = version
+        self.factor_version = factor_version
+        name = _VERSION_PREFIX + version
+        if factor_version:
+            name += f".factors-{factor_version}"
+        self.directory = os.path.join(directory, name)
+        self.max_bytes = max_bytes
+        self._entries: Optional["OrderedDict[str, int]"] = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    # ==================== Async API ====================
+    
+    async def get_or_extract(
+        self,
+        sha256: str,
+        extension: str,
+        extract: Callable[[], Awaitable[Dict]]
+    ) -> Tuple[Dict, bool]:
+        """
+        Get the cached result for a document, or extract and store it.
+        
+        Returns:
+            (result, cache_hit)
+        """
+        key = self.key(sha256, extension)
+        cached = await asyncio.to_thread(self.get, key)
+        if cached is not None:
+            return cached, True
+        
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending), True
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await extract()
+            if result.get("status") in _CACHEABLE_STATUSES:
+                await asyncio.to_thread(self.put, key, result)
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting; avoid "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+    
+    # ==================== Storage ====================
+    
+    @staticmethod
+    def key(sha256: str, extension: str) -> str:
+        return f"{sha256}{extension.lower()}"
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Read a cached result (blocking), or None."""
+        self._load_index()
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+            result = json.loads(body)
+            os.utime(path)
+        except (OSError, ValueError):
+            # Not cached, evicted by another process, or unreadable
+            self._forget(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        
+        with self._lock:
+            # May have been written by another process sharing the directory
+            if key not in self._entries:
+                self._entries[key] = len(body)
+                self._bytes += len(body)
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return result
+    
+    def put(self, key: str, result: Dict) -> None:
+        """Store a result (blocking), evicting least recently used entries."""
+        self._load_index()
+        body = json.dumps(result, separators=(",", ":"), default=str).encode()
+        if len(body) > self.max_bytes:
+            return
+        
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(handle, "wb") as f:
+                f.write(body)
+            os.replace(temp_path, path)
+        except OSError:
+            return  # Disk full or directory removed: serve uncached
+        
+        with self._lock:
+            self._bytes += len(body) - self._entries.pop(key, 0)
+            self._entries[key] = len(body)
+            evicted = []
+            while self._bytes > self.max_bytes and self._entries:
+                old_key, size = self._entries.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.unlink(self._path(old_key))
+            except FileNotFoundError:
+                pass
+    
+    def clear(self) -> None:
+        """Delete every cached result."""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._entries = OrderedDict()
+            self._bytes = 0
+    
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "directory": self.directory,
+            "extractor_version": self.version,
+            "factor_version": self.factor_version,
+            "entries": len(self._entries) if self._entries is not None else None,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+    
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._bytes -= self._entries.pop(key, 0)
+    
+    def _load_index(self) -> None:
+        """Scan the cache directory once, dropping results of other extractor or factor versions."""
+        if self._entries is not None:
+            return
+        with self._lock:
+            if self._entries is not None:
+                return
+            
+            if os.path.isdir(self.root):
+                for name in os.listdir(self.root):
+                    if name.startswith(_VERSION_PREFIX) and name != os.path.basename(self.directory):
+                        shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            
+            found = []
+            for dirpath, _, filenames in os.walk(self.directory):
+                for filename in filenames:
+                    if not filename.endswith(".json"):
+                        continue  # A write in progress
+                    try:
+                        stat = os.stat(os.path.join(dirpath, filename))
+                    except FileNotFoundError:
+                        continue
+                    found.append((stat.st_mtime, filename[:-len(".json")], stat.st_size))
+            
+            found.sort()
+            self._entries = OrderedDict((key, size) for _, key, size in found)
+            self._bytes = sum(self._entries.values())
+
+
+# Singleton instance
+_extraction_cache: Optional[ExtractionCache] = None
+
+def get_extraction_cache() -> ExtractionCache:
+    """Get the extraction result cache singleton."""
+    global _extraction_cache
+    if _extraction_cache is None:
+        _extraction_cache = ExtractionCache(factor_version=get_factor_dataset().catalog_version)
+    return _extraction_cache
@@ -0,0 +1,134 @@
+"""
+Fake ERP Provider Server
+========================
+
+Local stand-in for the Xero/Sage/DATEV/QuickBooks APIs, used to exercise
+http_client.ProviderHTTPClient (pooling, rate limiting, retries and
+pagination) without network access or provider credentials.
+
+Run it next to the API:
+
+    uvicorn backend.fake_provider:app --port 8010
+    ERP_API_BASE_URL_OVERRIDE=http://localhost:8010 uvicorn backend.main:app
+
+Behaviour is controlled with environment variables:
+- FAKE_PROVIDER_LATENCY_MS: added latency per request (default 0)
+- FAKE_PROVIDER_FAILURE_RATE: fraction of requests answered with 503
+- FAKE_PROVIDER_RATE_LIMIT_RATE: fraction of requests answered with 429
+
+Tests script exact failures instead: fail_next() queues error responses
+for the next requests, and `requests_seen` counts every request by
+(method, path), so retries can be asserted. reset() clears both.
+"""
+
+from collections import Counter
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+import random
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+
+from .integrations import PROVIDER_CONFIG, generate_mock_invoices
+
+LATENCY_MS = float(os.getenv("FAKE_PROVIDER_LATENCY_MS", "0"))
+FAILURE_RATE = float(os.getenv("FAKE_PROVIDER_FAILURE_RATE", "0"))
+RATE_LIMIT_RATE = float(os.getenv("FAKE_PROVIDER_RATE_LIMIT_RATE", "0"))
+
+app = FastAPI(title="Fake ERP Provider", docs_url="/docs")
+
+_invoices: Dict[str, List[Dict]] = {}
+
+# Scripted error responses (status, Retry-After) for the next requests
+_scripted_failures: List[Tuple[int, Optional[str]]] = []
+
+# (method, path) -> requests received
+requests_seen: Counter = Counter()
+
+
+def fail_next(status_code: int, count: int = 1, retry_after: Optional[str] = None) -> None:
+    """Answer the next `count` requests with status_code (and a Retry-After header)."""
+    _scripted_failures.extend([(status_code, retry_after)] * count)
+
+
+def reset() -> None:
+    """Drop scripted failures, request counts and invoices created through POST."""
+    _scripted_failures.clear()
+    requests_seen.clear()
+    _invoices.clear()
+
+
+def _provider_invoices(provider: str) -> List[Dict]:
+    """Invoices for a provider, generated once from a generator seeded with its name."""
+    if provider not in _invoices:
+        _invoices[provider] = generate_mock_invoices(
+            provider, date(2022, 1, 1), date(2024, 12, 31), rng=random.Random(provider)
+        )
+    return _invoices[provider]
+
+
+async def _simulate_conditions(request: Request):
+    requests_seen[(request.method, request.url.path)] += 1
+    if _scripted_failures:
+        status_code, retry_after = _scripted_failures.pop(0)
+        headers = {"Retry-After": retry_after} if retry_after is not None else None
+        return JSONResponse({"detail": "Scripted failure"}, status_code=status_code, headers=headers)
+    
+    if LATENCY_MS:
+        await asyncio.sleep(LATENCY_MS / 1000)
+    roll = random.random()
+    if roll < RATE_LIMIT_RATE:
+        return JSONResponse({"detail": "Rate limit exceeded"}, status_code=429, headers={"Retry-After": "1"})
+    if roll < RATE_LIMIT_RATE + FAILURE_RATE:
+        return JSONResponse({"detail": "Service unavailable"}, status_code=503)
+    return None
+
+
+@app.get("/{provider}/invoices")
+async def list_invoices(
+    request: Request,
+    provider: str,
+    page: int = Query(default=None, ge=1),
+    offset: int = Query(default=None, ge=0),
+    page_size: int = Query(default=100, ge=1, le=1000),
+    modified_since: str = None
+):
+    """
+    Page through invoices by 1-based `page` number or by `offset`.
+    
+    Both pagination styles of ProviderHTTPClient.paginate are supported
+    (use page_param="offset" with style="offset").
+    """
+    if provider not in PROVIDER_CONFIG:
+        raise HTTPException(status_code=404, detail=f"Unknown provider: {provider}")
+    
+    failure = await _simulate_conditions(request)
+    if failure is not None:
+        return failure
+    
+    invoices = _provider_invoices(provider)
+    if modified_since:
+        invoices = [inv for inv in invoices if inv["updated_at"] > modified_since]
+    
+    if offset is not None:
+        start = offset
+    else:
+        start = (page - 1) * page_size if page else 0
+    return {"invoices": invoices[start:start + page_size], "total": len(invoices)}
+
+
+@app.post("/{provider}/invoices", status_code=201)
+async def create_invoice(request: Request, provider: str):
+    """Append an invoice (a non-idempotent request, unless it carries an Idempotency-Key)."""
+    if provider not in PROVIDER_CONFIG:
+        raise HTTPException(status_code=404, detail=f"Unknown provider: {provider}")
+    
+    failure = await _simulate_conditions(request)
+    if failure is not None:
+        return failure
+    
+    invoice = await request.json()
+    _provider_invoices(provider).append(invoice)
+    return invoice
@@ -0,0 +1,165 @@
+"""
+Currency Conversion
+===================
+
+Converts invoice amounts to USD (the unit of the EEIO spend-based
+emission factors) with dated exchange rates.
+
+Rates are read from CSV files in fx_data/ (date, currency, usd_per_unit).
+A rate applies from its date until the next dated rate for the same
+currency, so the directory can hold daily reference rates or sparse
+planning rates. Tables are loaded lazily on first use.
+
+Single lookups go through an LRU cache keyed by (currency, date). Batch
+conversion resolves each distinct (currency, date) pair once and applies
+the rates to the whole amount column, so each invoice is converted at the
+rate of its own date.
+
+Unknown currencies raise UnknownCurrencyError instead of silently
+converting at 1.0.
+"""
+
+from array import array
+from bisect import bisect_right
+from datetime import date
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple, Union
+import csv
+import glob
+import operator
+import os
+import threading
+
+FX_DATA_DIR = os.getenv("FX_DATA_DIR", os.path.join(os.path.dirname(__file__), "fx_data"))
+
+# Cached (currency, date) rate lookups
+FX_RATE_CACHE_SIZE = int(os.getenv("FX_RATE_CACHE_SIZE", "65536"))
+
+BASE_CURRENCY = "USD"
+
+_NAN = float("nan")
+
+
+class UnknownCurrencyError(ValueError):
+    """Raised when no exchange rate table exists for a currency."""
+    
+    def __init__(self, currency: str, known: Sequence[str]):
+        self.currency = currency
+        super().__init__(f"Unknown currency: {currency}. Available: {', '.join(known)}")
+
+
+class FXRateTable:
+    """Dated USD rates per currency, as sorted date ordinals and rates."""
+    
+    def __init__(self, rates: Dict[str, List[Tuple[int, float]]]):
+        self._dates: Dict[str, array] = {}
+        self._rates: Dict[str, array] = {}
+        for currency, series in rates.items():
+            series.sort()
+            self._dates[currency] = array("i", (day for day, _ in series))
+            self._rates[currency] = array("d", (rate for _, rate in series))
+        self.currencies: FrozenSet[str] = frozenset(self._dates) | {BASE_CURRENCY}
+    
+    @classmethod
+    def load(cls, data_dir: str = FX_DATA_DIR) -> "FXRateTable":
+        """Load and merge every *.csv rate file in data_dir."""
+        rates: Dict[str, List[Tuple[int, float]]] = {}
+        for path in sorted(glob.glob(os.path.join(data_dir, "*.csv"))):
+            with open(path, encoding="utf-8", newline="") as f:
+                lines = (line for line in f if line.strip() and not line.startswith("#"))
+                for row in csv.DictReader(lines):
+                    rates.setdefault(row["currency"].strip().upper(), []).append(
+                        (date.fromisoformat(row["date"].strip()).toordinal(), float(row["usd_per_unit"]))
+                    )
+        return cls(rates)
+    
+    def rate(self, currency: str, on: Optional[date] = None) -> Tuple[float, Optional[date]]:
+        """
+        USD per unit of currency on a date (the latest rate if on is None),
+        with the date the rate is effective from.
+        
+        Raises:
+            UnknownCurrencyError: If the currency has no rates
+            ValueError: If the currency has no rate on or before the date
+        """
+        if currency == BASE_CURRENCY:
+            return 1.0, None
+        
+        dates = self._dates.get(currency)
+        if dates is None:
+            raise UnknownCurrencyError(currency, sorted(self.currencies))
+        
+        position = len(dates) - 1 if on is None else bisect_right(dates, on.toordinal()) - 1
+        if position < 0:
+            raise ValueError(f"No {currency} exchange rate on or before {on.isoformat()}")
+        return self._rates[currency][position], date.fromordinal(dates[position])
+
+
+# Singleton instance
+_fx_table: Optional[FXRateTable] = None
+_fx_lock = threading.Lock()
+
+def get_fx_table() -> FXRateTable:
+    """Get the exchange rate table singleton, loading it on first use."""
+    global _fx_table
+    if _fx_table is None:
+        with _fx_lock:
+            if _fx_table is None:
+                _fx_table = FXRateTable.load()
+    return _fx_table
+
+
+@lru_cache(maxsize=FX_RATE_CACHE_SIZE)
+def _cached_rate(currency: str, on: Optional[date]) -> Tuple[float, Optional[date]]:
+    return get_fx_table().rate(currency, on)
+
+
+def usd_rate(currency: str, on: Optional[date] = None) -> Tuple[float, Optional[date]]:
+    """Cached USD rate for a currency on a date, with its effective date."""
+    return _cached_rate(currency.upper(), on)
+
+
+def to_usd(amount: float, currency: str, on: Optional[date] = None) -> float:
+    """Convert an amount to USD at the rate effective on a date."""
+    return amount * usd_rate(currency, on)[0]
+
+
+def convert_to_usd_batch(
+    amounts: Sequence[float],
+    currencies: Sequence[str],
+    dates: Sequence[Union[date, int, None]],
+    strict: bool = True
+) -> array:
+    """
+    Convert a column of amounts to USD, each at the rate of its own date.
+    
+    Args:
+        amounts: Amount per row
+        currencies: Currency code per row
+        dates: Date per row, as a date or its proleptic ordinal (None for
+            the latest rate)
+        strict: Raise on unknown currencies or missing rates; otherwise
+            those rows convert to NaN
+    
+    Returns:
+        array('d') of USD amounts
+    """
+    count = len(amounts)
+    if len(currencies) != count or len(dates) != count:
+        raise ValueError(
+            f"Column lengths differ: {count} amounts, {len(currencies)} currencies, {len(dates)} dates"
+        )
+    
+    # Resolve each distinct (currency, date) pair exactly once
+    keys = list(zip(currencies, dates))
+    resolved: Dict[tuple, float] = {}
+    for currency, on in set(keys):
+        day = date.fromordinal(on) if isinstance(on, int) else on
+        try:
+            resolved[(currency, on)] = usd_rate(currency, day)[0]
+        except ValueError:
+            if strict:
+                raise
+            resolved[(currency, on)] = _NAN
+    
+    return array("d", map(operator.mul, amounts, map(resolved.__getitem__, keys)))
@@ -0,0 +1,67 @@
+"""
+HTTP Caching Helpers
+====================
+
+Content-hash ETags, conditional GET (If-None-Match -> 304 Not Modified)
+and Cache-Control policies for read endpoints.
+
+Policies:
+- PRIVATE_REVALIDATE: tenant data that changes on writes (reports). The
+  browser keeps a copy but revalidates every time; unchanged data costs a
+  bodiless 304.
+- PUBLIC_SHORT: shared reference data that can change on deploy (the
+  current emission factor catalog).
+- IMMUTABLE: versioned resources whose URL changes when the content does.
+"""
+
+from typing import Any, Optional, Tuple
+import hashlib
+import json
+
+from fastapi import Request
+from fastapi.responses import Response
+
+PRIVATE_REVALIDATE = "private, no-cache"
+PUBLIC_SHORT = "public, max-age=3600"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def etag_for(body: bytes) -> str:
+    """Strong ETag derived from the response body."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def json_body(content: Any) -> Tuple[bytes, str]:
+    """Serialize JSON-compatible content to compact bytes and its ETag."""
+    body = json.dumps(content, separators=(",", ":"), default=str).encode()
+    return body, etag_for(body)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header (list, weak validators or *) against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cached_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    cache_control: str,
+    media_type: str = "application/json"
+) -> Response:
+    """Return 304 if the client already has this ETag, else the full body."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
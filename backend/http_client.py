@@ -0,0 +1,272 @@
+"""
+ERP Provider HTTP Client
+========================
+
+Shared async HTTP layer for the real Xero/Sage/DATEV/QuickBooks APIs.
+
+- One pooled httpx.AsyncClient per provider (keep-alive, bounded
+  connections), so paging through invoices reuses TLS connections
+- Token-bucket rate limiting per provider (and optionally per tenant),
+  using the limits in PROVIDER_CONFIG
+- Retries with exponential backoff and full jitter, honouring
+  Retry-After. 429 responses are retried for every request. Transport
+  errors and 5xx responses are only retried for idempotent methods, or
+  for requests carrying an Idempotency-Key, so a POST that may have
+  reached the provider is never sent twice
+- Automatic pagination (page-number or offset/limit)
+
+For local development and tests, point every provider at the fake
+provider server (see fake_provider.py) with ERP_API_BASE_URL_OVERRIDE,
+e.g. ERP_API_BASE_URL_OVERRIDE=http://localhost:8010 — the provider id is
+appended as the first path segment.
+"""
+
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import asyncio
+import os
+import random
+import time
+
+import httpx
+
+from .integrations import PROVIDER_CONFIG
+
+# Connection pool settings per provider
+HTTP_MAX_CONNECTIONS = int(os.getenv("ERP_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("ERP_HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("ERP_HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("ERP_HTTP_TIMEOUT_SECONDS", "30"))
+
+# Retry settings
+HTTP_MAX_RETRIES = int(os.getenv("ERP_HTTP_MAX_RETRIES", "4"))
+HTTP_BACKOFF_BASE = float(os.getenv("ERP_HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("ERP_HTTP_BACKOFF_MAX", "30"))
+
+# Used when a provider has no "rate_limit" entry in PROVIDER_CONFIG
+DEFAULT_RATE_LIMIT = {"requests_per_second": 5.0, "burst": 10}
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Methods that are safe to resend after a transport error or 5xx response
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+
+
+class TokenBucket:
+    """Async token bucket: refills at `rate` tokens/second up to `capacity`."""
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+    
+    def drain(self, seconds: float) -> None:
+        """Block new requests for `seconds` (e.g. after a 429 Retry-After)."""
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class ProviderHTTPClient:
+    """Pooled, rate-limited, retrying HTTP client for ERP provider APIs."""
+    
+    def __init__(
+        self,
+        base_urls: Optional[Dict[str, str]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        max_retries: int = HTTP_MAX_RETRIES
+    ):
+        self.max_retries = max_retries
+        self._base_urls = base_urls or {}
+        self._transport = transport
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+    
+    def _base_url(self, provider: str) -> str:
+        if provider in self._base_urls:
+            return self._base_urls[provider]
+        
+        override = os.getenv("ERP_API_BASE_URL_OVERRIDE")
+        if override:
+            return f"{override.rstrip('/')}/{provider}"
+        
+        if provider not in PROVIDER_CONFIG:
+            raise ValueError(f"Unknown provider: {provider}")
+        return PROVIDER_CONFIG[provider]["api_base_url"]
+    
+    def _client(self, provider: str) -> httpx.AsyncClient:
+        """Get (or lazily create) the pooled client for a provider."""
+        client = self._clients.get(provider)
+        if client is None:
+            client = httpx.AsyncClient(
+                base_url=self._base_url(provider),
+                timeout=HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                transport=self._transport,
+            )
+            self._clients[provider] = client
+        return client
+    
+    def _bucket(self, provider: str, tenant_id: Optional[str]) -> TokenBucket:
+        key = (provider, tenant_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            limit = PROVIDER_CONFIG.get(provider, {}).get("rate_limit", DEFAULT_RATE_LIMIT)
+            bucket = TokenBucket(limit["requests_per_second"], limit["burst"])
+            self._buckets[key] = bucket
+        return bucket
+    
+    async def request(
+        self,
+        provider: str,
+        method: str,
+        path: str,
+        access_token: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        **kwargs: Any
+    ) -> httpx.Response:
+        """
+        Send a request to a provider API with rate limiting and retries.
+        
+        Rate-limited (429) requests are always retried. Transport errors
+        and 5xx responses are retried only for idempotent methods or when
+        an idempotency_key is given (sent as the Idempotency-Key header);
+        otherwise the provider may already have applied the request.
+        
+        Raises httpx.HTTPStatusError for non-retryable error responses (or
+        when retries are exhausted) and httpx.TransportError when the
+        provider stays unreachable.
+        """
+        client = self._client(provider)
+        bucket = self._bucket(provider, tenant_id)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if access_token:
+            headers["Authorization"] = f"Bearer {access_token}"
+        if idempotency_key:
+            headers[IDEMPOTENCY_KEY_HEADER] = idempotency_key
+        
+        resendable = method.upper() in IDEMPOTENT_METHODS or any(
+            name.lower() == IDEMPOTENCY_KEY_HEADER.lower() for name in headers
+        )
+        
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            try:
+                response = await client.request(method, path, headers=headers, **kwargs)
+            except httpx.TransportError:
+                if not resendable or attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(_backoff_delay(attempt))
+                attempt += 1
+                continue
+            
+            retryable = response.status_code == 429 or (
+                resendable and response.status_code in RETRYABLE_STATUS_CODES
+            )
+            if not retryable or attempt >= self.max_retries:
+                response.raise_for_status()
+                return response
+            
+            retry_after = _retry_after_seconds(response)
+            if retry_after is not None:
+                # Hold back every request to this provider, not just this one
+                bucket.drain(retry_after)
+            else:
+                await asyncio.sleep(_backoff_delay(attempt))
+            attempt += 1
+    
+    async def paginate(
+        self,
+        provider: str,
+        path: str,
+        items_key: str,
+        access_token: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        style: str = "page",
+        page_size: int = 100,
+        page_param: str = "page",
+        size_param: str = "page_size",
+        first_page: int = 1
+    ) -> AsyncIterator[Dict]:
+        """
+        Yield items from a paginated list endpoint, fetching pages lazily.
+        
+        style="page" sends page numbers starting at first_page; style="offset"
+        sends an offset (in page_param) that advances by page_size. Iteration
+        stops at the first empty or short page.
+        """
+        if style not in ("page", "offset"):
+            raise ValueError(f"Unknown pagination style: {style}")
+        
+        position = first_page if style == "page" else 0
+        while True:
+            page_params = dict(params or {})
+            page_params[page_param] = position
+            page_params[size_param] = page_size
+            
+            response = await self.request(
+                provider, "GET", path,
+                access_token=access_token,
+                tenant_id=tenant_id,
+                params=page_params,
+            )
+            items = response.json().get(items_key) or []
+            for item in items:
+                yield item
+            
+            if len(items) < page_size:
+                return
+            position += 1 if style == "page" else page_size
+    
+    async def close(self) -> None:
+        """Close all pooled connections."""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse a numeric Retry-After header, capped at HTTP_BACKOFF_MAX."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return min(max(float(value), 0.0), HTTP_BACKOFF_MAX)
+    except ValueError:
+        return None
+
+
+# Singleton instance
+_http_client: Optional[ProviderHTTPClient] = None
+
+def get_http_client() -> ProviderHTTPClient:
+    """Get the shared provider HTTP client."""
+    global _http_client
+    if _http_client is None:
+        _http_client = ProviderHTTPClient()
+    return _http_client
@@ -11,12 +11,28 @@ Currently implements mock integrations for:
 In production, these would use real OAuth2 flows and API calls.
 """
 
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from datetime import date, datetime, timedelta
 from enum import Enum
+import contextlib
 import random
+import threading
+import time
 import uuid
 
+from .database import get_db_service
+from .invoice_batch import InvoiceBatch, iter_invoice_batches
+from .rollups import (
+    CONTRIBUTION_FIELDS,
+    Cells,
+    contribution_cells,
+    contribution_month,
+    get_rollup_index,
+    invoice_contributions,
+    sync_source,
+)
+
 class IntegrationProvider(str, Enum):
     XERO = "xero"
     SAGE = "sage"
@@ -41,6 +57,8 @@ PROVIDER_CONFIG = {
         "logo": "https://upload.wikimedia.org/wikipedia/commons/9/9f/Xero_software_logo.svg",
         "description": "Cloud accounting for small business",
         "oauth_url": "https://login.xero.com/identity/connect/authorize",
+        "api_base_url": "https://api.xero.com/api.xro/2.0",
+        "rate_limit": {"requests_per_second": 1.0, "burst": 5},  # 60 calls/min per tenant
         "capabilities": ["invoices", "expenses", "payroll", "bank_transactions"],
         "regions": ["UK", "AU", "NZ", "US", "EU"],
     },
@@ -49,6 +67,7 @@ PROVIDER_CONFIG = {
         "logo": "https://www.sage.com/favicon.ico",
         "description": "Financial management for growing businesses",
         "oauth_url": "https://www.intacct.com/ia/acct/login.phtml",
+        "api_base_url": "https://api.intacct.com/ia/api/v1",
         "capabilities": ["invoices", "expenses", "general_ledger", "assets"],
         "regions": ["UK", "US", "EU"],
     },
@@ -57,6 +76,7 @@ PROVIDER_CONFIG = {
         "logo": "https://www.datev.de/favicon.ico",
         "description": "German accounting standard",
         "oauth_url": "https://apps.datev.de/oauth/authorize",
+        "api_base_url": "https://accounting-documents.api.datev.de/platform/v2",
         "capabilities": ["invoices", "bookkeeping", "payroll"],
         "regions": ["DE", "AT", "CH"],
     },
@@ -65,18 +85,66 @@ PROVIDER_CONFIG = {
         "logo": "https://quickbooks.intuit.com/favicon.ico",
         "description": "Small business accounting",
         "oauth_url": "https://appcenter.intuit.com/connect/oauth2",
+        "api_base_url": "https://quickbooks.api.intuit.com/v3",
+        "rate_limit": {"requests_per_second": 8.0, "burst": 10},  # 500 calls/min per realm
         "capabilities": ["invoices", "expenses", "payroll", "bank_transactions"],
         "regions": ["US", "UK", "AU", "CA"],
     },
 }
 
 
+# Data types served from the provider's invoice/expense endpoints
+INVOICE_DATA_TYPES = ("invoices", "expenses")
+
+# Ledger contribution fields feeding the sync aggregates
+_ESG_TYPE = CONTRIBUTION_FIELDS.index("esg_type")
+_AMOUNT = CONTRIBUTION_FIELDS.index("amount")
+_EMISSIONS_KG = CONTRIBUTION_FIELDS.index("emissions_kg")
+_DEDUPE_KEY = CONTRIBUTION_FIELDS.index("dedupe_key")
+
+
 # ============================================
 # MOCK DATA GENERATORS
 # ============================================
 
-def generate_mock_invoices(provider: str, start_date: date, end_date: date) -> List[Dict]:
+def generate_mock_invoices(
+    provider: str,
+    start_date: date,
+    end_date: date,
+    modified_since: Optional[str] = None,
+    rng: Optional[random.Random] = None
+) -> List[Dict]:
     """Generate mock invoice/expense data as would be returned from ERP API."""
+    return list(iter_mock_invoices(provider, start_date, end_date, modified_since, rng))
+
+
+def generate_mock_invoice_batch(
+    provider: str,
+    start_date: date,
+    end_date: date,
+    modified_since: Optional[str] = None,
+    rng: Optional[random.Random] = None
+) -> InvoiceBatch:
+    """Generate mock invoices straight into a columnar InvoiceBatch."""
+    return InvoiceBatch.from_invoices(iter_mock_invoices(provider, start_date, end_date, modified_since, rng))
+
+
+def iter_mock_invoices(
+    provider: str,
+    start_date: date,
+    end_date: date,
+    modified_since: Optional[str] = None,
+    rng: Optional[random.Random] = None
+) -> Iterator[Dict]:
+    """
+    Lazily yield mock invoice/expense data, one invoice at a time.
+    
+    If modified_since (ISO timestamp) is given, only invoices updated after
+    it are returned, like a provider's "modified since" filter. Every value,
+    including the invoice ids, is drawn from rng (default: the global
+    random module), so a seeded generator reproduces the same invoices.
+    """
+    rng = rng or random
     
     # ESG-relevant expense categories with typical vendors
     expense_categories = [
@@ -96,28 +164,35 @@ def generate_mock_invoices(provider: str, start_date: date, end_date: date) -> L
         {"category": "courier_shipping", "vendor_prefix": "Courier Express", "avg_amount": 380, "esg_type": "transport"},
     ]
     
-    invoices = []
+    if modified_since:
+        start_date = max(start_date, datetime.fromisoformat(modified_since).date())
+    
     current_date = start_date
     
     while current_date <= end_date:
+        updated_at = datetime.combine(current_date, datetime.min.time()).isoformat()
+        if modified_since and updated_at <= modified_since:
+            current_date += timedelta(days=7)
+            continue
+        
         # Generate 3-8 invoices per week
-        num_invoices = random.randint(3, 8)
+        num_invoices = rng.randint(3, 8)
         
         for _ in range(num_invoices):
-            category = random.choice(expense_categories)
-            variance = random.uniform(0.7, 1.4)
+            category = rng.choice(expense_categories)
+            variance = rng.uniform(0.7, 1.4)
             amount = round(category["avg_amount"] * variance, 2)
             
             # Add quantity/unit data for ESG calculations
-            quantity_data = generate_quantity_data(category["esg_type"], amount)
+            quantity_data = generate_quantity_data(category["esg_type"], amount, rng)
             
             invoice = {
-                "id": str(uuid.uuid4()),
+                "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
                 "provider": provider,
-                "invoice_number": f"INV-{random.randint(10000, 99999)}",
+                "invoice_number": f"INV-{rng.randint(10000, 99999)}",
                 "date": current_date.isoformat(),
                 "due_date": (current_date + timedelta(days=30)).isoformat(),
-                "vendor_name": f"{category['vendor_prefix']} {random.choice(['Ltd', 'Inc', 'GmbH', 'SA'])}",
+                "vendor_name": f"{category['vendor_prefix']} {rng.choice(['Ltd', 'Inc', 'GmbH', 'SA'])}",
                 "category": category["category"],
                 "esg_type": category["esg_type"],
                 "amount": amount,
@@ -125,6 +200,7 @@ def generate_mock_invoices(provider: str, start_date: date, end_date: date) -> L
                 "tax_amount": round(amount * 0.20, 2),
                 "total_amount": round(amount * 1.20, 2),
                 "status": "paid",
+                "updated_at": updated_at,
                 "line_items": [
                     {
                         "description": f"{category['category'].replace('_', ' ').title()} - {current_date.strftime('%B %Y')}",
@@ -138,15 +214,14 @@ def generate_mock_invoices(provider: str, start_date: date, end_date: date) -> L
                 "esg_data": quantity_data,
             }
             
-            invoices.append(invoice)
+            yield invoice
         
         current_date += timedelta(days=7)
-    
-    return invoices
 
 
-def generate_quantity_data(esg_type: str, amount: float) -> Dict:
+def generate_quantity_data(esg_type: str, amount: float, rng: Optional[random.Random] = None) -> Dict:
     """Generate realistic quantity data for ESG calculations based on spend."""
+    rng = rng or random
     
     quantity_mappings = {
         "energy": {
@@ -183,7 +258,7 @@ def generate_quantity_data(esg_type: str, amount: float) -> Dict:
     }
     
     type_data = quantity_mappings.get(esg_type, quantity_mappings["purchased_goods"])
-    subtype = random.choice(list(type_data.keys()))
+    subtype = rng.choice(list(type_data.keys()))
     config = type_data[subtype]
     
     quantity = amount / config["price_per_unit"]
@@ -233,6 +308,144 @@ def generate_mock_employees(company_size: str = "medium") -> Dict:
     }
 
 
+# ============================================
+# SYNC STATE
+# ============================================
+
+def _empty_aggregates() -> Dict:
+    return {"invoices_count": 0, "esg_summary": {}, "total_emissions_kg": 0.0}
+
+
+def _accumulate_aggregates(aggregates: Dict, contribution: list, sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) one invoice's contribution."""
+    aggregates["invoices_count"] += sign
+    aggregates["total_emissions_kg"] += sign * contribution[_EMISSIONS_KG]
+    esg_type = contribution[_ESG_TYPE]
+    totals = aggregates["esg_summary"].setdefault(esg_type, {"count": 0, "total_amount": 0.0})
+    totals["count"] += sign
+    totals["total_amount"] += sign * contribution[_AMOUNT]
+    if not totals["count"]:
+        del aggregates["esg_summary"][esg_type]
+
+
+def _format_aggregates(aggregates: Dict) -> Dict:
+    """Rounded aggregates as returned by the API (stored unrounded)."""
+    total_kg = aggregates["total_emissions_kg"]
+    return {
+        "invoices_count": aggregates["invoices_count"],
+        "esg_summary": {
+            esg_type: {"count": totals["count"], "total_amount": round(totals["total_amount"], 2)}
+            for esg_type, totals in aggregates["esg_summary"].items()
+        },
+        "total_emissions_kg": round(total_kg, 2),
+        "total_emissions_tonnes": round(total_kg / 1000, 4),
+    }
+
+
+class SyncState:
+    """
+    A provider's incremental sync state.
+    
+    Holds the cursors per invoice data type and the ledger of what every
+    synced invoice contributes (invoice id -> contribution, see
+    rollups.CONTRIBUTION_FIELDS), grouped by invoice month as it is stored.
+    The aggregates are kept in step with the ledger, so re-syncing an
+    invoice replaces its contribution rather than adding it again. The
+    ledger is also indexed by dedupe key, to find invoices already booked
+    through another provider.
+    """
+    
+    def __init__(self, stored: Optional[Dict] = None, entries: Optional[Dict[str, list]] = None):
+        stored = stored or {}
+        self.cursors: Dict[str, Dict] = stored.get("cursors") or {}
+        self.aggregates: Dict = stored.get("aggregates") or _empty_aggregates()
+        self.revision: int = stored.get("revision", 0)
+        self.layout: Dict[str, int] = stored.get("ledger") or {}
+        self.entries: Dict[str, list] = {}
+        self.months: Dict[str, Dict[str, list]] = {}
+        # Dedupe key -> invoice id
+        self.keys: Dict[str, str] = {}
+        for invoice_id, contribution in (entries or {}).items():
+            self._put(invoice_id, contribution)
+    
+    def invoice_cursor(self, data_types: List[str]) -> Optional[str]:
+        """
+        Get the high-water mark to fetch invoices from.
+        
+        Returns None (full sync) unless every requested invoice data type has
+        a cursor, in which case the oldest cursor is used.
+        """
+        cursors = [
+            self.cursors.get(data_type)
+            for data_type in INVOICE_DATA_TYPES
+            if data_type in data_types
+        ]
+        if not cursors or any(cursor is None for cursor in cursors):
+            return None
+        return min(cursor["high_water_mark"] for cursor in cursors)
+    
+    def apply(self, changes: Dict[str, list], replace: bool) -> Tuple[List[list], Set[str]]:
+        """
+        Record synced contributions. With replace every earlier entry is
+        dropped; otherwise only the re-synced invoices' entries are.
+        
+        Returns:
+            (removed contributions, months of the ledger that changed)
+        """
+        if replace:
+            removed = list(self.entries.values())
+            months = set(self.months)
+            self.entries, self.months, self.keys = {}, {}, {}
+            self.aggregates = _empty_aggregates()
+        else:
+            removed = []
+            months = set()
+            for invoice_id in changes:
+                previous = self.entries.pop(invoice_id, None)
+                if previous is not None:
+                    month = contribution_month(previous)
+                    del self.months[month][invoice_id]
+                    self.keys.pop(previous[_DEDUPE_KEY], None)
+                    months.add(month)
+                    removed.append(previous)
+                    _accumulate_aggregates(self.aggregates, previous, -1)
+        
+        for invoice_id, contribution in changes.items():
+            months.add(self._put(invoice_id, contribution))
+            _accumulate_aggregates(self.aggregates, contribution, 1)
+        return removed, months
+    
+    def month_entries(self, months: Iterable[str]) -> Dict[str, Dict[str, list]]:
+        """The complete ledger entries of each month (empty if it has none)."""
+        return {month: self.months.get(month, {}) for month in months}
+    
+    def year_cells(self, years: Iterable[int]) -> Dict[int, Cells]:
+        """Rollup cells of every ledger entry of each year."""
+        return {
+            year: contribution_cells(
+                contribution
+                for month, month_entries in self.months.items() if month.startswith(f"{year}-")
+                for contribution in month_entries.values()
+            )
+            for year in years
+        }
+    
+    def to_dict(self) -> Dict:
+        return {
+            "cursors": self.cursors,
+            "aggregates": self.aggregates,
+            "revision": self.revision,
+            "ledger": self.layout,
+        }
+    
+    def _put(self, invoice_id: str, contribution: list) -> str:
+        month = contribution_month(contribution)
+        self.entries[invoice_id] = contribution
+        self.months.setdefault(month, {})[invoice_id] = contribution
+        self.keys[contribution[_DEDUPE_KEY]] = invoice_id
+        return month
+
+
 # ============================================
 # INTEGRATION SERVICE CLASS
 # ============================================
@@ -243,6 +456,13 @@ class IntegrationService:
     def __init__(self, company_id: str):
         self.company_id = company_id
         self._connections: Dict[str, Dict] = {}
+        # Sync state per provider, cached from the database by revision
+        self._sync_states: Dict[str, SyncState] = {}
+        # One sync per provider at a time: syncs read and advance the same cursor
+        self._sync_locks: Dict[str, threading.Lock] = {}
+        self._sync_locks_guard = threading.Lock()
+        # One commit at a time, so each sees the other providers' ledgers complete
+        self._commit_lock = threading.Lock()
     
     def get_available_providers(self) -> List[Dict]:
         """Get list of available integration providers."""
@@ -289,13 +509,40 @@ class IntegrationService:
             return self._connections[provider]
         return {"provider": provider, "status": ConnectionStatus.DISCONNECTED.value}
     
-    def sync_data(self, provider: str, data_types: List[str], date_from: date, date_to: date) -> Dict:
-        """Sync data from connected provider."""
+    def require_connection(self, provider: str) -> None:
+        """Raise ValueError unless the provider is connected."""
         if provider not in self._connections:
             raise ValueError(f"Provider {provider} not connected")
         
         if self._connections[provider]["status"] != ConnectionStatus.CONNECTED.value:
             raise ValueError(f"Provider {provider} is not in connected state")
+    
+    def sync_data(
+        self,
+        provider: str,
+        data_types: List[str],
+        date_from: date,
+        date_to: date,
+        incremental: bool = False
+    ) -> Dict:
+        """
+        Sync data from connected provider.
+        
+        Invoices are returned as a columnar InvoiceBatch under
+        data["invoices"] (convert with to_dicts() for JSON) and are enriched
+        with calculated emissions. With incremental=True
+        only invoices changed since the stored cursor for this provider and
+        data type are fetched; each replaces its earlier contribution to the
+        stored aggregates, by invoice id. Otherwise the window is re-synced
+        in full and replaces them. Invoices already recorded through another
+        provider are returned but not recorded again.
+        
+        Sync state is persisted through the database service, so this
+        blocks: call it from a worker thread. Syncs of the same provider
+        (direct, streamed or jobs) run one at a time, a later one waiting
+        for the earlier to commit its cursor.
+        """
+        self.require_connection(provider)
         
         result = {
             "provider": provider,
@@ -305,25 +552,387 @@ class IntegrationService:
         }
         
         if "invoices" in data_types or "expenses" in data_types:
-            invoices = generate_mock_invoices(provider, date_from, date_to)
-            result["data"]["invoices"] = invoices
-            result["data"]["invoices_count"] = len(invoices)
-            
-            # Calculate totals by ESG category
-            esg_totals = {}
-            for inv in invoices:
-                esg_type = inv["esg_type"]
-                if esg_type not in esg_totals:
-                    esg_totals[esg_type] = {"count": 0, "total_amount": 0}
-                esg_totals[esg_type]["count"] += 1
-                esg_totals[esg_type]["total_amount"] += inv["amount"]
-            result["data"]["esg_summary"] = esg_totals
+            with self._sync_lock(provider):
+                state, modified_since, invoices = self._fetch_invoices(
+                    provider, data_types, date_from, date_to, incremental
+                )
+                result["data"]["invoices"] = invoices
+                result["data"]["invoices_count"] = len(invoices)
+                
+                # Calculate totals by ESG category
+                result["data"]["esg_summary"] = invoices.esg_summary()
+                result["data"].update(invoices.calculate_emissions())
+                result["data"]["sync_state"] = self._commit_sync(
+                    provider, state, data_types, invoice_contributions(invoices),
+                    modified_since, invoices.max_updated_at()
+                )
         
         if "employees" in data_types or "payroll" in data_types:
             result["data"]["employees"] = generate_mock_employees()
         
         return result
     
+    def stream_sync_data(
+        self,
+        provider: str,
+        data_types: List[str],
+        date_from: date,
+        date_to: date,
+        incremental: bool = False,
+        chunk_size: int = 500
+    ) -> Iterator[Dict]:
+        """
+        Sync data from connected provider as a stream of records.
+        
+        Invoices are pulled lazily into columnar chunks of chunk_size and
+        enriched with calculated emissions, so memory stays flat regardless of the date
+        range. Yields {"type": "invoice", "data": ...} records followed by a
+        single {"type": "summary", "data": ...} record carrying the
+        esg_summary and total emissions. Sync state is committed when the
+        summary is produced, so an abandoned stream leaves it untouched.
+        
+        The connection is checked before the stream is returned, so errors
+        surface before any record is produced. Iterate it from a worker
+        thread, as sync state is read and written through the database.
+        The provider's sync lock is taken on the first record and held until
+        the stream is exhausted or closed.
+        """
+        self.require_connection(provider)
+        records = self._iter_sync_records(provider, data_types, date_from, date_to, incremental, chunk_size)
+        return self._holding_sync_lock(provider, records)
+    
+    def _holding_sync_lock(self, provider: str, records: Iterator[Dict]) -> Iterator[Dict]:
+        with self._sync_lock(provider):
+            yield from records
+    
+    def _iter_sync_records(
+        self,
+        provider: str,
+        data_types: List[str],
+        date_from: date,
+        date_to: date,
+        incremental: bool,
+        chunk_size: int
+    ) -> Iterator[Dict]:
+        summary = {
+            "provider": provider,
+            "synced_at": datetime.utcnow().isoformat(),
+            "date_range": {"from": date_from.isoformat(), "to": date_to.isoformat()},
+        }
+        
+        if "invoices" in data_types or "expenses" in data_types:
+            esg_totals: Dict = {}
+            emissions_by_scope: Dict[str, Dict] = {}
+            invoices_count = 0
+            total_kg = 0.0
+            high_water_mark = None
+            
+            changes: Dict[str, list] = {}
+            state = self._load_sync_state(provider)
+            modified_since = state.invoice_cursor(data_types) if incremental else None
+            
+            invoices = iter_mock_invoices(provider, date_from, date_to, modified_since)
+            for chunk in iter_invoice_batches(invoices, chunk_size):
+                totals = chunk.calculate_emissions()
+                chunk.esg_summary(esg_totals)
+                changes.update(invoice_contributions(chunk))
+                invoices_count += len(chunk)
+                total_kg += totals["total_emissions_kg"]
+                for scope, scope_totals in totals["emissions_by_scope"].items():
+                    merged = emissions_by_scope.setdefault(scope, {"count": 0, "emissions_kg_co2e": 0.0})
+                    merged["count"] += scope_totals["count"]
+                    merged["emissions_kg_co2e"] += scope_totals["emissions_kg_co2e"]
+                
+                chunk_mark = chunk.max_updated_at()
+                if chunk_mark and (high_water_mark is None or chunk_mark > high_water_mark):
+                    high_water_mark = chunk_mark
+                
+                for invoice in chunk.iter_dicts():
+                    yield {"type": "invoice", "data": invoice}
+            
+            for scope_totals in emissions_by_scope.values():
+                scope_totals["emissions_kg_co2e"] = round(scope_totals["emissions_kg_co2e"], 2)
+                scope_totals["emissions_tonnes_co2e"] = round(scope_totals["emissions_kg_co2e"] / 1000, 4)
+            
+            summary["invoices_count"] = invoices_count
+            summary["esg_summary"] = esg_totals
+            summary["total_emissions_kg"] = round(total_kg, 2)
+            summary["total_emissions_tonnes"] = round(total_kg / 1000, 4)
+            summary["emissions_by_scope"] = emissions_by_scope
+            summary["sync_state"] = self._commit_sync(
+                provider, state, data_types, changes, modified_since, high_water_mark
+            )
+        
+        if "employees" in data_types or "payroll" in data_types:
+            summary["employees"] = generate_mock_employees()
+        
+        yield {"type": "summary", "data": summary}
+    
+    def sync_all(
+        self,
+        data_types: List[str],
+        date_from: date,
+        date_to: date,
+        incremental: bool = False
+    ) -> Dict:
+        """
+        Sync every connected provider and merge the results.
+        
+        Providers are fetched in parallel threads, so against the real
+        (I/O-bound) provider APIs wall time is bounded by the slowest
+        provider rather than the sum. The mock generators are CPU-bound
+        Python and gain nothing from the threads.
+        
+        The fetched invoices are then deduplicated and committed in provider
+        name order: an invoice present in more than one provider (same
+        vendor, number, date and total) is kept once, by the provider whose
+        ledger already holds it or else the first provider, and only the
+        kept invoices are recorded in each provider's sync state and
+        rollups. esg_summary and emission totals are computed on
+        the merged set. A failing provider is reported in "providers"
+        without failing the others.
+        
+        Every provider's sync lock is held for the whole call. Blocking:
+        call it from a worker thread.
+        """
+        providers = sorted(
+            provider for provider, connection in self._connections.items()
+            if connection["status"] == ConnectionStatus.CONNECTED.value
+        )
+        if not providers:
+            raise ValueError("No providers connected")
+        
+        merged = {
+            "providers": [],
+            "synced_at": datetime.utcnow().isoformat(),
+            "date_range": {"from": date_from.isoformat(), "to": date_to.isoformat()},
+            "data": {}
+        }
+        wants_invoices = "invoices" in data_types or "expenses" in data_types
+        
+        invoices = InvoiceBatch()
+        seen = set()
+        duplicates = 0
+        started = time.perf_counter()
+        def timed_fetch(provider: str) -> Tuple[Optional[Tuple], float, Optional[str]]:
+            provider_started = time.perf_counter()
+            try:
+                fetched = None
+                if wants_invoices:
+                    fetched = self._fetch_invoices(provider, data_types, date_from, date_to, incremental)
+                return fetched, time.perf_counter() - provider_started, None
+            except ValueError as e:
+                return None, time.perf_counter() - provider_started, str(e)
+        
+        with contextlib.ExitStack() as locks:
+            # Always taken in name order, so concurrent calls cannot deadlock
+            for provider in providers:
+                locks.enter_context(self._sync_lock(provider))
+            
+            with ThreadPoolExecutor(max_workers=len(providers)) as executor:
+                outcomes = list(executor.map(timed_fetch, providers))
+            
+            for provider, (fetched, seconds, error) in zip(providers, outcomes):
+                provider_report = {"provider": provider, "status": "ok", "seconds": round(seconds, 3)}
+                try:
+                    if error is not None:
+                        raise ValueError(error)
+                    if fetched is not None:
+                        state, modified_since, batch = fetched
+                        keep = []
+                        keys = set()
+                        for index in range(len(batch)):
+                            key = batch.dedupe_key(index)
+                            if key in seen or key in keys:
+                                duplicates += 1
+                                continue
+                            keys.add(key)
+                            keep.append(index)
+                        
+                        contributions = invoice_contributions(batch)
+                        kept = {batch.id[index]: contributions[batch.id[index]] for index in keep}
+                        self._commit_sync(
+                            provider, state, data_types, kept, modified_since, batch.max_updated_at()
+                        )
+                        seen |= keys
+                        invoices.extend(batch, keep)
+                        provider_report["invoices_count"] = len(batch)
+                except ValueError as e:
+                    provider_report["status"] = "error"
+                    provider_report["error"] = str(e)
+                merged["providers"].append(provider_report)
+        merged["wall_seconds"] = round(time.perf_counter() - started, 3)
+        
+        if wants_invoices:
+            merged["data"]["invoices"] = invoices
+            merged["data"]["invoices_count"] = len(invoices)
+            merged["data"]["duplicates_removed"] = duplicates
+            merged["data"]["esg_summary"] = invoices.esg_summary()
+            merged["data"].update(invoices.calculate_emissions())
+        
+        if "employees" in data_types or "payroll" in data_types:
+            merged["data"]["employees"] = generate_mock_employees()
+        
+        return merged
+    
+    # ==================== Incremental Sync State ====================
+    
+    def _sync_lock(self, provider: str) -> threading.Lock:
+        """
+        The lock serializing a provider's syncs. A plain Lock, not an RLock:
+        a streamed sync may be resumed from a different worker thread.
+        """
+        with self._sync_locks_guard:
+            return self._sync_locks.setdefault(provider, threading.Lock())
+    
+    def _load_sync_state(self, provider: str) -> SyncState:
+        """
+        Get a provider's sync state, reloading the ledger only when another
+        worker (or process) has written a newer revision.
+        """
+        db_service = get_db_service()
+        stored = db_service.read_sync_state(self.company_id, provider)
+        if stored is None:
+            return SyncState()
+        
+        cached = self._sync_states.get(provider)
+        if cached is not None and cached.revision == stored.get("revision"):
+            return cached
+        
+        entries = db_service.read_sync_ledger(self.company_id, provider, stored.get("ledger") or {})
+        state = SyncState(stored, entries)
+        self._sync_states[provider] = state
+        return state
+    
+    def _fetch_invoices(
+        self,
+        provider: str,
+        data_types: List[str],
+        date_from: date,
+        date_to: date,
+        incremental: bool
+    ) -> Tuple[SyncState, Optional[str], InvoiceBatch]:
+        """
+        Fetch a provider's invoices, from its cursor if incremental. Call
+        holding the provider's sync lock.
+        
+        Returns:
+            (sync state, modified_since cursor used, invoices)
+        """
+        state = self._load_sync_state(provider)
+        modified_since = state.invoice_cursor(data_types) if incremental else None
+        invoices = generate_mock_invoice_batch(provider, date_from, date_to, modified_since)
+        return state, modified_since, invoices
+    
+    def _commit_sync(
+        self,
+        provider: str,
+        state: SyncState,
+        data_types: List[str],
+        changes: Dict[str, list],
+        modified_since: Optional[str],
+        high_water_mark: Optional[str]
+    ) -> Dict:
+        """
+        Record a sync's invoice contributions, advance the cursors and persist
+        the state together with the provider's rollups of every year it
+        touched, rebuilt from the ledger.
+        
+        A full sync (no modified_since) replaces every earlier invoice; an
+        incremental one replaces the invoices it re-fetched and adds new ones.
+        Invoices already in another provider's ledger are not recorded (see
+        _drop_duplicates).
+        """
+        with self._commit_lock:
+            return self._commit_sync_locked(provider, state, data_types, changes, modified_since, high_water_mark)
+    
+    def _commit_sync_locked(
+        self,
+        provider: str,
+        state: SyncState,
+        data_types: List[str],
+        changes: Dict[str, list],
+        modified_since: Optional[str],
+        high_water_mark: Optional[str]
+    ) -> Dict:
+        full = modified_since is None
+        changes, duplicates = self._drop_duplicates(provider, state, changes, full)
+        removed, months = state.apply(changes, replace=full)
+        rollups = state.year_cells({int(month[:4]) for month in months})
+        
+        new_mark = max(filter(None, (modified_since, high_water_mark)), default=None)
+        synced_at = datetime.utcnow().isoformat()
+        for data_type in INVOICE_DATA_TYPES:
+            if data_type in data_types and new_mark is not None:
+                state.cursors[data_type] = {"high_water_mark": new_mark, "synced_at": synced_at}
+        state.revision += 1
+        
+        try:
+            written = get_db_service().write_sync_state(
+                self.company_id, provider, state.to_dict(), state.month_entries(months), rollups
+            )
+        except Exception:
+            # The cached state is ahead of the database; reload it next time
+            self._sync_states.pop(provider, None)
+            raise
+        state.layout = written["ledger"]
+        self._sync_states[provider] = state
+        
+        for year, cells in rollups.items():
+            get_rollup_index().replace(self.company_id, year, sync_source(provider), cells)
+        
+        return {
+            "mode": "full" if full else "incremental",
+            "modified_since": modified_since,
+            "high_water_mark": new_mark,
+            "invoices_updated": 0 if full else len(removed),
+            "duplicates_skipped": duplicates,
+            "aggregates": _format_aggregates(state.aggregates),
+        }
+    
+    def _drop_duplicates(
+        self,
+        provider: str,
+        state: SyncState,
+        changes: Dict[str, list],
+        full: bool
+    ) -> Tuple[Dict[str, list], int]:
+        """
+        Drop invoices whose dedupe key another provider's ledger holds, or
+        that repeat within the changes or (incrementally) the provider's own
+        ledger under another id. The first ledger to record an invoice keeps
+        it, so a later sync of any provider cannot count it twice.
+        
+        Call holding the commit lock. Returns the kept changes and the
+        number dropped.
+        """
+        others = [
+            self._load_sync_state(other.value)
+            for other in IntegrationProvider if other.value != provider
+        ]
+        kept: Dict[str, list] = {}
+        keys = set()
+        for invoice_id, contribution in changes.items():
+            key = contribution[_DEDUPE_KEY]
+            owner = None if full else state.keys.get(key)
+            if key in keys or (owner is not None and owner != invoice_id) or any(key in other.keys for other in others):
+                continue
+            keys.add(key)
+            kept[invoice_id] = contribution
+        return kept, len(changes) - len(kept)
+    
+    def get_sync_state(self, provider: str) -> Dict:
+        """
+        Get the stored sync cursors and aggregates for a provider.
+        Blocking: call from a worker thread.
+        """
+        stored = get_db_service().read_sync_state(self.company_id, provider) or {}
+        return {
+            "provider": provider,
+            "cursors": stored.get("cursors") or {},
+            "aggregates": _format_aggregates(stored["aggregates"]) if stored.get("aggregates") else None,
+        }
+    
     def get_expense_categories(self, provider: str) -> List[Dict]:
         """Get expense categories/chart of accounts from provider."""
         # Return standardized ESG-relevant categories
@@ -346,10 +955,12 @@ class IntegrationService:
 
 # Singleton instance getter
 _integration_services: Dict[str, IntegrationService] = {}
+_integration_services_lock = threading.Lock()
 
 def get_integration_service(company_id: str) -> IntegrationService:
-    """Get or create integration service for a company."""
-    if company_id not in _integration_services:
-        _integration_services[company_id] = IntegrationService(company_id)
-    return _integration_services[company_id]
+    """Get or create integration service for a company (safe from worker threads)."""
+    with _integration_services_lock:
+        if company_id not in _integration_services:
+            _integration_services[company_id] = IntegrationService(company_id)
+        return _integration_services[company_id]
 
@@ -0,0 +1,392 @@
+"""
+Columnar Invoice Store
+======================
+
+Compact, column-oriented container for invoices pulled from ERP providers.
+
+A list of invoice dicts costs roughly a kilobyte per row in CPython
+(nested line_items and esg_data dicts, string dates, repeated strings).
+InvoiceBatch keeps each field in a typed array instead:
+
+- amounts, quantities and timestamps in array('d')
+- dates as ordinals in array('i')
+- repeated strings (category, esg_type, currency, activity_type, vendor,
+  units, ...) as integer codes into a small value table
+- line items as child columns addressed by per-invoice offsets
+
+Sync, emission enrichment and aggregation operate on the columns; rows are
+converted back to the provider-style dict only at the JSON boundary.
+"""
+
+from array import array
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import math
+import operator
+
+from .emission_factors import calculate_emissions_batch
+from .fx import BASE_CURRENCY, convert_to_usd_batch, get_fx_table
+
+_EPOCH = datetime(1970, 1, 1)
+_NAN = float("nan")
+
+
+class CategoricalColumn:
+    """Column of repeated values stored as integer codes into a value table."""
+    
+    __slots__ = ("codes", "values", "_index")
+    
+    def __init__(self):
+        self.codes = array("I")
+        self.values: List[Optional[str]] = []
+        self._index: Dict[Optional[str], int] = {}
+    
+    def encode(self, value: Optional[str]) -> int:
+        """Get the code for a value, adding it to the value table if new."""
+        code = self._index.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self._index[value] = code
+        return code
+    
+    def append(self, value: Optional[str]) -> None:
+        self.codes.append(self.encode(value))
+    
+    def __getitem__(self, index: int) -> Optional[str]:
+        return self.values[self.codes[index]]
+    
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+# Column names by storage kind, used for copying rows between batches
+_TEXT_COLUMNS = ("id", "invoice_number")
+_CATEGORICAL_COLUMNS = (
+    "provider", "vendor_name", "category", "esg_type", "currency", "status",
+    "esg_unit", "activity_type",
+)
+_FLOAT_COLUMNS = ("amount", "tax_amount", "total_amount", "esg_quantity", "updated_at")
+_INT_COLUMNS = ("date", "due_date")
+_FLAG_COLUMNS = ("has_esg_data", "estimated")
+_LINE_CATEGORICAL_COLUMNS = ("line_description", "line_unit")
+_LINE_FLOAT_COLUMNS = ("line_quantity", "line_unit_price", "line_amount")
+
+
+class InvoiceBatch:
+    """Column-oriented batch of invoices."""
+    
+    def __init__(self):
+        self.id: List[str] = []
+        self.invoice_number: List[str] = []
+        for name in _CATEGORICAL_COLUMNS + _LINE_CATEGORICAL_COLUMNS:
+            setattr(self, name, CategoricalColumn())
+        for name in _FLOAT_COLUMNS + _LINE_FLOAT_COLUMNS:
+            setattr(self, name, array("d"))
+        for name in _INT_COLUMNS:
+            setattr(self, name, array("i"))
+        for name in _FLAG_COLUMNS:
+            setattr(self, name, array("b"))
+        
+        # Line items of invoice i are rows line_offsets[i]:line_offsets[i + 1]
+        self.line_offsets = array("I", [0])
+        
+        # Filled by calculate_emissions(); activity_quantity is esg_quantity
+        # in the factor's unit (spend converted to USD)
+        self.activity_quantity: Optional[array] = None
+        self.emission_factor: Optional[array] = None
+        self.emissions_kg: Optional[array] = None
+        self._emission_meta: Dict[int, Tuple[str, str]] = {}
+    
+    def __len__(self) -> int:
+        return len(self.id)
+    
+    @classmethod
+    def from_invoices(cls, invoices: Iterable[Dict]) -> "InvoiceBatch":
+        """Build a batch from provider-style invoice dicts."""
+        batch = cls()
+        for invoice in invoices:
+            batch.append(invoice)
+        return batch
+    
+    # ==================== Building ====================
+    
+    def append(self, invoice: Dict) -> None:
+        """Append one provider-style invoice dict."""
+        self.id.append(invoice["id"])
+        self.invoice_number.append(invoice["invoice_number"])
+        self.provider.append(invoice["provider"])
+        self.vendor_name.append(invoice["vendor_name"])
+        self.category.append(invoice["category"])
+        self.esg_type.append(invoice["esg_type"])
+        self.currency.append(invoice["currency"])
+        self.status.append(invoice["status"])
+        self.date.append(date.fromisoformat(invoice["date"]).toordinal())
+        self.due_date.append(date.fromisoformat(invoice["due_date"]).toordinal())
+        self.amount.append(invoice["amount"])
+        self.tax_amount.append(invoice["tax_amount"])
+        self.total_amount.append(invoice["total_amount"])
+        self.updated_at.append(_timestamp(invoice.get("updated_at")))
+        
+        esg_data = invoice.get("esg_data")
+        self.has_esg_data.append(1 if esg_data else 0)
+        esg_data = esg_data or {}
+        self.esg_quantity.append(esg_data.get("quantity", _NAN))
+        self.esg_unit.append(esg_data.get("unit"))
+        self.activity_type.append(esg_data.get("activity_type"))
+        self.estimated.append(1 if esg_data.get("estimated") else 0)
+        
+        for item in invoice.get("line_items", []):
+            self.line_description.append(item["description"])
+            self.line_quantity.append(item["quantity"])
+            self.line_unit.append(item["unit"])
+            self.line_unit_price.append(item["unit_price"])
+            self.line_amount.append(item["amount"])
+        self.line_offsets.append(len(self.line_amount))
+        
+        self.activity_quantity = self.emission_factor = self.emissions_kg = None
+    
+    def extend(self, other: "InvoiceBatch", indices: Optional[Sequence[int]] = None) -> None:
+        """Append rows of another batch (all rows, or the given indices)."""
+        if indices is None:
+            indices = range(len(other))
+        
+        for i in indices:
+            for name in _TEXT_COLUMNS + _FLOAT_COLUMNS + _INT_COLUMNS + _FLAG_COLUMNS:
+                getattr(self, name).append(getattr(other, name)[i])
+            for name in _CATEGORICAL_COLUMNS:
+                getattr(self, name).append(getattr(other, name)[i])
+            
+            for j in range(other.line_offsets[i], other.line_offsets[i + 1]):
+                for name in _LINE_FLOAT_COLUMNS:
+                    getattr(self, name).append(getattr(other, name)[j])
+                for name in _LINE_CATEGORICAL_COLUMNS:
+                    getattr(self, name).append(getattr(other, name)[j])
+            self.line_offsets.append(len(self.line_amount))
+        
+        self.activity_quantity = self.emission_factor = self.emissions_kg = None
+    
+    # ==================== Enrichment & Aggregation ====================
+    
+    def calculate_emissions(self) -> Dict:
+        """
+        Calculate emissions for every invoice carrying ESG activity data.
+        
+        Factors are resolved through the batch emissions engine once per
+        distinct activity type and applied to the quantity column in one
+        pass. Results are stored in the emission_factor and emissions_kg
+        columns (NaN where no emissions could be calculated). Spend-based
+        rows are converted to USD at the exchange rate of their invoice date.
+        
+        Returns:
+            Dict with total emissions in kgCO2e and tonnes plus per-scope totals
+        """
+        activities = self.activity_type.values
+        eligible = [code for code, activity in enumerate(activities) if activity]
+        resolved = calculate_emissions_batch(
+            activity_types=[activities[code] for code in eligible],
+            quantities=[1.0] * len(eligible),
+        )["results"]
+        
+        factor_by_code = [_NAN] * len(activities)
+        self._emission_meta = {}
+        spend_codes = set()
+        for position, code in enumerate(eligible):
+            if resolved["emission_factor"][position] is not None:
+                factor_by_code[code] = resolved["emission_factor"][position]
+                self._emission_meta[code] = (resolved["unit"][position], resolved["scope"][position])
+                if resolved["unit"][position] == BASE_CURRENCY:
+                    spend_codes.add(code)
+        
+        # Spend-based factors are per USD: convert those rows' quantities
+        # (amounts in the invoice currency) at the rate of the invoice date
+        self.activity_quantity = array("d", self.esg_quantity)
+        unknown_currencies = []
+        if spend_codes:
+            rows = [i for i, code in enumerate(self.activity_type.codes) if code in spend_codes]
+            currencies = self.currency.values
+            # The rate lookup upper-cases codes, so "eur" converts like "EUR"
+            unknown_currencies = sorted(
+                {currencies[self.currency.codes[i]].upper() for i in rows} - get_fx_table().currencies
+            )
+            converted = convert_to_usd_batch(
+                [self.esg_quantity[i] for i in rows],
+                [currencies[self.currency.codes[i]] for i in rows],
+                [self.date[i] for i in rows],
+                strict=False,
+            )
+            for i, usd in zip(rows, converted):
+                self.activity_quantity[i] = usd
+        
+        self.emission_factor = array("d", map(factor_by_code.__getitem__, self.activity_type.codes))
+        self.emissions_kg = array("d", map(operator.mul, self.activity_quantity, self.emission_factor))
+        
+        by_scope: Dict[str, Dict] = {}
+        for code, kg in zip(self.activity_type.codes, self.emissions_kg):
+            if kg != kg:  # NaN: not calculated
+                continue
+            totals = by_scope.setdefault(self._emission_meta[code][1], {"count": 0, "emissions_kg_co2e": 0.0})
+            totals["count"] += 1
+            totals["emissions_kg_co2e"] += kg
+        
+        total_kg = 0.0
+        for totals in by_scope.values():
+            total_kg += totals["emissions_kg_co2e"]
+            totals["emissions_tonnes_co2e"] = round(totals["emissions_kg_co2e"] / 1000, 4)
+            totals["emissions_kg_co2e"] = round(totals["emissions_kg_co2e"], 2)
+        
+        summary = {
+            "total_emissions_kg": round(total_kg, 2),
+            "total_emissions_tonnes": round(total_kg / 1000, 4),
+            "emissions_by_scope": by_scope,
+        }
+        if unknown_currencies:
+            # Spend rows in these currencies could not be converted and
+            # are left without emissions
+            summary["unknown_currencies"] = unknown_currencies
+        return summary
+    
+    def scopes(self) -> List[Optional[str]]:
+        """GHG scope per row (None where no emissions were calculated)."""
+        if self.emissions_kg is None:
+            self.calculate_emissions()
+        
+        scope_by_code = [
+            self._emission_meta[code][1] if code in self._emission_meta else None
+            for code in range(len(self.activity_type.values))
+        ]
+        return [scope_by_code[code] for code in self.activity_type.codes]
+    
+    def esg_summary(self, esg_totals: Optional[Dict] = None) -> Dict:
+        """Accumulate invoice counts and amounts per ESG type into esg_totals."""
+        if esg_totals is None:
+            esg_totals = {}
+        
+        counts = [0] * len(self.esg_type.values)
+        amounts = [0.0] * len(self.esg_type.values)
+        for code, amount in zip(self.esg_type.codes, self.amount):
+            counts[code] += 1
+            amounts[code] += amount
+        
+        for code, esg_type in enumerate(self.esg_type.values):
+            if not counts[code]:
+                continue
+            totals = esg_totals.setdefault(esg_type, {"count": 0, "total_amount": 0})
+            totals["count"] += counts[code]
+            totals["total_amount"] += amounts[code]
+        return esg_totals
+    
+    def max_updated_at(self) -> Optional[str]:
+        """Latest updated_at timestamp in the batch (ISO format), if any."""
+        timestamps = [value for value in self.updated_at if value == value]
+        return _isoformat(max(timestamps)) if timestamps else None
+    
+    def dedupe_key(self, index: int) -> Tuple:
+        """Identify the same supplier invoice booked in more than one provider."""
+        return (
+            self.vendor_name[index],
+            self.invoice_number[index],
+            self.date[index],
+            self.total_amount[index],
+        )
+    
+    # ==================== JSON Boundary ====================
+    
+    def row(self, index: int) -> Dict:
+        """Materialize one invoice as a provider-style dict."""
+        invoice = {
+            "id": self.id[index],
+            "provider": self.provider[index],
+            "invoice_number": self.invoice_number[index],
+            "date": date.fromordinal(self.date[index]).isoformat(),
+            "due_date": date.fromordinal(self.due_date[index]).isoformat(),
+            "vendor_name": self.vendor_name[index],
+            "category": self.category[index],
+            "esg_type": self.esg_type[index],
+            "amount": self.amount[index],
+            "currency": self.currency[index],
+            "tax_amount": self.tax_amount[index],
+            "total_amount": self.total_amount[index],
+            "status": self.status[index],
+            "updated_at": _isoformat(self.updated_at[index]),
+            "line_items": [
+                {
+                    "description": self.line_description[j],
+                    "quantity": self.line_quantity[j],
+                    "unit": self.line_unit[j],
+                    "unit_price": self.line_unit_price[j],
+                    "amount": self.line_amount[j],
+                }
+                for j in range(self.line_offsets[index], self.line_offsets[index + 1])
+            ],
+            "esg_data": None,
+        }
+        
+        if self.has_esg_data[index]:
+            invoice["esg_data"] = {
+                "quantity": self.esg_quantity[index],
+                "unit": self.esg_unit[index],
+                "activity_type": self.activity_type[index],
+                "estimated": bool(self.estimated[index]),
+            }
+        
+        if self.emissions_kg is not None and self.activity_type[index]:
+            invoice["calculated_emissions"] = self._emission_row(index)
+        
+        return invoice
+    
+    def iter_dicts(self) -> Iterator[Dict]:
+        for index in range(len(self)):
+            yield self.row(index)
+    
+    def to_dicts(self) -> List[Dict]:
+        return list(self.iter_dicts())
+    
+    def _emission_row(self, index: int) -> Optional[Dict]:
+        """Emission result for a row in the calculate_emissions shape."""
+        kg = self.emissions_kg[index]
+        if kg != kg:
+            return None
+        
+        unit, scope = self._emission_meta[self.activity_type.codes[index]]
+        return {
+            "activity_type": self.activity_type[index],
+            "quantity": self.activity_quantity[index],
+            "unit": unit,
+            "emission_factor": self.emission_factor[index],
+            "emission_factor_unit": f"kgCO2e/{unit}",
+            "scope": scope,
+            "emissions_kg_co2e": round(kg, 2),
+            "emissions_tonnes_co2e": round(kg / 1000, 4),
+            "country": "default",
+            "variant": None,
+            "sub_category": None,
+        }
+
+
+def iter_invoice_batches(invoices: Iterable[Dict], size: int) -> Iterator[InvoiceBatch]:
+    """Consume invoice dicts lazily into batches of at most size rows."""
+    batch = InvoiceBatch()
+    for invoice in invoices:
+        batch.append(invoice)
+        if len(batch) >= size:
+            yield batch
+            batch = InvoiceBatch()
+    if len(batch):
+        yield batch
+
+
+def _timestamp(value: Optional[str]) -> float:
+    """ISO timestamp -> seconds since epoch (naive UTC); NaN if missing."""
+    if not value:
+        return _NAN
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return (parsed - _EPOCH).total_seconds()
+
+
+def _isoformat(seconds: float) -> Optional[str]:
+    if math.isnan(seconds):
+        return None
+    return (_EPOCH + timedelta(seconds=seconds)).isoformat()
@@ -0,0 +1,204 @@
+"""
+Background Sync Jobs
+====================
+
+Runs long ERP syncs outside the request/response cycle so large date
+ranges do not hit proxy timeouts (Render/Railway cut requests at ~30-100s).
+
+A submitted job returns an id immediately; the sync plus emission
+enrichment runs on an asyncio task that offloads the blocking work to a
+thread. Concurrency is bounded globally (SYNC_JOB_WORKERS) and per tenant
+(SYNC_JOBS_PER_TENANT) so one customer cannot starve the others.
+"""
+
+from datetime import date, datetime
+from enum import Enum
+from typing import Dict, List, Optional
+import asyncio
+import os
+import uuid
+
+from .integrations import get_integration_service
+
+# Maximum number of sync jobs executing at once in this process
+SYNC_JOB_WORKERS = int(os.getenv("SYNC_JOB_WORKERS", "4"))
+
+# Maximum number of sync jobs executing at once for a single company
+SYNC_JOBS_PER_TENANT = int(os.getenv("SYNC_JOBS_PER_TENANT", "2"))
+
+# Number of finished jobs kept for status queries
+SYNC_JOBS_RETAINED = int(os.getenv("SYNC_JOBS_RETAINED", "500"))
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class SyncJobManager:
+    """Queue and execute ERP sync jobs with bounded per-tenant concurrency."""
+    
+    def __init__(
+        self,
+        max_workers: int = SYNC_JOB_WORKERS,
+        max_per_tenant: int = SYNC_JOBS_PER_TENANT,
+        max_retained: int = SYNC_JOBS_RETAINED
+    ):
+        self.max_workers = max_workers
+        self.max_per_tenant = max_per_tenant
+        self.max_retained = max_retained
+        self._jobs: Dict[str, Dict] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._workers: Optional[asyncio.Semaphore] = None
+        self._tenant_slots: Dict[str, asyncio.Semaphore] = {}
+    
+    def submit(
+        self,
+        company_id: str,
+        provider: str,
+        data_types: List[str],
+        date_from: date,
+        date_to: date,
+        incremental: bool = False
+    ) -> Dict:
+        """
+        Queue a sync job and return its initial state.
+        
+        Must be called from the event loop. Raises ValueError if the
+        provider is not connected, so bad requests fail before queueing.
+        """
+        service = get_integration_service(company_id)
+        service.require_connection(provider)
+        
+        if self._workers is None:
+            self._workers = asyncio.Semaphore(self.max_workers)
+        
+        self._prune_finished()
+        
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "company_id": company_id,
+            "provider": provider,
+            "data_types": list(data_types),
+            "date_range": {"from": date_from.isoformat(), "to": date_to.isoformat()},
+            "incremental": incremental,
+            "status": JobStatus.QUEUED.value,
+            "created_at": datetime.utcnow().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": {
+                "invoices_processed": 0,
+                "emissions_kg_so_far": 0.0,
+                "processed_through": None,
+                "percent": 0.0,
+            },
+            "result": None,
+            "error": None,
+        }
+        self._jobs[job["job_id"]] = job
+        self._tasks[job["job_id"]] = asyncio.create_task(
+            self._run(job, data_types, date_from, date_to, incremental)
+        )
+        return self._snapshot(job)
+    
+    def get_job(self, job_id: str, company_id: Optional[str] = None) -> Optional[Dict]:
+        """Get a job's current state, optionally restricted to a company."""
+        job = self._jobs.get(job_id)
+        if job is None or (company_id is not None and job["company_id"] != company_id):
+            return None
+        return self._snapshot(job)
+    
+    def list_jobs(self, company_id: str) -> List[Dict]:
+        """List a company's jobs, newest first, without their results."""
+        jobs = [job for job in self._jobs.values() if job["company_id"] == company_id]
+        jobs.sort(key=lambda job: job["created_at"], reverse=True)
+        return [self._snapshot(job, include_result=False) for job in jobs]
+    
+    async def _run(self, job: Dict, data_types: List[str], date_from: date, date_to: date, incremental: bool) -> None:
+        tenant_slots = self._tenant_slots.setdefault(
+            job["company_id"], asyncio.Semaphore(self.max_per_tenant)
+        )
+        
+        # Take the tenant slot first so a tenant's backlog waits on its own
+        # semaphore instead of occupying the shared worker queue
+        async with tenant_slots:
+            async with self._workers:
+                job["status"] = JobStatus.RUNNING.value
+                job["started_at"] = datetime.utcnow().isoformat()
+                try:
+                    job["result"] = await asyncio.to_thread(
+                        self._execute, job, data_types, date_from, date_to, incremental
+                    )
+                    job["status"] = JobStatus.COMPLETED.value
+                except Exception as e:
+                    job["error"] = str(e)
+                    job["status"] = JobStatus.FAILED.value
+                finally:
+                    job["finished_at"] = datetime.utcnow().isoformat()
+                    self._tasks.pop(job["job_id"], None)
+    
+    def _execute(self, job: Dict, data_types: List[str], date_from: date, date_to: date, incremental: bool) -> Dict:
+        """Run the sync pipeline in a worker thread, updating progress as it goes."""
+        service = get_integration_service(job["company_id"])
+        records = service.stream_sync_data(
+            provider=job["provider"],
+            data_types=data_types,
+            date_from=date_from,
+            date_to=date_to,
+            incremental=incremental
+        )
+        
+        progress = job["progress"]
+        span_days = max((date_to - date_from).days, 1)
+        summary: Dict = {}
+        for record in records:
+            if record["type"] != "invoice":
+                summary = record["data"]
+                continue
+            
+            invoice = record["data"]
+            progress["invoices_processed"] += 1
+            if invoice.get("calculated_emissions"):
+                progress["emissions_kg_so_far"] = round(
+                    progress["emissions_kg_so_far"] + invoice["calculated_emissions"]["emissions_kg_co2e"], 2
+                )
+            if progress["processed_through"] is None or invoice["date"] > progress["processed_through"]:
+                progress["processed_through"] = invoice["date"]
+                elapsed = (date.fromisoformat(invoice["date"]) - date_from).days
+                progress["percent"] = round(min(elapsed / span_days, 1.0) * 100, 1)
+        
+        progress["percent"] = 100.0
+        return summary
+    
+    def _prune_finished(self) -> None:
+        """Drop the oldest finished jobs beyond the retention limit."""
+        finished = [
+            job for job in self._jobs.values()
+            if job["status"] in (JobStatus.COMPLETED.value, JobStatus.FAILED.value)
+        ]
+        excess = len(finished) - self.max_retained
+        if excess <= 0:
+            return
+        finished.sort(key=lambda job: job["finished_at"])
+        for job in finished[:excess]:
+            del self._jobs[job["job_id"]]
+    
+    def _snapshot(self, job: Dict, include_result: bool = True) -> Dict:
+        snapshot = {key: value for key, value in job.items() if key != "result"}
+        snapshot["progress"] = dict(job["progress"])
+        if include_result:
+            snapshot["result"] = job["result"]
+        return snapshot
+
+
+# Singleton instance
+_job_manager: Optional[SyncJobManager] = None
+
+def get_job_manager() -> SyncJobManager:
+    """Get the sync job manager singleton."""
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = SyncJobManager()
+    return _job_manager
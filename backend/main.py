@@ -9,11 +9,18 @@ Includes:
 - Automated Carbon Accounting
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from functools import lru_cache
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
 from datetime import date, datetime
 from pydantic import BaseModel
+import asyncio
+import functools
+import json
 
 from .models import (
     ESGReport, EnergyConsumption, GHGEmissions, WaterUsage,
@@ -26,14 +33,24 @@ from .emission_factors import (
     calculate_electricity_emissions,
     calculate_travel_emissions,
     calculate_spend_based_emissions,
-    EMISSION_FACTORS,
-    get_emission_factor
+    calculate_emissions_batch,
+    get_emission_factor,
+    get_factor_dataset,
+    get_factor_registry
 )
 from .integrations import (
     get_integration_service,
     IntegrationProvider,
     PROVIDER_CONFIG
 )
+from .http_cache import IMMUTABLE, PRIVATE_REVALIDATE, PUBLIC_SHORT, cached_response, json_body
+from .jobs import get_job_manager
+from .http_client import get_http_client
+from .extraction import ExtractionBusyError, attach_source, get_extraction_pool
+from .extraction_cache import get_extraction_cache
+from .uploads import UPLOAD_MAX_FILES, SpooledUpload, UploadTooLargeError, discard_uploads, receive_uploads
+from .csv_export import iter_report_csv
+from .xbrl import get_xbrl_template, stream_xbrl_instance
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -77,31 +94,51 @@ class EmissionCalculationRequest(BaseModel):
     country: str = "default"
     variant: Optional[str] = None
     sub_category: Optional[str] = None
+    factor_version: Optional[str] = None
+
+class BatchEmissionCalculationRequest(BaseModel):
+    activity_types: List[str]
+    quantities: List[float]
+    countries: Optional[List[str]] = None
+    variants: Optional[List[Optional[str]]] = None
+    sub_categories: Optional[List[Optional[str]]] = None
+    factor_version: Optional[str] = None
 
 class ElectricityCalculationRequest(BaseModel):
     kwh: float
     country: str = "UK"
     renewable_percentage: float = 0
+    factor_version: Optional[str] = None
 
 class TravelCalculationRequest(BaseModel):
     distance_km: float
     travel_type: str
     travel_class: Optional[str] = None
+    factor_version: Optional[str] = None
 
 class SpendCalculationRequest(BaseModel):
     spend_amount: float
     category: str
     sub_category: str = "default"
     currency: str = "EUR"
+    spend_date: Optional[date] = None  # Exchange rate date (latest rate if omitted)
+    factor_version: Optional[str] = None
 
 class IntegrationConnectRequest(BaseModel):
     provider: str
-    
+
 class IntegrationSyncRequest(BaseModel):
     provider: str
     data_types: List[str] = ["invoices", "expenses"]
     date_from: date
     date_to: date
+    incremental: bool = False
+
+class IntegrationSyncAllRequest(BaseModel):
+    data_types: List[str] = ["invoices", "expenses"]
+    date_from: date
+    date_to: date
+    incremental: bool = False
 
 
 # ==================== Health & Status ====================
@@ -132,7 +169,9 @@ async def health_check():
         "services": {
             "emission_engine": "operational",
             "integration_service": "operational"
-        }
+        },
+        "report_cache": get_db_service().report_cache.stats(),
+        "extraction_cache": get_extraction_cache().stats()
     }
 
 
@@ -158,13 +197,39 @@ async def calculate_carbon_emissions(request: EmissionCalculationRequest):
             quantity=request.quantity,
             country=request.country,
             variant=request.variant,
-            sub_category=request.sub_category
+            sub_category=request.sub_category,
+            version=request.factor_version
         )
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/calculate/batch", tags=["Carbon Calculator"])
+async def calculate_carbon_emissions_batch(request: BatchEmissionCalculationRequest):
+    """
+    Calculate CO2e emissions for many activities in a single call.
+    
+    Inputs are columns of equal length (activity_types, quantities and
+    optionally countries, variants, sub_categories). Emission factors are
+    resolved once per distinct activity/country/variant/sub-category.
+    
+    Returns per-row result columns, per-scope aggregates and totals.
+    Rows that cannot be calculated are listed under "errors".
+    """
+    try:
+        return calculate_emissions_batch(
+            activity_types=request.activity_types,
+            quantities=request.quantities,
+            countries=request.countries,
+            variants=request.variants,
+            sub_categories=request.sub_categories,
+            version=request.factor_version
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/calculate/electricity", tags=["Carbon Calculator"])
 async def calculate_electricity_carbon(request: ElectricityCalculationRequest):
     """
@@ -173,12 +238,16 @@ async def calculate_electricity_carbon(request: ElectricityCalculationRequest):
     Supports location-based factors for different countries and
     accounts for renewable energy percentage.
     """
-    result = calculate_electricity_emissions(
-        kwh=request.kwh,
-        country=request.country,
-        renewable_percentage=request.renewable_percentage
-    )
-    return result
+    try:
+        result = calculate_electricity_emissions(
+            kwh=request.kwh,
+            country=request.country,
+            renewable_percentage=request.renewable_percentage,
+            version=request.factor_version
+        )
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/calculate/travel", tags=["Carbon Calculator"])
@@ -193,7 +262,8 @@ async def calculate_travel_carbon(request: TravelCalculationRequest):
         result = calculate_travel_emissions(
             distance_km=request.distance_km,
             travel_type=request.travel_type,
-            travel_class=request.travel_class
+            travel_class=request.travel_class,
+            version=request.factor_version
         )
         return result
     except ValueError as e:
@@ -213,61 +283,117 @@ async def calculate_spend_carbon(request: SpendCalculationRequest):
             spend_amount=request.spend_amount,
             category=request.category,
             sub_category=request.sub_category,
-            currency=request.currency
+            currency=request.currency,
+            version=request.factor_version,
+            spend_date=request.spend_date
         )
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@lru_cache(maxsize=64)
+def _factor_catalog_body(version: str) -> Tuple[bytes, str]:
+    dataset = get_factor_dataset(version)
+    return json_body({
+        "emission_factors": dataset.catalog,
+        "source": dataset.source,
+        "dataset": dataset.version,
+        "version": dataset.catalog_version,
+        "catalog_url": f"/emission-factors/catalog/{dataset.catalog_version}",
+    })
+
+
+@lru_cache(maxsize=1024)
+def _factor_detail_body(activity_type: str, country: str, version: str) -> Tuple[bytes, str]:
+    dataset = get_factor_dataset(version)
+    factor = get_emission_factor(activity_type, country, version=version)
+    return json_body({
+        "activity_type": activity_type,
+        "country": country,
+        "factor_kgCO2e_per_unit": factor,
+        "unit": dataset.metadata[activity_type][0],
+        "dataset": dataset.version,
+        "version": dataset.catalog_version,
+    })
+
+
 @app.get("/emission-factors", tags=["Carbon Calculator"])
-async def list_emission_factors():
+async def list_emission_factors(
+    request: Request,
+    version: Optional[str] = Query(default=None, description="Factor dataset version (e.g., defra-2024)")
+):
     """
     Get list of all available emission factors.
     
-    Returns factor values, units, and applicable scopes.
+    Returns factor values, units, and applicable scopes. The response
+    carries the catalog version; the same content is served as an
+    immutable resource at catalog_url.
     """
-    factors = []
-    for activity_type, data in EMISSION_FACTORS.items():
-        factor_info = {
-            "activity_type": activity_type,
-            "unit": data.get("unit", "unknown"),
-            "scope": data.get("scope", "").value if hasattr(data.get("scope", ""), "value") else str(data.get("scope", "")),
-        }
-        
-        if "factor" in data:
-            factor_info["factor_kgCO2e"] = data["factor"]
-        elif "factors" in data and isinstance(data["factors"], dict):
-            factor_info["factors_by_region"] = data["factors"]
-        
-        if "variants" in data:
-            factor_info["variants"] = data["variants"]
-            
-        factors.append(factor_info)
+    try:
+        body, etag = _factor_catalog_body(get_factor_dataset(version).version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return cached_response(request, body, etag, PUBLIC_SHORT)
+
+
+@app.get("/emission-factors/versions", tags=["Carbon Calculator"])
+async def list_emission_factor_versions():
+    """List the available emission factor datasets and the default one."""
+    return {"versions": get_factor_registry().versions()}
+
+
+@app.get("/emission-factors/catalog/{version}", tags=["Carbon Calculator"])
+async def get_emission_factor_catalog(version: str, request: Request):
+    """Get a specific version of the emission factor catalog (cacheable forever)."""
+    dataset_version = version.rpartition(".")[0]
+    try:
+        dataset = get_factor_dataset(dataset_version)
+    except ValueError:
+        dataset = None
+    if dataset is None or dataset.catalog_version != version:
+        raise HTTPException(status_code=404, detail=f"Unknown factor catalog version: {version}")
     
-    return {"emission_factors": factors, "source": "DEFRA 2024, EPA, EEIO"}
+    body, etag = _factor_catalog_body(dataset.version)
+    return cached_response(request, body, etag, IMMUTABLE)
 
 
 @app.get("/emission-factors/{activity_type}", tags=["Carbon Calculator"])
 async def get_emission_factor_detail(
     activity_type: str,
-    country: str = Query(default="default", description="Country code (e.g., UK, DE, FR)")
+    request: Request,
+    country: str = Query(default="default", description="Country code (e.g., UK, DE, FR)"),
+    version: Optional[str] = Query(default=None, description="Factor dataset version (e.g., defra-2024)")
 ):
     """Get emission factor for a specific activity type."""
     try:
-        factor = get_emission_factor(activity_type, country)
-        return {
-            "activity_type": activity_type,
-            "country": country,
-            "factor_kgCO2e_per_unit": factor,
-            "unit": EMISSION_FACTORS[activity_type].get("unit", "unknown")
-        }
+        body, etag = _factor_detail_body(activity_type, country, get_factor_dataset(version).version)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    return cached_response(request, body, etag, PUBLIC_SHORT)
 
 
 # ==================== ERP Integrations ====================
 
+def _invoices_to_json(result: dict) -> dict:
+    """Convert the columnar invoice batch of a sync result to JSON-ready dicts."""
+    invoices = result["data"].get("invoices")
+    if invoices is not None:
+        result["data"]["invoices"] = invoices.to_dicts()
+    return result
+
+
+def _sync_response(sync, **kwargs) -> Response:
+    """
+    Run a blocking sync and serialize its result.
+    
+    Call through run_in_threadpool: the sync, the invoice conversion and
+    the JSON encoding all stay off the event loop.
+    """
+    body = json.dumps(_invoices_to_json(sync(**kwargs)), default=str).encode()
+    return Response(content=body, media_type="application/json")
+
+
 @app.get("/integrations", tags=["Integrations"])
 async def list_integrations(company_id: str = "demo_company"):
     """
@@ -323,48 +449,124 @@ async def get_integration_status(provider: str, company_id: str = "demo_company"
 @app.post("/integrations/sync", tags=["Integrations"])
 async def sync_integration_data(
     request: IntegrationSyncRequest,
-    company_id: str = "demo_company"
+    company_id: str = "demo_company",
+    stream: bool = Query(default=False, description="Stream invoices as NDJSON")
 ):
     """
     Sync data from connected ERP provider.
     
     Pulls invoices, expenses, and employee data,
     then extracts ESG-relevant information.
+    
+    With stream=true the response is newline-delimited JSON: one
+    {"type": "invoice"} record per invoice (with calculated emissions)
+    followed by a trailing {"type": "summary"} record carrying the
+    esg_summary and total emissions.
+    
+    With incremental=true only invoices changed since the last sync of
+    this provider are fetched; each replaces its earlier contribution to
+    the stored aggregates.
     """
     try:
         service = get_integration_service(company_id)
-        result = service.sync_data(
+        if stream:
+            records = service.stream_sync_data(
+                provider=request.provider,
+                data_types=request.data_types,
+                date_from=request.date_from,
+                date_to=request.date_to,
+                incremental=request.incremental
+            )
+            return StreamingResponse(
+                (json.dumps(record) + "\n" for record in records),
+                media_type="application/x-ndjson"
+            )
+        
+        return await run_in_threadpool(
+            _sync_response,
+            service.sync_data,
             provider=request.provider,
             data_types=request.data_types,
             date_from=request.date_from,
-            date_to=request.date_to
+            date_to=request.date_to,
+            incremental=request.incremental
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/integrations/sync/all", tags=["Integrations"])
+async def sync_all_integrations(
+    request: IntegrationSyncAllRequest,
+    company_id: str = "demo_company"
+):
+    """
+    Sync every connected ERP provider.
+    
+    Returns a single deduplicated invoice list with a combined esg_summary
+    and emission totals, plus per-provider status and timing.
+    """
+    try:
+        service = get_integration_service(company_id)
+        return await run_in_threadpool(
+            _sync_response,
+            service.sync_all,
+            data_types=request.data_types,
+            date_from=request.date_from,
+            date_to=request.date_to,
+            incremental=request.incremental
         )
-        
-        # Calculate emissions for synced invoices if present
-        if "invoices" in result.get("data", {}):
-            invoices = result["data"]["invoices"]
-            total_emissions = 0
-            for invoice in invoices:
-                esg_data = invoice.get("esg_data", {})
-                if esg_data and esg_data.get("activity_type"):
-                    try:
-                        emission_result = calculate_emissions(
-                            activity_type=esg_data["activity_type"],
-                            quantity=esg_data["quantity"]
-                        )
-                        invoice["calculated_emissions"] = emission_result
-                        total_emissions += emission_result["emissions_kg_co2e"]
-                    except:
-                        invoice["calculated_emissions"] = None
-            
-            result["data"]["total_emissions_kg"] = round(total_emissions, 2)
-            result["data"]["total_emissions_tonnes"] = round(total_emissions / 1000, 4)
-        
-        return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/integrations/sync/jobs", status_code=202, tags=["Integrations"])
+async def submit_sync_job(
+    request: IntegrationSyncRequest,
+    company_id: str = "demo_company"
+):
+    """
+    Start an ERP sync in the background.
+    
+    Returns a job id immediately; poll GET /integrations/sync/jobs/{job_id}
+    for progress, partial counts and the final result. Jobs run with
+    bounded concurrency per company.
+    """
+    try:
+        return get_job_manager().submit(
+            company_id=company_id,
+            provider=request.provider,
+            data_types=request.data_types,
+            date_from=request.date_from,
+            date_to=request.date_to,
+            incremental=request.incremental
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/integrations/sync/jobs", tags=["Integrations"])
+async def list_sync_jobs(company_id: str = "demo_company"):
+    """List background sync jobs for a company, newest first."""
+    return {"company_id": company_id, "jobs": get_job_manager().list_jobs(company_id)}
+
+
+@app.get("/integrations/sync/jobs/{job_id}", tags=["Integrations"])
+async def get_sync_job(job_id: str, company_id: str = "demo_company"):
+    """Get status, progress and (once completed) the result of a sync job."""
+    job = get_job_manager().get_job(job_id, company_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Sync job {job_id} not found")
+    return job
+
+
+@app.get("/integrations/{provider}/sync-state", tags=["Integrations"])
+async def get_integration_sync_state(provider: str, company_id: str = "demo_company"):
+    """Get incremental sync cursors and stored aggregates for a provider."""
+    service = get_integration_service(company_id)
+    return await run_in_threadpool(service.get_sync_state, provider)
+
+
 @app.get("/integrations/{provider}/categories", tags=["Integrations"])
 async def get_expense_categories(provider: str, company_id: str = "demo_company"):
     """Get expense categories with ESG mappings for a provider."""
@@ -376,7 +578,7 @@ async def get_expense_categories(provider: str, company_id: str = "demo_company"
 # ==================== ESG Reports ====================
 
 @app.get("/report/{year}", response_model=ESGReport, tags=["Reports"])
-async def get_report(year: int):
+async def get_report(year: int, request: Request):
     """
     Fetch the ESG report for a specific fiscal year.
     
@@ -386,21 +588,77 @@ async def get_report(year: int):
     - B3: Water Usage
     - B6: Employee Metrics
     - BP1: Scope 3 Analysis
+    
+    Supports conditional requests: send the ETag back in If-None-Match to
+    get a bodiless 304 when the report has not changed.
     """
     if year < 2020 or year > 2030:
         raise HTTPException(status_code=400, detail="Year must be between 2020 and 2030")
     
+    # Pre-serialized bytes: no response_model re-validation or re-encoding
     db_service = get_db_service()
-    report = await db_service.get_report(year)
-    return report
+    body, etag = await db_service.get_report_json(year)
+    return cached_response(request, body, etag, PRIVATE_REVALIDATE)
+
+
+@app.get("/report/{year}/totals", tags=["Reports"])
+async def get_report_totals(
+    year: int,
+    company_id: str = "default",
+    month_from: int = Query(default=1, ge=1, le=12),
+    month_to: int = Query(default=12, ge=1, le=12),
+    esg_types: Optional[List[str]] = Query(default=None)
+):
+    """
+    Get dashboard totals and the monthly time series for a year.
+    
+    Served from the pre-aggregated monthly rollup index (by scope and ESG
+    type), which is updated on every report write and ERP sync, so the cost
+    does not grow with the number of underlying records. Spend is reported
+    per currency (spend_by_currency).
+    """
+    if year < 2020 or year > 2030:
+        raise HTTPException(status_code=400, detail="Year must be between 2020 and 2030")
+    
+    try:
+        db_service = get_db_service()
+        return await db_service.get_report_totals(year, company_id, month_from, month_to, esg_types)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/report/{year}/{module}", tags=["Reports"])
+async def get_report_module(year: int, module: str, company_id: str = "default"):
+    """
+    Fetch a single module of the ESG report, reading only that module's data.
+    
+    Modules: energy (B1), emissions (B2), water (B3), workforce (B6), scope3 (BP1).
+    """
+    if year < 2020 or year > 2030:
+        raise HTTPException(status_code=400, detail="Year must be between 2020 and 2030")
+    
+    db_service = get_db_service()
+    try:
+        data = await db_service.get_report_module(year, module, company_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"year": year, "module": module, "data": data}
 
 
 @app.get("/reports", response_model=List[int], tags=["Reports"])
-async def list_available_reports():
+async def list_available_reports(request: Request):
     """List all available report years."""
     db_service = get_db_service()
     years = await db_service.list_reports()
-    return years
+    body, etag = json_body(years)
+    return cached_response(request, body, etag, PRIVATE_REVALIDATE)
+
+
+@app.get("/reports/index", tags=["Reports"])
+async def get_report_index(company_id: str = "default"):
+    """List report years with last update, size and per-module completeness."""
+    db_service = get_db_service()
+    return await db_service.get_report_index(company_id)
 
 
 @app.post("/report/{year}", response_model=ESGReport, tags=["Reports"])
@@ -453,65 +711,173 @@ async def update_emissions_data(year: int, emissions_data: List[GHGEmissions]):
 
 # ==================== File Upload (Future: AI Processing) ====================
 
-@app.post("/upload/invoice", tags=["Data Ingestion"])
-async def upload_invoice(file: UploadFile = File(...)):
+def _upload_request_body(field: str, multiple: bool) -> dict:
+    """OpenAPI request body for endpoints that parse multipart uploads themselves."""
+    file_schema = {"type": "string", "format": "binary"}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            field: {"type": "array", "items": file_schema} if multiple else file_schema
+                        },
+                        "required": [field],
+                    }
+                }
+            },
+        }
+    }
+
+
+async def _receive_uploads(request: Request, max_files: int) -> List[SpooledUpload]:
+    try:
+        return await receive_uploads(request, max_files=max_files)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _extract_uploads(uploads: List[SpooledUpload]) -> List[Tuple[dict, bool]]:
     """
-    Upload an invoice for AI-powered data extraction.
-    
-    Supported formats: PDF, PNG, JPG
+    Extract every upload, as (result, cache_hit) pairs.
     
-    This endpoint will:
-    1. Extract data using OCR (AWS Textract)
-    2. Parse values using LLM semantic analysis
-    3. Map to appropriate ESG categories
-    4. Calculate associated emissions
-    
-    Note: Full AI processing to be implemented.
+    Documents seen before (same SHA-256 and file type) come from the
+    extraction cache; new ones are parsed in the worker pool, once per
+    unique document.
     """
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No file provided")
-    
-    allowed_extensions = {'.pdf', '.png', '.jpg', '.jpeg'}
-    file_ext = '.' + file.filename.split('.')[-1].lower()
-    
-    if file_ext not in allowed_extensions:
+    pool = get_extraction_pool()
+    cache = get_extraction_cache()
+    unique = {}
+    for upload in uploads:
+        unique.setdefault(cache.key(upload.sha256, upload.extension), upload)
+    try:
+        results = await asyncio.gather(*(
+            cache.get_or_extract(
+                upload.sha256,
+                upload.extension,
+                functools.partial(pool.extract, upload.path, upload.extension, upload.filename),
+            )
+            for upload in unique.values()
+        ))
+    except ExtractionBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except BrokenProcessPool:
         raise HTTPException(
-            status_code=400,
-            detail=f"File type not supported. Allowed: {', '.join(allowed_extensions)}"
+            status_code=503, detail="Extraction worker crashed, retry shortly", headers={"Retry-After": "5"}
         )
+    by_key = dict(zip(unique, results))
+    extracted = []
+    for upload in uploads:
+        result, cache_hit = by_key[cache.key(upload.sha256, upload.extension)]
+        extracted.append((attach_source(result, upload.filename), cache_hit))
+    return extracted
+
+
+@app.post("/upload/invoice", tags=["Data Ingestion"], openapi_extra=_upload_request_body("file", multiple=False))
+async def upload_invoice(request: Request):
+    """
+    Upload an invoice for data extraction.
     
-    # Read file content
-    content = await file.read()
-    file_size = len(content)
+    Supported formats: PDF, PNG, JPG
     
-    # TODO: Implement actual AI processing with AWS Textract or OpenAI Vision
-    # For now, return a placeholder response
-    return {
-        "status": "received",
-        "filename": file.filename,
-        "size_bytes": file_size,
-        "message": "File received. AI processing will be implemented in future release.",
-        "extracted_data": None
-    }
+    The file is streamed to disk as it arrives (never held in memory) and
+    its SHA-256 is computed on the fly. Files over UPLOAD_MAX_FILE_BYTES
+    are rejected with 413.
+    
+    This endpoint:
+    1. Reads the PDF text layer (scanned images still need OCR)
+    2. Extracts kWh, m3, litres, billing period and total
+    3. Maps them to an activity type and energy/water record
+    4. Calculates associated emissions
+    
+    Results are cached by content hash, so re-uploading a document returns
+    instantly (extraction_cached). Parsing runs in a worker process pool;
+    when its queue is full, or a worker crashed, the request fails with 503
+    and Retry-After.
+    """
+    uploads = await _receive_uploads(request, max_files=1)
+    upload = uploads[0]
+    try:
+        extracted, cache_hit = (await _extract_uploads(uploads))[0]
+        return {
+            "status": "processed",
+            "filename": upload.filename,
+            "size_bytes": upload.size,
+            "sha256": upload.sha256,
+            "extraction_status": extracted["status"],
+            "extraction_cached": cache_hit,
+            "extracted_data": extracted
+        }
+    finally:
+        await run_in_threadpool(discard_uploads, uploads)
+
+
+@app.post("/upload/invoices", tags=["Data Ingestion"], openapi_extra=_upload_request_body("files", multiple=True))
+async def upload_invoices(request: Request):
+    """
+    Upload and extract a batch of invoices in one multipart request.
+    
+    Up to UPLOAD_MAX_FILES files, each streamed to disk with its SHA-256.
+    Files whose content repeats an earlier file in the batch are reported
+    with duplicate_of and not extracted again; documents uploaded before
+    are served from the extraction cache (extraction_cached).
+    """
+    uploads = await _receive_uploads(request, max_files=UPLOAD_MAX_FILES)
+    try:
+        extracted = await _extract_uploads(uploads)
+        return {
+            "status": "processed",
+            "count": len(uploads),
+            "unique_count": sum(1 for upload in uploads if upload.duplicate_of is None),
+            "total_bytes": sum(upload.size for upload in uploads),
+            "files": [
+                {
+                    **upload.to_dict(),
+                    "extraction_status": result["status"],
+                    "extraction_cached": cache_hit,
+                    "extracted_data": result,
+                }
+                for upload, (result, cache_hit) in zip(uploads, extracted)
+            ],
+        }
+    finally:
+        await run_in_threadpool(discard_uploads, uploads)
 
 
 # ==================== Export Endpoints ====================
 
 @app.get("/export/{year}/xbrl", tags=["Export"])
-async def export_xbrl(year: int):
+async def export_xbrl(
+    year: int,
+    company_id: List[str] = Query(
+        default=["default"],
+        description="Company to include; repeat for a multi-entity instance"
+    )
+):
     """
     Export ESG report in XBRL format for regulatory submission.
     
-    Generates VSME-compliant XBRL taxonomy output.
-    
-    Note: Full XBRL generation to be implemented.
+    Generates a VSME Basic Module XBRL instance (energy, GHG emissions,
+    water and workforce facts), with one entity per company_id. The
+    instance is streamed entity by entity.
     """
-    return {
-        "status": "placeholder",
-        "year": year,
-        "format": "XBRL",
-        "message": "XBRL export will be implemented using EFRAG Open Source Converter"
-    }
+    company_ids = list(dict.fromkeys(company_id))
+    template = get_xbrl_template()
+    db_service = get_db_service()
+    
+    name = company_ids[0] if len(company_ids) == 1 else f"{len(company_ids)}_entities"
+    return StreamingResponse(
+        stream_xbrl_instance(db_service, year, company_ids, template),
+        media_type="application/xml",
+        headers={
+            "Content-Disposition": f'attachment; filename="vsme_{name}_{year}.xbrl"',
+            "X-Taxonomy-Version": template.version,
+        }
+    )
 
 
 @app.get("/export/{year}/pdf", tags=["Export"])
@@ -530,27 +896,28 @@ async def export_pdf(year: int):
 
 
 @app.get("/export/{year}/csv", tags=["Export"])
-async def export_csv(year: int):
+async def export_csv(
+    year: int,
+    company_id: str = "default",
+    gzip: bool = Query(default=False, description="Gzip-compress the file (.csv.gz)")
+):
     """
     Export ESG data as CSV for analysis.
+    
+    One row per energy, emissions, water, workforce and scope 3 record,
+    plus the activity-level inputs behind each emissions record. The file
+    is streamed module by module, so exports of any size use constant
+    memory.
     """
     db_service = get_db_service()
-    report = await db_service.get_report(year)
-    
-    return {
-        "year": year,
-        "format": "CSV",
-        "summary": {
-            "total_energy_kwh": sum(e.total_kwh for e in report.energy_consumption),
-            "total_emissions_tonnes": (
-                report.ghg_emissions[0].scope1_total + 
-                report.ghg_emissions[0].scope2_location_based 
-                if report.ghg_emissions else 0
-            ),
-            "total_water_m3": sum(w.total_withdrawal for w in report.water_usage),
-            "employee_count": report.employee_metrics.total_headcount if report.employee_metrics else 0
-        }
-    }
+    filename = f"esg_report_{company_id}_{year}.csv"
+    if gzip:
+        filename += ".gz"
+    return StreamingResponse(
+        iter_report_csv(db_service, year, company_id, compress=gzip),
+        media_type="application/gzip" if gzip else "text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 
 # ==================== VSME Compliance ====================
@@ -631,11 +998,18 @@ async def startup_event():
         print("⚠ Firebase: Not configured (running in DEMO MODE)")
         print("  → To connect Firebase, add firebase-credentials.json")
     
-    print("✓ Emission Calculator: Loaded (DEFRA 2024, EPA, EEIO)")
+    print(f"✓ Emission Calculator: Ready (default factors: {get_factor_registry().default_version})")
     print("✓ Integration Service: Ready (Xero, Sage, DATEV)")
     print("="*60 + "\n")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled connections and worker processes on application shutdown."""
+    await get_http_client().close()
+    get_extraction_pool().shutdown()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
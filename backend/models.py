@@ -21,6 +21,13 @@ class EnergyConsumption(BaseModel):
     consumption_kwh: float
     source_document: Optional[str] = None  # Link to invoice
 
+class EmissionActivity(BaseModel):
+    activity_type: str  # Emission factor key, e.g. "diesel", "electricity"
+    quantity: float  # In the factor's native unit (litre, kWh, USD...)
+    country: str = "default"
+    variant: Optional[str] = None
+    sub_category: Optional[str] = None
+
 class GHGEmissions(BaseModel):
     id: Optional[str] = None
     period_start: date
@@ -28,6 +35,8 @@ class GHGEmissions(BaseModel):
     scope: ScopeType
     co2e_tonnes: float
     methodology: str = Field(..., description="e.g., Spend-based, Activity-based")
+    activities: List[EmissionActivity] = []  # Inputs behind co2e_tonnes, for recalculation
+    factor_version: Optional[str] = None  # Emission factor dataset co2e_tonnes was computed with
 
 class WaterUsage(BaseModel):
     id: Optional[str] = None
@@ -0,0 +1,264 @@
+"""
+Emission Recalculation Job
+==========================
+
+Recompute every company's GHG emissions for a year against an emission
+factor version, e.g. when a new DEFRA vintage is published.
+
+Each GHGEmissions record keeps the activity inputs it was computed from
+(activity type, quantity, country, variant, sub-category). The job loads
+the emissions module of every company, flattens all activities into
+columns and replays them through calculate_emissions_batch in batches of
+RECALC_BATCH_SIZE rows, spread across a process pool. Records without
+activity inputs (e.g. supplier-specific market-based figures) are kept
+as they are and counted as skipped.
+
+The result is a diff report of the totals per company and scope, before
+and after. With --apply the recalculated records, stamped with the new
+factor_version, are written back.
+
+Usage:
+    # Preview the impact of a factor version on every company's 2024 report
+    python -m backend.recalculate --year 2024 --version defra-2024
+    
+    # Recalculate selected companies and save the results
+    python -m backend.recalculate --year 2024 --companies acme,globex --apply
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from .database import get_db_service
+from .emission_factors import calculate_emissions_batch, get_factor_dataset
+from .models import GHGEmissions
+
+# Activity rows per worker task
+RECALC_BATCH_SIZE = int(os.getenv("RECALC_BATCH_SIZE", "50000"))
+
+# Worker processes used to replay activities
+RECALC_WORKERS = int(os.getenv("RECALC_WORKERS", str(os.cpu_count() or 2)))
+
+# Activity errors listed in the report (the count is always complete)
+RECALC_MAX_ERRORS = 100
+
+
+def recalculate_columns(
+    version: str,
+    activity_types: List[str],
+    quantities: List[float],
+    countries: List[str],
+    variants: List[Optional[str]],
+    sub_categories: List[Optional[str]]
+) -> Tuple[List[Optional[float]], List[Dict]]:
+    """
+    Replay one batch of activity columns (runs in a worker process).
+    
+    Only the emissions column and the errors are sent back, to keep the
+    result small to pickle.
+    """
+    batch = calculate_emissions_batch(
+        activity_types, quantities, countries, variants, sub_categories, version=version
+    )
+    return batch["results"]["emissions_kg_co2e"], batch["errors"]
+
+
+async def recalculate_year(
+    year: int,
+    version: Optional[str] = None,
+    company_ids: Optional[List[str]] = None,
+    apply: bool = False,
+    max_workers: Optional[int] = None,
+    batch_size: Optional[int] = None
+) -> Dict:
+    """
+    Recalculate a year's emissions for many companies against a factor version.
+    
+    Args:
+        year: Reporting year
+        version: Factor dataset version (default dataset if None)
+        company_ids: Companies to recalculate (all with a report for the year if None)
+        apply: Save the recalculated records
+        max_workers: Worker processes (default RECALC_WORKERS)
+        batch_size: Activity rows per worker task (default RECALC_BATCH_SIZE)
+    
+    Returns:
+        Diff report with per-company totals before and after, by scope
+    
+    Raises:
+        ValueError: If the factor version is unknown
+    """
+    started = time.perf_counter()
+    version = get_factor_dataset(version).version
+    batch_size = batch_size or RECALC_BATCH_SIZE
+    db_service = get_db_service()
+    
+    if company_ids is None:
+        company_ids = await db_service.list_report_companies(year)
+    modules: List[List[GHGEmissions]] = await asyncio.gather(*(
+        db_service.get_report_module(year, "emissions", company_id)
+        for company_id in company_ids
+    ))
+    
+    # Flatten every activity of every record into columns, remembering
+    # which (company, record) each row belongs to
+    columns: Tuple[List, ...] = ([], [], [], [], [])
+    owners: List[Tuple[int, int]] = []
+    for company_index, records in enumerate(modules):
+        for record_index, record in enumerate(records):
+            for activity in record.activities:
+                columns[0].append(activity.activity_type)
+                columns[1].append(activity.quantity)
+                columns[2].append(activity.country)
+                columns[3].append(activity.variant)
+                columns[4].append(activity.sub_category)
+                owners.append((company_index, record_index))
+    
+    slices = [
+        tuple(column[start:start + batch_size] for column in columns)
+        for start in range(0, len(owners), batch_size)
+    ]
+    if len(slices) > 1:
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=max_workers or RECALC_WORKERS) as pool:
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, recalculate_columns, version, *batch)
+                for batch in slices
+            ))
+    else:
+        # A single batch is not worth starting worker processes for
+        results = [recalculate_columns(version, *batch) for batch in slices]
+    
+    new_kg: Dict[Tuple[int, int], float] = {}
+    failed = set()
+    errors = []
+    for slice_index, (emissions_kg, batch_errors) in enumerate(results):
+        offset = slice_index * batch_size
+        for row, kg in enumerate(emissions_kg):
+            owner = owners[offset + row]
+            if kg is not None:
+                new_kg[owner] = new_kg.get(owner, 0.0) + kg
+        for error in batch_errors:
+            owner = owners[offset + error["index"]]
+            failed.add(owner)
+            company_index, record_index = owner
+            errors.append({
+                "company_id": company_ids[company_index],
+                "record_id": modules[company_index][record_index].id,
+                "activity_type": error["activity_type"],
+                "detail": error["detail"],
+            })
+    
+    companies = []
+    updates: Dict[str, List[GHGEmissions]] = {}
+    for company_index, (company_id, records) in enumerate(zip(company_ids, modules)):
+        before: Dict[str, float] = {}
+        after: Dict[str, float] = {}
+        updated = []
+        counts = {"records": len(records), "recalculated": 0, "changed": 0, "skipped": 0, "failed": 0}
+        for record_index, record in enumerate(records):
+            owner = (company_index, record_index)
+            scope = record.scope.value
+            before[scope] = before.get(scope, 0.0) + record.co2e_tonnes
+            if not record.activities:
+                counts["skipped"] += 1
+            elif owner in failed:
+                counts["failed"] += 1
+            else:
+                counts["recalculated"] += 1
+                tonnes = round(new_kg.get(owner, 0.0) / 1000, 4)
+                if tonnes != round(record.co2e_tonnes, 4) or record.factor_version != version:
+                    counts["changed"] += 1
+                    record = record.model_copy(update={"co2e_tonnes": tonnes, "factor_version": version})
+            after[scope] = after.get(scope, 0.0) + record.co2e_tonnes
+            updated.append(record)
+        
+        if counts["changed"]:
+            updates[company_id] = updated
+        companies.append({"company_id": company_id, **counts, **_diff(before, after)})
+    
+    if apply and updates:
+        await asyncio.gather(*(
+            db_service.save_emissions_data(year, records, company_id)
+            for company_id, records in updates.items()
+        ))
+    
+    before_total = sum(company["before_tonnes"]["total"] for company in companies)
+    after_total = sum(company["after_tonnes"]["total"] for company in companies)
+    return {
+        "year": year,
+        "factor_version": version,
+        "applied": apply and bool(updates),
+        "companies_changed": len(updates),
+        "activities": len(owners),
+        "batches": len(slices),
+        "totals": {
+            "before_tonnes": round(before_total, 4),
+            "after_tonnes": round(after_total, 4),
+            "delta_tonnes": round(after_total - before_total, 4),
+        },
+        "companies": companies,
+        "error_count": len(errors),
+        "errors": errors[:RECALC_MAX_ERRORS],
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _diff(before: Dict[str, float], after: Dict[str, float]) -> Dict:
+    """Per-scope and total tonnes before and after, with the change."""
+    before_total = sum(before.values())
+    after_total = sum(after.values())
+    delta = after_total - before_total
+    
+    def rounded(totals: Dict[str, float], total: float) -> Dict[str, float]:
+        return {**{scope: round(value, 4) for scope, value in sorted(totals.items())}, "total": round(total, 4)}
+    
+    return {
+        "before_tonnes": rounded(before, before_total),
+        "after_tonnes": rounded(after, after_total),
+        "delta_tonnes": round(delta, 4),
+        "delta_percent": round(delta / before_total * 100, 2) if before_total else None,
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recalculate a year's emissions against an emission factor version.")
+    parser.add_argument("--year", type=int, required=True, help="Reporting year")
+    parser.add_argument("--version", help="Emission factor dataset version (default: current default)")
+    parser.add_argument("--companies", help="Comma-separated company ids (default: every company with a report)")
+    parser.add_argument("--apply", action="store_true", help="Save the recalculated records")
+    parser.add_argument("--workers", type=int, default=RECALC_WORKERS, help="Worker processes")
+    parser.add_argument("--batch-size", type=int, default=RECALC_BATCH_SIZE, help="Activity rows per worker task")
+    args = parser.parse_args(argv)
+    
+    if args.workers < 1 or args.batch_size < 1:
+        parser.error("--workers and --batch-size must be positive")
+    
+    company_ids = None
+    if args.companies:
+        company_ids = [company.strip() for company in args.companies.split(",") if company.strip()]
+    
+    try:
+        report = asyncio.run(recalculate_year(
+            args.year,
+            version=args.version,
+            company_ids=company_ids,
+            apply=args.apply,
+            max_workers=args.workers,
+            batch_size=args.batch_size,
+        ))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,399 @@
+"""
+Materialized ESG Rollups
+========================
+
+Per-tenant index of monthly totals keyed by (year, month, scope, esg_type,
+currency). It is updated on every report write and ERP sync, so dashboard
+totals and time series cost O(months x types) no matter how many raw
+records (invoices, utility bills, emission entries) sit behind them.
+
+Contributions are tracked per company, year and source: a report module,
+such as "report-energy_data", or an ERP provider, such as "sync-xero".
+Rewriting a module replaces its source in the reporting year; a sync
+replaces its source in every year it touched, rebuilt from the sync ledger
+(see invoice_contributions), so a re-fetched invoice swaps its previous
+contribution out instead of being counted twice.
+
+The database service persists every source's cells of a year next to the
+report (see encode_cells) and loads a year into this index when it is
+missing or stale, so the index is a per-process cache of those documents.
+
+A record that spans several months, such as an annual utility total, is
+spread across those months in proportion to the days it covers. It counts
+as one record, in the month its period starts. Report records are clamped
+to their reporting year, so a year's report sources add up to its report.
+
+Spend is kept in the currency it was booked in: cells carry the currency
+and totals report spend per currency. Report spend (scope 3 screening)
+carries no currency and is reported as "unspecified".
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import threading
+
+from .invoice_batch import InvoiceBatch
+from .models import ESGReport, FuelType
+
+# Values kept per cell, in this order
+METRICS = (
+    "records",
+    "emissions_kg_co2e",
+    "energy_kwh",
+    "renewable_kwh",
+    "water_m3",
+    "spend_amount",
+)
+_RECORDS, _EMISSIONS, _ENERGY, _RENEWABLE, _WATER, _SPEND = range(len(METRICS))
+
+# Report modules feeding the index, with the esg_type their rows are filed under
+REPORT_MODULES = {
+    "energy_data": "energy",
+    "emissions_data": "ghg_emissions",
+    "water_data": "water",
+    "scope_3_data": "scope_3_analysis",
+}
+
+# Invoice ESG quantity units that map onto physical metrics
+_UNIT_METRICS = {"kWh": _ENERGY, "m3": _WATER}
+
+CellKey = Tuple[int, int, Optional[str], str, Optional[str]]  # (year, month, scope, esg_type, currency)
+Cells = Dict[CellKey, List[float]]
+
+# Spend label for records without a currency
+UNSPECIFIED_CURRENCY = "unspecified"
+
+# What one synced invoice contributes, as stored in the sync ledger, in this order
+CONTRIBUTION_FIELDS = (
+    "date",  # Invoice date ordinal
+    "scope",
+    "esg_type",
+    "currency",
+    "amount",
+    "total_amount",
+    "emissions_kg",  # 0.0 where no emissions could be calculated
+    "energy_kwh",
+    "water_m3",
+    "dedupe_key",  # Same supplier invoice across providers, see InvoiceBatch.dedupe_key
+)
+(_C_DATE, _C_SCOPE, _C_ESG_TYPE, _C_CURRENCY, _C_AMOUNT, _C_TOTAL,
+ _C_EMISSIONS, _C_ENERGY, _C_WATER, _C_DEDUPE_KEY) = range(len(CONTRIBUTION_FIELDS))
+
+
+class RollupIndex:
+    """Thread-safe materialized monthly rollups per company and year."""
+    
+    def __init__(self):
+        # (company_id, year) -> source -> cells contributed by that source
+        self._sources: Dict[Tuple[str, int], Dict[str, Cells]] = {}
+        # (company_id, year) -> cells summed over every source
+        self._cells: Dict[Tuple[str, int], Cells] = {}
+        self._lock = threading.Lock()
+    
+    # ==================== Updates ====================
+    
+    def replace(self, company_id: str, year: int, source: str, cells: Cells) -> None:
+        """Replace what a source contributed to a year (cells of other years are ignored)."""
+        with self._lock:
+            self._replace(company_id, year, source, cells)
+    
+    def load_year(self, company_id: str, year: int, sources: Dict[str, Cells]) -> None:
+        """Replace every source of a year, e.g. with the persisted rollups."""
+        with self._lock:
+            self._sources.pop((company_id, year), None)
+            self._cells.pop((company_id, year), None)
+            for source, cells in sources.items():
+                self._replace(company_id, year, source, cells)
+    
+    def has_source(self, company_id: str, year: int, source: str) -> bool:
+        with self._lock:
+            return source in self._sources.get((company_id, year), {})
+    
+    def replace_report(self, company_id: str, report: ESGReport) -> None:
+        """Replace the contributions of every module of a report."""
+        for module in REPORT_MODULES:
+            self.replace_report_module(company_id, report.reporting_year, module, getattr(report, module))
+    
+    def replace_report_module(self, company_id: str, year: int, module: str, records: Iterable) -> None:
+        """Replace the contribution of one report module (e.g. after PUT /report/{year}/energy)."""
+        self.replace(company_id, year, report_source(module), report_module_cells(year, module, records))
+    
+    def _replace(self, company_id: str, year: int, source: str, cells: Cells) -> None:
+        sources = self._sources.setdefault((company_id, year), {})
+        summed = self._cells.setdefault((company_id, year), {})
+        for key, values in sources.pop(source, {}).items():
+            _accumulate(summed, key, values, -1.0)
+        
+        year_cells = {key: list(values) for key, values in cells.items() if key[0] == year}
+        for key, values in year_cells.items():
+            _accumulate(summed, key, values, 1.0)
+        if year_cells:
+            sources[source] = year_cells
+    
+    # ==================== Queries ====================
+    
+    def years(self, company_id: str) -> List[int]:
+        """Years with rolled-up data loaded for a company, newest first."""
+        with self._lock:
+            return sorted(
+                (year for (company, year), cells in self._cells.items() if company == company_id and cells),
+                reverse=True,
+            )
+    
+    def totals(
+        self,
+        company_id: str,
+        year: int,
+        month_from: int = 1,
+        month_to: int = 12,
+        esg_types: Optional[Iterable[str]] = None
+    ) -> Dict:
+        """
+        Totals for a year (or a month range), overall and by scope and ESG type,
+        plus the monthly time series. Spend is reported per currency.
+        
+        Note that report modules and synced invoices are separate esg_types
+        and are not netted against each other; filter with esg_types to avoid
+        counting the same emissions from two sources.
+        """
+        if not 1 <= month_from <= month_to <= 12:
+            raise ValueError("Months must satisfy 1 <= month_from <= month_to <= 12")
+        
+        wanted = set(esg_types) if esg_types is not None else None
+        overall = _new_totals()
+        by_scope: Dict[str, Tuple[List[float], Dict[str, float]]] = {}
+        by_esg_type: Dict[str, Tuple[List[float], Dict[str, float]]] = {}
+        monthly = {month: _new_totals() for month in range(month_from, month_to + 1)}
+        
+        with self._lock:
+            cells = list(self._cells.get((company_id, year), {}).items())
+        
+        for (_, month, scope, esg_type, currency), values in cells:
+            if month not in monthly or (wanted is not None and esg_type not in wanted):
+                continue
+            for target, spend in (
+                overall,
+                monthly[month],
+                by_scope.setdefault(scope or "unscoped", _new_totals()),
+                by_esg_type.setdefault(esg_type, _new_totals()),
+            ):
+                for position, value in enumerate(values):
+                    target[position] += value
+                if values[_SPEND]:
+                    label = currency or UNSPECIFIED_CURRENCY
+                    spend[label] = spend.get(label, 0.0) + values[_SPEND]
+        
+        return {
+            "company_id": company_id,
+            "year": year,
+            "months": {"from": month_from, "to": month_to},
+            "totals": _format_metrics(overall),
+            "by_scope": {scope: _format_metrics(totals) for scope, totals in sorted(by_scope.items())},
+            "by_esg_type": {esg_type: _format_metrics(totals) for esg_type, totals in sorted(by_esg_type.items())},
+            "monthly": [
+                dict(month=month, **_format_metrics(totals))
+                for month, totals in monthly.items()
+            ],
+        }
+
+
+# ============================================
+# SOURCES & PERSISTENCE
+# ============================================
+
+def report_source(module: str) -> str:
+    """Source id of a report module within its reporting year."""
+    return f"report-{module}"
+
+
+def sync_source(provider: str) -> str:
+    """Source id of an ERP provider's synced invoices."""
+    return f"sync-{provider}"
+
+
+def split_years(cells: Cells) -> Dict[int, Cells]:
+    """Group cells by their year."""
+    years: Dict[int, Cells] = {}
+    for key, values in cells.items():
+        years.setdefault(key[0], {})[key] = values
+    return years
+
+
+def encode_cells(cells: Cells) -> List[Dict]:
+    """Convert cells to Firestore-compatible rows."""
+    return [
+        {
+            "year": year,
+            "month": month,
+            "scope": scope,
+            "esg_type": esg_type,
+            "currency": currency,
+            "values": list(values),
+        }
+        for (year, month, scope, esg_type, currency), values in cells.items()
+    ]
+
+
+def decode_cells(rows: Iterable[Dict]) -> Cells:
+    """Convert rows written by encode_cells back to cells."""
+    return {
+        (row["year"], row["month"], row.get("scope"), row["esg_type"], row.get("currency")): list(row["values"])
+        for row in rows
+    }
+
+
+# ============================================
+# CELL BUILDERS
+# ============================================
+
+def report_module_cells(year: int, module: str, records: Iterable) -> Cells:
+    """Build rollup cells for the records of one ESGReport module."""
+    if module not in REPORT_MODULES:
+        raise ValueError(f"Unknown report module: {module}")
+    
+    esg_type = REPORT_MODULES[module]
+    first_day, last_day = date(year, 1, 1), date(year, 12, 31)
+    cells: Cells = {}
+    for record in records:
+        values = [0.0] * len(METRICS)
+        values[_RECORDS] = 1.0
+        
+        if module == "scope_3_data":
+            # Scope 3 screening entries carry no period: spread over the year
+            values[_EMISSIONS] = record.estimated_co2e * 1000
+            values[_SPEND] = record.spend_amount
+            _spread(cells, first_day, last_day, "scope_3", esg_type, values)
+            continue
+        
+        scope = None
+        if module == "energy_data":
+            values[_ENERGY] = record.consumption_kwh
+            if record.fuel_type == FuelType.RENEWABLE:
+                values[_RENEWABLE] = record.consumption_kwh
+        elif module == "emissions_data":
+            values[_EMISSIONS] = record.co2e_tonnes * 1000
+            scope = record.scope.value
+        elif module == "water_data":
+            values[_WATER] = record.volume_m3
+        start = min(max(record.period_start, first_day), last_day)
+        end = min(max(record.period_end, first_day), last_day)
+        _spread(cells, start, end, scope, esg_type, values)
+    return cells
+
+
+def invoice_contributions(batch: InvoiceBatch) -> Dict[str, list]:
+    """
+    Contribution of every invoice of a batch, keyed by invoice id (see
+    CONTRIBUTION_FIELDS). Emissions are calculated if needed.
+    """
+    scopes = batch.scopes()
+    unit_metric = [_UNIT_METRICS.get(unit) for unit in batch.esg_unit.values]
+    
+    contributions: Dict[str, list] = {}
+    for index in range(len(batch)):
+        kg = batch.emissions_kg[index]
+        quantity = batch.esg_quantity[index]
+        metric = unit_metric[batch.esg_unit.codes[index]] if quantity == quantity else None
+        contributions[batch.id[index]] = [
+            batch.date[index],
+            scopes[index],
+            batch.esg_type[index],
+            batch.currency[index],
+            batch.amount[index],
+            batch.total_amount[index],
+            kg if kg == kg else 0.0,  # NaN: not calculated
+            quantity if metric == _ENERGY else 0.0,
+            quantity if metric == _WATER else 0.0,
+            "|".join(map(str, batch.dedupe_key(index))),
+        ]
+    return contributions
+
+
+def contribution_cells(contributions: Iterable[list]) -> Cells:
+    """Build rollup cells for synced invoice contributions."""
+    cells: Cells = {}
+    months: Dict[int, Tuple[int, int]] = {}
+    for contribution in contributions:
+        ordinal = contribution[_C_DATE]
+        if ordinal not in months:
+            day = date.fromordinal(ordinal)
+            months[ordinal] = (day.year, day.month)
+        year, month = months[ordinal]
+        
+        key = (year, month, contribution[_C_SCOPE], contribution[_C_ESG_TYPE], contribution[_C_CURRENCY])
+        values = cells.get(key)
+        if values is None:
+            values = cells[key] = [0.0] * len(METRICS)
+        
+        values[_RECORDS] += 1
+        values[_SPEND] += contribution[_C_TOTAL]
+        values[_EMISSIONS] += contribution[_C_EMISSIONS]
+        values[_ENERGY] += contribution[_C_ENERGY]
+        values[_WATER] += contribution[_C_WATER]
+    return cells
+
+
+def contribution_month(contribution: list) -> str:
+    """Calendar month ("YYYY-MM") of a contribution, which shards the sync ledger."""
+    return date.fromordinal(contribution[_C_DATE]).strftime("%Y-%m")
+
+
+def _spread(cells: Cells, start: date, end: date, scope: Optional[str], esg_type: str, values: List[float]) -> None:
+    """Add values to cells, split across months by the days of [start, end] in each."""
+    if end < start:
+        start, end = end, start
+    total_days = (end - start).days + 1
+    
+    first = True
+    cursor = start
+    while cursor <= end:
+        next_month = date(cursor.year + cursor.month // 12, cursor.month % 12 + 1, 1)
+        month_end = min(end, next_month - timedelta(days=1))
+        share = ((month_end - cursor).days + 1) / total_days
+        
+        scaled = [value * share for value in values]
+        scaled[_RECORDS] = values[_RECORDS] if first else 0.0
+        _accumulate(cells, (cursor.year, cursor.month, scope, esg_type, None), scaled, 1.0)
+        
+        first = False
+        cursor = next_month
+
+
+def _accumulate(cells: Dict, key: Tuple, values: List[float], sign: float) -> None:
+    """Add (or subtract) values into cells[key], dropping cells that reach zero."""
+    target = cells.get(key)
+    if target is None:
+        target = cells[key] = [0.0] * len(METRICS)
+    for position, value in enumerate(values):
+        target[position] += sign * value
+    if all(abs(value) < 1e-9 for value in target):
+        del cells[key]
+
+
+def _new_totals() -> Tuple[List[float], Dict[str, float]]:
+    """Metric values plus spend per currency (values[_SPEND] mixes currencies and is not reported)."""
+    return [0.0] * len(METRICS), {}
+
+
+def _format_metrics(totals: Tuple[List[float], Dict[str, float]]) -> Dict:
+    values, spend = totals
+    return {
+        "records": int(round(values[_RECORDS])),
+        "emissions_kg_co2e": round(values[_EMISSIONS], 2),
+        "emissions_tonnes_co2e": round(values[_EMISSIONS] / 1000, 4),
+        "energy_kwh": round(values[_ENERGY], 2),
+        "renewable_kwh": round(values[_RENEWABLE], 2),
+        "water_m3": round(values[_WATER], 2),
+        "spend_by_currency": {currency: round(amount, 2) for currency, amount in sorted(spend.items())},
+    }
+
+
+# Singleton instance
+_rollup_index: Optional[RollupIndex] = None
+
+def get_rollup_index() -> RollupIndex:
+    """Get the rollup index singleton."""
+    global _rollup_index
+    if _rollup_index is None:
+        _rollup_index = RollupIndex()
+    return _rollup_index
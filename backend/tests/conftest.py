@@ -0,0 +1,25 @@
+"""
+Shared fixtures. Run from the repository root:
+
+    pip install -r backend/requirements-dev.txt
+    python -m pytest backend/tests
+"""
+
+import pytest
+
+from backend import database, firebase_config, integrations, rollups
+from backend.bench import fake_firestore
+
+
+@pytest.fixture
+def firestore():
+    """A fresh in-memory Firestore with fresh service, integration and rollup singletons."""
+    previous = firebase_config._db
+    client = fake_firestore.install()
+    rollups._rollup_index = None
+    integrations._integration_services.clear()
+    yield client
+    firebase_config._db = previous
+    database._db_service = None
+    rollups._rollup_index = None
+    integrations._integration_services.clear()
@@ -0,0 +1,18 @@
+import time
+
+from backend.cache import TTLCache
+
+
+def test_peek_leaves_counters_alone():
+    cache = TTLCache(max_entries=4, ttl_seconds=60)
+    assert cache.peek("report") is None
+    cache.set("report", 1)
+    assert cache.peek("report") == 1
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_peek_skips_expired_entries():
+    cache = TTLCache(max_entries=4, ttl_seconds=0.01)
+    cache.set("report", 1)
+    time.sleep(0.02)
+    assert cache.peek("report") is None
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from backend import fake_provider, http_client
+from backend.http_client import ProviderHTTPClient
+
+PROVIDER = "quickbooks"
+INVOICES_PATH = f"/{PROVIDER}/invoices"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """A ProviderHTTPClient talking to the fake provider in process, with short backoff."""
+    monkeypatch.setattr(http_client, "HTTP_BACKOFF_BASE", 0.01)
+    fake_provider.reset()
+    client = ProviderHTTPClient(
+        base_urls={PROVIDER: f"http://fake/{PROVIDER}"},
+        transport=httpx.ASGITransport(app=fake_provider.app),
+    )
+    yield client
+    asyncio.run(client.close())
+    fake_provider.reset()
+
+
+def test_rate_limited_request_waits_for_retry_after(client):
+    fake_provider.fail_next(429, retry_after="0.2")
+    
+    async def run():
+        started = time.monotonic()
+        response = await client.request(PROVIDER, "GET", "/invoices", params={"page": 1})
+        return response, time.monotonic() - started
+    
+    response, seconds = asyncio.run(run())
+    assert response.status_code == 200
+    assert fake_provider.requests_seen[("GET", INVOICES_PATH)] == 2
+    assert seconds >= 0.2
+
+
+def test_server_error_on_get_is_retried(client):
+    fake_provider.fail_next(503, count=2)
+    response = asyncio.run(client.request(PROVIDER, "GET", "/invoices", params={"page": 1}))
+    assert response.status_code == 200
+    assert fake_provider.requests_seen[("GET", INVOICES_PATH)] == 3
+
+
+def test_server_error_on_post_is_not_retried(client):
+    fake_provider.fail_next(503)
+    with pytest.raises(httpx.HTTPStatusError) as failure:
+        asyncio.run(client.request(PROVIDER, "POST", "/invoices", json={"id": "inv-1"}))
+    assert failure.value.response.status_code == 503
+    assert fake_provider.requests_seen[("POST", INVOICES_PATH)] == 1
+
+
+def test_post_with_idempotency_key_is_retried(client):
+    fake_provider.fail_next(503)
+    response = asyncio.run(
+        client.request(PROVIDER, "POST", "/invoices", json={"id": "inv-1"}, idempotency_key="inv-1")
+    )
+    assert response.status_code == 201
+    assert fake_provider.requests_seen[("POST", INVOICES_PATH)] == 2
+
+
+@pytest.mark.parametrize("style, page_param", [("page", "page"), ("offset", "offset")])
+def test_paginate_fetches_every_page(client, style, page_param):
+    expected = [invoice["id"] for invoice in fake_provider._provider_invoices(PROVIDER)]
+    page_size = len(expected) // 4 + 1  # Four pages, the last one short
+    
+    async def run():
+        return [
+            invoice["id"]
+            async for invoice in client.paginate(
+                PROVIDER, "/invoices", "invoices",
+                style=style, page_size=page_size, page_param=page_param,
+            )
+        ]
+    
+    assert asyncio.run(run()) == expected
+    assert fake_provider.requests_seen[("GET", INVOICES_PATH)] == 4
+
+
+def test_one_pooled_client_per_provider(client):
+    async def run():
+        for page in (1, 2):
+            await client.request(PROVIDER, "GET", "/invoices", params={"page": page})
+    
+    asyncio.run(run())
+    assert list(client._clients) == [PROVIDER]
@@ -0,0 +1,64 @@
+import random
+from datetime import date
+
+import pytest
+
+from backend import integrations
+from backend.integrations import get_integration_service
+from backend.rollups import get_rollup_index
+
+YEAR = 2024
+PROVIDERS = ("quickbooks", "xero")
+
+
+@pytest.fixture
+def overlapping_providers(monkeypatch):
+    """Every provider returns the same invoices, whatever the cursor."""
+    generate = integrations.generate_mock_invoice_batch
+    
+    def same_invoices(provider, start_date, end_date, modified_since=None, rng=None):
+        return generate(provider, start_date, end_date, rng=random.Random(7))
+    
+    monkeypatch.setattr(integrations, "generate_mock_invoice_batch", same_invoices)
+    return len(same_invoices("xero", date(YEAR, 1, 1), date(YEAR, 12, 31)))
+
+
+def _recorded(service, company_id):
+    ledgers = sum(service.get_sync_state(provider)["aggregates"]["invoices_count"] for provider in PROVIDERS)
+    rollup_records = get_rollup_index().totals(company_id, YEAR)["totals"]["records"]
+    return ledgers, rollup_records
+
+
+def test_overlapping_providers_are_not_double_counted(firestore, overlapping_providers):
+    service = get_integration_service("overlap")
+    for provider in PROVIDERS:
+        service.connect(provider)
+    window = (date(YEAR, 1, 1), date(YEAR, 12, 31))
+    
+    result = service.sync_all(["invoices"], *window)
+    assert result["data"]["invoices_count"] == overlapping_providers
+    assert _recorded(service, "overlap") == (overlapping_providers, overlapping_providers)
+    
+    # Both providers re-fetch every invoice incrementally
+    result = service.sync_all(["invoices"], *window, incremental=True)
+    assert result["data"]["duplicates_removed"] == overlapping_providers
+    assert _recorded(service, "overlap") == (overlapping_providers, overlapping_providers)
+    
+    # A direct sync of the provider that lost the duplicates must not re-add them
+    for provider in PROVIDERS:
+        state = service.sync_data(provider, ["invoices"], *window, incremental=True)["data"]["sync_state"]
+        assert state["mode"] == "incremental"
+    assert _recorded(service, "overlap") == (overlapping_providers, overlapping_providers)
+
+
+def test_sync_state_survives_a_new_service(firestore, overlapping_providers):
+    service = get_integration_service("restart")
+    service.connect("xero")
+    window = (date(YEAR, 1, 1), date(YEAR, 12, 31))
+    service.sync_data("xero", ["invoices"], *window)
+    
+    restarted = integrations.IntegrationService("restart")
+    restarted.connect("xero")
+    state = restarted.sync_data("xero", ["invoices"], *window, incremental=True)["data"]["sync_state"]
+    assert state["invoices_updated"] == overlapping_providers
+    assert state["aggregates"]["invoices_count"] == overlapping_providers
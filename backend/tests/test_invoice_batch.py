@@ -0,0 +1,26 @@
+import random
+from datetime import date
+
+from backend.integrations import generate_mock_invoices
+from backend.invoice_batch import InvoiceBatch
+
+
+def _spend_invoices(currency):
+    invoices = generate_mock_invoices("xero", date(2024, 1, 1), date(2024, 12, 31), rng=random.Random(3))
+    for invoice in invoices:
+        invoice["currency"] = currency
+    return InvoiceBatch.from_invoices(invoices)
+
+
+def test_lowercase_currency_codes_are_known():
+    lower = _spend_invoices("eur")
+    totals = lower.calculate_emissions()
+    assert not totals.get("unknown_currencies")
+    
+    upper = _spend_invoices("EUR")
+    assert totals["total_emissions_kg"] == upper.calculate_emissions()["total_emissions_kg"]
+
+
+def test_unknown_currency_is_reported_upper_cased():
+    totals = _spend_invoices("xyz").calculate_emissions()
+    assert totals["unknown_currencies"] == ["XYZ"]
@@ -0,0 +1,268 @@
+"""
+Streaming Invoice Uploads
+=========================
+
+Receives multipart/form-data invoice uploads without buffering files in
+memory.
+
+The request body is read chunk by chunk from the ASGI stream and fed to an
+incremental multipart parser. Each file part is spooled straight to a
+temporary file while its SHA-256 is computed on the fly, so:
+
+- memory use per request stays at one network chunk, whatever the size
+  of the scanned bundle
+- oversize files and requests are rejected with 413 as soon as the limit
+  is crossed (or up front from Content-Length), without reading the rest
+- identical documents in one batch are detected by content hash and only
+  the first copy is kept
+
+Limits are configurable via UPLOAD_MAX_FILE_BYTES, UPLOAD_MAX_REQUEST_BYTES
+and UPLOAD_MAX_FILES; files are spooled to UPLOAD_SPOOL_DIR (the system
+temp directory by default).
+"""
+
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import io
+import os
+import tempfile
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    import python_multipart as multipart
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    import multipart
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import parse_options_header
+
+# Maximum size of a single uploaded file
+UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(50 * 1024 * 1024)))
+
+# Maximum size of a whole upload request (all files plus multipart framing)
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(200 * 1024 * 1024)))
+
+# Maximum number of files per upload request
+UPLOAD_MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "20"))
+
+# Directory for spooled uploads (None: system temp directory)
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+
+ALLOWED_UPLOAD_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg")
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the file or request size limit (HTTP 413)."""
+
+
+class SpooledUpload:
+    """One uploaded file, spooled to disk, with its size and SHA-256."""
+    
+    def __init__(self, filename: str, content_type: Optional[str]):
+        self.filename = filename
+        self.content_type = content_type
+        self.extension = os.path.splitext(filename)[1].lower()
+        self.path: Optional[str] = None
+        self.size = 0
+        self.sha256: Optional[str] = None
+        self.duplicate_of: Optional[str] = None
+        self._hash = hashlib.sha256()
+        self._file = None
+    
+    def write(self, data: bytes) -> None:
+        if self._file is None:
+            self._file = tempfile.NamedTemporaryFile(
+                prefix="upload-", suffix=self.extension, dir=UPLOAD_SPOOL_DIR, delete=False
+            )
+            self.path = self._file.name
+        self._file.write(data)
+        self._hash.update(data)
+    
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.sha256 = self._hash.hexdigest()
+    
+    def open(self):
+        """Open the spooled content for reading."""
+        return open(self.path, "rb") if self.path else io.BytesIO()
+    
+    def discard(self) -> None:
+        """Delete the spooled file."""
+        self.close()
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+    
+    def to_dict(self) -> Dict:
+        return {
+            "filename": self.filename,
+            "content_type": self.content_type,
+            "size_bytes": self.size,
+            "sha256": self.sha256,
+            "duplicate_of": self.duplicate_of,
+        }
+
+
+class _UploadReceiver:
+    """Multipart parser callbacks that route file parts into SpooledUploads."""
+    
+    def __init__(self, max_file_bytes: int, max_files: int):
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.uploads: List[SpooledUpload] = []
+        # (upload, data) writes queued by the parser, or (upload, None) to close;
+        # applied off the event loop after each network chunk
+        self.pending: List[Tuple[SpooledUpload, Optional[bytes]]] = []
+        self._headers: Dict[bytes, bytes] = {}
+        self._field = b""
+        self._value = b""
+        self._current: Optional[SpooledUpload] = None
+    
+    def callbacks(self) -> Dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+    
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._current = None
+    
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._field += data[start:end]
+    
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._value += data[start:end]
+    
+    def on_header_end(self) -> None:
+        self._headers[self._field.lower()] = self._value
+        self._field = b""
+        self._value = b""
+    
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        if filename is None:
+            return  # A plain form field, not a file
+        
+        filename = filename.decode("utf-8", "replace")
+        if not filename:
+            raise ValueError("No file provided")
+        if len(self.uploads) >= self.max_files:
+            raise ValueError(f"Too many files: at most {self.max_files} per request")
+        
+        upload = SpooledUpload(filename, self._headers.get(b"content-type", b"").decode("latin-1") or None)
+        if upload.extension not in ALLOWED_UPLOAD_EXTENSIONS:
+            raise ValueError(
+                f"File type not supported: {filename}. Allowed: {', '.join(ALLOWED_UPLOAD_EXTENSIONS)}"
+            )
+        self.uploads.append(upload)
+        self._current = upload
+    
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        upload = self._current
+        if upload is None:
+            return
+        upload.size += end - start
+        if upload.size > self.max_file_bytes:
+            raise UploadTooLargeError(
+                f"{upload.filename} exceeds the {self.max_file_bytes} byte upload limit"
+            )
+        self.pending.append((upload, bytes(data[start:end])))
+    
+    def on_part_end(self) -> None:
+        if self._current is not None:
+            self.pending.append((self._current, None))
+            self._current = None
+    
+    def flush(self) -> None:
+        """Apply queued writes (runs in the thread pool)."""
+        for upload, data in self.pending:
+            if data is None:
+                upload.close()
+            else:
+                upload.write(data)
+        self.pending.clear()
+
+
+async def receive_uploads(
+    request: Request,
+    max_file_bytes: int = UPLOAD_MAX_FILE_BYTES,
+    max_request_bytes: int = UPLOAD_MAX_REQUEST_BYTES,
+    max_files: int = UPLOAD_MAX_FILES
+) -> List[SpooledUpload]:
+    """
+    Stream the files of a multipart/form-data request to disk.
+    
+    Every file part is accepted, whatever its field name. Files with the
+    same content and file type as an earlier file in the request are
+    marked with duplicate_of and their spooled copy is deleted. Callers own the
+    returned uploads and must discard() them when done.
+    
+    Raises:
+        UploadTooLargeError: If a file or the request exceeds its size limit
+        ValueError: If the request is not multipart, has no or too many
+            files, or a file type is not allowed
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise ValueError("Expected a multipart/form-data request")
+    
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_request_bytes:
+        raise UploadTooLargeError(f"Request exceeds the {max_request_bytes} byte upload limit")
+    
+    receiver = _UploadReceiver(max_file_bytes, max_files)
+    parser = multipart.MultipartParser(boundary, receiver.callbacks())
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_request_bytes:
+                raise UploadTooLargeError(f"Request exceeds the {max_request_bytes} byte upload limit")
+            try:
+                parser.write(chunk)
+            except MultipartParseError as e:
+                raise ValueError(f"Malformed multipart body: {e}") from e
+            if receiver.pending:
+                await run_in_threadpool(receiver.flush)
+        parser.finalize()
+        await run_in_threadpool(receiver.flush)
+        
+        if not receiver.uploads:
+            raise ValueError("No file provided")
+    except BaseException:
+        await run_in_threadpool(discard_uploads, receiver.uploads)
+        raise
+    
+    # Same key as the extraction cache: the type decides how content is parsed
+    first_by_content: Dict[Tuple[str, str], SpooledUpload] = {}
+    duplicates = []
+    for upload in receiver.uploads:
+        first = first_by_content.setdefault((upload.sha256, upload.extension), upload)
+        if first is not upload:
+            upload.duplicate_of = first.filename
+            duplicates.append(upload)
+    if duplicates:
+        await run_in_threadpool(discard_uploads, duplicates)
+    return receiver.uploads
+
+
+def discard_uploads(uploads: List[SpooledUpload]) -> None:
+    """Delete the spooled files of uploads."""
+    for upload in uploads:
+        upload.discard()
@@ -0,0 +1,237 @@
+"""
+VSME XBRL Export
+================
+
+Generates XBRL instance documents for the VSME Basic Module from report
+data, for one entity or many entities in a single instance.
+
+The taxonomy mapping (concepts, units, namespaces, schema entry point)
+lives in xbrl_data/vsme.json. It is compiled once per process into an
+XBRLTemplate: the document prologue (namespaces, schemaRef and unit
+declarations) as ready bytes, and per-concept tag fragments with the unit
+and precision already filled in. Generating an instance is then only
+string assembly of contexts and fact values, with no DOM and no
+per-document taxonomy work.
+
+Instances are streamed: the prologue first, then one block of contexts
+and facts per entity, then the closing tag. Each entity's facts are
+aggregated from its report modules read one chunk at a time (see
+ESGDatabaseService.iter_report_module), up to XBRL_ENTITY_CONCURRENCY
+entities at once, so memory does not grow with the size or number of
+entities in the instance.
+
+Facts are only reported for modules that hold data; an empty module is
+left out rather than reported as zero.
+"""
+
+from datetime import date
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+import asyncio
+import json
+import os
+import threading
+
+from .models import EmployeeMetrics
+
+XBRL_TAXONOMY_FILE = os.getenv(
+    "XBRL_TAXONOMY_FILE", os.path.join(os.path.dirname(__file__), "xbrl_data", "vsme.json")
+)
+
+# Identifier scheme of the xbrli:entity of each company
+XBRL_ENTITY_SCHEME = os.getenv("XBRL_ENTITY_SCHEME", "urn:greenalgebra:company-id")
+
+# Entities of a multi-entity instance whose data is read concurrently
+XBRL_ENTITY_CONCURRENCY = int(os.getenv("XBRL_ENTITY_CONCURRENCY", "8"))
+
+XBRL_MODULES = ("energy", "emissions", "water", "workforce", "scope3")
+
+_WORKFORCE_MEASURES = ("total_headcount", "female_count", "male_count", "other_gender_count")
+
+
+# ==================== Measures ====================
+
+class EntityMeasures:
+    """Aggregated VSME measures of one entity for one reporting year."""
+    
+    def __init__(self, entity_id: str, year: int):
+        self.entity_id = entity_id
+        self.year = year
+        self.values: Dict[str, float] = {}
+        self.instant: Optional[date] = None  # Balance date of the workforce figures
+    
+    def add(self, module: str, records: Iterable) -> None:
+        """Accumulate a batch of module records."""
+        values = self.values
+        if module == "energy":
+            for e in records:
+                key = "energy_renewable_kwh" if e.fuel_type.value == "renewable" else "energy_non_renewable_kwh"
+                values[key] = values.get(key, 0.0) + e.consumption_kwh
+                values["energy_kwh"] = values.get("energy_kwh", 0.0) + e.consumption_kwh
+            if "energy_kwh" in values:
+                values.setdefault("energy_renewable_kwh", 0.0)
+                values.setdefault("energy_non_renewable_kwh", 0.0)
+        elif module in ("emissions", "scope3"):
+            for e in records:
+                if module == "scope3":
+                    scope, co2e = "scope_3", e.estimated_co2e
+                else:
+                    scope, co2e = e.scope.value, e.co2e_tonnes
+                values[scope] = values.get(scope, 0.0) + co2e
+                if scope != "scope_2_market":
+                    values["ghg_total_location"] = values.get("ghg_total_location", 0.0) + co2e
+        elif module == "water":
+            for w in records:
+                values["water_m3"] = values.get("water_m3", 0.0) + w.volume_m3
+        elif module == "workforce":
+            for e in records:
+                self._add_workforce(e)
+        else:
+            raise ValueError(f"Unknown report module: {module}. Available: {', '.join(XBRL_MODULES)}")
+    
+    def _add_workforce(self, e: EmployeeMetrics) -> None:
+        for measure in _WORKFORCE_MEASURES:
+            self.values[measure] = float(getattr(e, measure))
+        self.instant = e.period_end
+
+
+async def collect_entity_measures(db_service, year: int, company_id: str) -> EntityMeasures:
+    """Aggregate a company's report year module by module, one stored chunk at a time."""
+    measures = EntityMeasures(company_id, year)
+    for module in XBRL_MODULES:
+        async for records in db_service.iter_report_module(year, module, company_id):
+            measures.add(module, records)
+    return measures
+
+
+# ==================== Template ====================
+
+class XBRLTemplate:
+    """A VSME taxonomy mapping compiled into instance fragments."""
+    
+    def __init__(self, taxonomy: Dict, entity_scheme: str = XBRL_ENTITY_SCHEME):
+        self.version = taxonomy["version"]
+        self.source = taxonomy.get("source", "")
+        prefix = taxonomy["prefix"]
+        namespaces = {**taxonomy["namespaces"], prefix: taxonomy["namespace"]}
+        
+        declarations = "".join(
+            f"\n  xmlns:{name}={quoteattr(uri)}" for name, uri in namespaces.items()
+        )
+        units = "".join(
+            f'  <xbrli:unit id={quoteattr(unit_id)}><xbrli:measure>{escape(measure)}</xbrli:measure></xbrli:unit>\n'
+            for unit_id, measure in taxonomy["units"].items()
+        )
+        self.prologue = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f"<xbrli:xbrl{declarations}>\n"
+            f'  <link:schemaRef xlink:type="simple" xlink:href={quoteattr(taxonomy["schema_ref"])}/>\n'
+            f"{units}"
+        ).encode("utf-8")
+        self.epilogue = b"</xbrli:xbrl>\n"
+        
+        # (measure, period, scale, decimals, "<tag contextRef=\"", "\" unitRef=... decimals=...>", "</tag>\n")
+        self.facts: List[Tuple[str, str, float, int, str, str, str]] = []
+        for concept in taxonomy["concepts"]:
+            if concept["unit"] not in taxonomy["units"]:
+                raise ValueError(f"Concept {concept['name']} uses undeclared unit {concept['unit']}")
+            if concept["period"] not in ("duration", "instant"):
+                raise ValueError(f"Concept {concept['name']} has unknown period type {concept['period']}")
+            tag = f"{prefix}:{concept['name']}"
+            decimals = int(concept.get("decimals", 0))
+            self.facts.append((
+                concept["measure"],
+                concept["period"],
+                float(concept.get("scale", 1.0)),
+                decimals,
+                f'  <{tag} contextRef="',
+                f'" unitRef={quoteattr(concept["unit"])} decimals="{decimals}">',
+                f"</{tag}>\n",
+            ))
+        
+        identifier = f"<xbrli:entity><xbrli:identifier scheme={quoteattr(entity_scheme)}>"
+        self._context_open = '  <xbrli:context id="'
+        self._entity_open = f'">{identifier}'
+        self._entity_close = "</xbrli:identifier></xbrli:entity><xbrli:period>"
+        self._context_close = "</xbrli:period></xbrli:context>\n"
+    
+    def entity_block(self, index: int, measures: EntityMeasures) -> bytes:
+        """Contexts and facts of one entity (index makes context ids unique)."""
+        entity = escape(measures.entity_id)
+        duration_id = f"D{index}"
+        instant_id = f"I{index}"
+        instant = measures.instant or date(measures.year, 12, 31)
+        parts = [
+            self._context_open, duration_id, self._entity_open, entity, self._entity_close,
+            f"<xbrli:startDate>{measures.year}-01-01</xbrli:startDate>",
+            f"<xbrli:endDate>{measures.year}-12-31</xbrli:endDate>",
+            self._context_close,
+        ]
+        instant_used = False
+        values = measures.values
+        for measure, period, scale, decimals, open_tag, attributes, close_tag in self.facts:
+            value = values.get(measure)
+            if value is None:
+                continue
+            if period == "instant":
+                context = instant_id
+                instant_used = True
+            else:
+                context = duration_id
+            parts += (open_tag, context, attributes, f"{value * scale:.{decimals}f}", close_tag)
+        
+        if instant_used:
+            parts += (
+                self._context_open, instant_id, self._entity_open, entity, self._entity_close,
+                f"<xbrli:instant>{instant.isoformat()}</xbrli:instant>",
+                self._context_close,
+            )
+        return "".join(parts).encode("utf-8")
+
+
+def load_taxonomy(path: str = XBRL_TAXONOMY_FILE) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Singleton instance
+_xbrl_template: Optional[XBRLTemplate] = None
+_xbrl_lock = threading.Lock()
+
+def get_xbrl_template() -> XBRLTemplate:
+    """Get the compiled VSME template singleton, compiling it on first use."""
+    global _xbrl_template
+    if _xbrl_template is None:
+        with _xbrl_lock:
+            if _xbrl_template is None:
+                _xbrl_template = XBRLTemplate(load_taxonomy())
+    return _xbrl_template
+
+
+# ==================== Instance Generation ====================
+
+async def stream_xbrl_instance(
+    db_service,
+    year: int,
+    company_ids: List[str],
+    template: Optional[XBRLTemplate] = None,
+    concurrency: int = XBRL_ENTITY_CONCURRENCY
+) -> AsyncIterator[bytes]:
+    """
+    Yield an XBRL instance for the companies' report year.
+    
+    Entities are aggregated in windows of `concurrency` companies and
+    written in the order given.
+    """
+    template = template or get_xbrl_template()
+    yield template.prologue
+    for start in range(0, len(company_ids), concurrency):
+        window = company_ids[start:start + concurrency]
+        results = await asyncio.gather(*(
+            collect_entity_measures(db_service, year, company_id) for company_id in window
+        ))
+        yield b"".join(
+            template.entity_block(start + offset, measures)
+            for offset, measures in enumerate(results)
+        )
+    yield template.epilogue